@@ -0,0 +1,169 @@
+"""Bootstrap stability scores for the edges of a DAG.
+
+Each edge ``source -> target`` is tested for dependence given the target's
+other parents (see :func:`ci_tests.edge_dependencies`) on many bootstrap
+resamples of the data. An edge's stability is the share of resamples in
+which the dependence is significant.
+
+Resamples are never materialized. Each one is a Poisson(1) weight per row.
+Its weighted sufficient statistics (row count, sums and cross-products)
+are accumulated over fixed-size row chunks, so memory does not grow with
+the number of resamples or rows. The data is copied once into a
+``multiprocessing.shared_memory`` block that every pool worker maps
+without copying. Weights are drawn from a seed derived from
+``(seed, resample, chunk)``, so results do not depend on how resamples are
+split across workers.
+"""
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_all_start_methods, get_context, shared_memory
+
+import numpy as np
+
+from ci_tests import DEFAULT_ALPHA, CITestEngine, DatasetError, column_mapping, edge_dependencies, map_constraints
+
+# Rows processed at a time; bounds the per-worker working set
+DEFAULT_CHUNK_ROWS = 100_000
+
+# Start method for pool workers; forkserver where the platform has it, else spawn
+START_METHOD = "forkserver" if "forkserver" in get_all_start_methods() else "spawn"
+
+
+def _attach(name):
+    """Map an existing shared memory block without taking ownership of it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 workers register the block with the parent's resource tracker,
+        # which the parent's unlink() clears again
+        return shared_memory.SharedMemory(name=name)
+
+
+def resample_statistics(data, resamples, seed=0, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Return weighted row counts, sums and cross-products for each resample id.
+
+    Shapes are ``(B,)``, ``(B, p)`` and ``(B, p, p)`` for ``B`` resamples.
+    """
+    n, p = data.shape
+    counts = np.zeros(len(resamples))
+    sums = np.zeros((len(resamples), p))
+    products = np.zeros((len(resamples), p, p))
+    for chunk_index, start in enumerate(range(0, n, chunk_rows)):
+        chunk = data[start:start + chunk_rows]
+        for i, resample in enumerate(resamples):
+            rng = np.random.default_rng([seed, resample, chunk_index])
+            weights = rng.poisson(1.0, len(chunk)).astype(float)
+            counts[i] += weights.sum()
+            sums[i] += weights @ chunk
+            products[i] += (chunk.T * weights) @ chunk
+    return counts, sums, products
+
+
+def _shared_statistics(args):
+    name, shape, resamples, seed, chunk_rows = args
+    shm = _attach(name)
+    data = None
+    try:
+        data = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        return resamples, resample_statistics(data, resamples, seed, chunk_rows)
+    finally:
+        # The view must go before the segment can be closed
+        del data
+        shm.close()
+
+
+def _copy_complete_rows(data, positions, out, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Write the rows of ``data`` with a value in every column in ``positions`` into ``out``.
+
+    Works a block of rows at a time, so no full copy of the columns is made
+    on the way. Returns the number of rows written.
+    """
+    filled = 0
+    for start in range(0, len(data), chunk_rows):
+        block = data[start:start + chunk_rows, positions]
+        block = block[~np.isnan(block).any(axis=1)]
+        out[filled:filled + len(block)] = block
+        filled += len(block)
+    return filled
+
+
+def _correlation(count, total, products):
+    mean = total / count
+    covariance = products / count - np.outer(mean, mean)
+    std = np.sqrt(np.clip(np.diag(covariance), 1e-12, None))
+    corr = covariance / np.outer(std, std)
+    np.fill_diagonal(corr, 1.0)
+    return np.clip(corr, -1.0, 1.0)
+
+
+def edge_stability(data, columns, dag, n_resamples=200, alpha=DEFAULT_ALPHA, max_workers=None,
+                   chunk_rows=DEFAULT_CHUNK_ROWS, seed=0, lookup=None):
+    """Return bootstrap stability scores for the DAG's edges.
+
+    The result maps each ``(source, target)`` edge, in the DAG's own names,
+    to the share of resamples where the edge's dependence is significant.
+    Edges whose test involves a node without a data column are left out.
+    """
+    lookup = lookup or (lambda name: name if name in columns else None)
+    # Test each edge against the DAG's own parents; an edge whose test needs a node
+    # without a column is skipped rather than tested with that node left out
+    mapping, _ = column_mapping(dag, lookup)
+    edges, tests = [], []
+    for test in edge_dependencies(dag):
+        for mapped in map_constraints([test], mapping):
+            edges.append(test[:2])
+            tests.append(mapped)
+    if not tests:
+        return {}
+
+    # Only the complete rows of the columns the tests use are copied
+    used = list(dict.fromkeys(name for source, target, given in tests for name in (source, target, *given)))
+    position = {name: i for i, name in enumerate(columns)}
+    positions = [position[name] for name in used]
+    data = np.asarray(data, dtype=np.float64)
+    complete = np.ones(len(data), dtype=bool)
+    for j in positions:
+        complete &= ~np.isnan(data[:, j])
+    n_rows = int(complete.sum())
+    if n_rows < 5:
+        raise DatasetError("At least 5 complete rows are needed for independence tests.")
+
+    workers = max_workers or os.cpu_count() or 1
+    resample_ids = list(range(n_resamples))
+    counts = np.zeros(n_resamples)
+    sums = np.zeros((n_resamples, len(used)))
+    products = np.zeros((n_resamples, len(used), len(used)))
+
+    if workers == 1:
+        rows = np.empty((n_rows, len(used)))
+        _copy_complete_rows(data, positions, rows, chunk_rows)
+        counts, sums, products = resample_statistics(rows, resample_ids, seed, chunk_rows)
+    else:
+        shape = (n_rows, len(used))
+        shm = shared_memory.SharedMemory(create=True, size=max(1, n_rows * len(used) * 8))
+        try:
+            shared = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+            _copy_complete_rows(data, positions, shared, chunk_rows)
+            batch = max(1, math.ceil(n_resamples / (workers * 4)))
+            tasks = [
+                (shm.name, shape, resample_ids[i:i + batch], seed, chunk_rows)
+                for i in range(0, n_resamples, batch)
+            ]
+            # Never fork the multithreaded app server; a fork can inherit a held lock
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context(START_METHOD)) as executor:
+                for resamples, (batch_counts, batch_sums, batch_products) in executor.map(_shared_statistics, tasks):
+                    counts[resamples] = batch_counts
+                    sums[resamples] = batch_sums
+                    products[resamples] = batch_products
+            del shared
+        finally:
+            shm.close()
+            shm.unlink()
+
+    supported = np.zeros(len(tests))
+    for i in range(n_resamples):
+        engine = CITestEngine.from_correlation(_correlation(counts[i], sums[i], products[i]), int(counts[i]), used)
+        supported += [not row["independent"] for row in engine.test(tests, alpha)]
+
+    return {edge: round(float(supported[i] / n_resamples), 3) for i, edge in enumerate(edges)}
@@ -6,22 +6,178 @@ from pywhyllm import RelationshipStrategy
 import os
 import json
 from dotenv import load_dotenv
-from openai import OpenAI
 import graphviz
+import threading
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from pipeline import Pipeline, PipelineResult, Provisional, fingerprint
+from llm_batching import ConfidenceMatrix, candidate_pairs, chunked, run_concurrently
+from llm_routing import AVAILABLE_MODELS, ROUTE_STAGES, LLMRouter, RouteStats, load_route_config
+from llm_providers import load_providers
+from circuit_breaker import OPEN, load_fallback
+from variable_index import factor_keys, get_variable_index, normalize_name
+from project_store import ProjectStore
+from job_queue import ACTIVE_STATUSES, DONE, JobQueue
+from usage_log import CACHE_HIT, PARSE_FAILURE, UsageLog
+from factor_ingest import FactorIngestError, format_factor_list, ingest_factor_file, parse_factor_list, resolve_data_path
+from ci_tests import DEFAULT_ALPHA, DatasetError, load_numeric_dataset, test_dag_against_data
+from pc_discovery import PCDiscovery
+from bootstrap import edge_stability
+from result_html import backdoor_html, confounders_html, edge_critiques_html, ivs_html, mediators_html, relationships_html
+from table_view import PAGE_SIZES, filter_rows, page_count, relationship_rows, select_page
+from dag_graph import CompactDAG, ReachabilityIndex
+from pair_prefilter import DEFAULT_PAIR_BUDGET, PairConstraints, correlation_scorer, lexical_scorer, parse_edge_lines, parse_tiers, select_pairs
+from factor_clusters import DEFAULT_CLUSTER_SIZE, anchor_pairs, cluster_by_domain, cluster_by_name, inter_cluster_pairs, representatives
+from llm_parsing import parse_confidence, parse_list, parse_object
+from dag_io import FILE_EXTENSIONS, FORMATS, DagFormatError, find_cycle, parse_dag, serialize_dag, to_dowhy_graph
+import datetime
+import hashlib
+import uuid
+import numpy as np
 
 # Standard error messages
-OPENAI_API_KEY_ERROR = "OpenAI API key not found. Please set the OPENAI_API_KEY environment variable."
+LLM_PROVIDER_ERROR = "No LLM provider configured. Please set the OPENAI_API_KEY environment variable, or LOCAL_LLM_BASE_URL to use a local OpenAI-compatible server."
 MISSING_VARIABLES_ERROR = "Please enter all required variables (factors, treatment, and outcome)."
 MISSING_FACTORS_ERROR = "Please enter some factors first."
 
-# Initialize OpenAI client
-def get_openai_client():
-    """Get OpenAI client with proper error handling."""
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        st.error(OPENAI_API_KEY_ERROR)
+# pywhyllm suggesters only wire up gpt-4, regardless of the routed models
+PYWHYLLM_MODEL = "gpt-4"
+
+# Longest variable description included in a prompt
+MAX_DESCRIPTION_LENGTH = 200
+# Bootstrap stability below which an edge is drawn as weakly supported
+EDGE_STABILITY_THRESHOLD = 0.5
+# Session-state key prefix of the per-variable edge editors
+DAG_EDIT_KEY_PREFIX = "dag_targets_"
+# Candidate factors per confounder prompt; longer factor lists are searched in chunks
+CONFOUNDER_CHUNK_SIZE = 20
+CONFOUNDER_LEVELS = ("high", "medium", "low")
+# Node colours for the ancestors and descendants of the highlighted variable
+FOCUS_COLOR = "#FFF59D"
+ANCESTOR_COLOR = "#C8E6C9"
+DESCENDANT_COLOR = "#FFCCBC"
+# Directory whose files can be loaded by name instead of uploaded; unset disables server paths
+DATA_DIR_ENV = "CAUSAL_APP_DATA_DIR"
+# Parsed uploaded datasets kept in memory per server process
+DATASET_CACHE_ENTRIES = 4
+# Session values a background pipeline job reads; it is handed these instead of the session
+JOB_SESSION_KEYS = (
+    "job_owner", "model_routes", "default_llm_model", "model_prices", "route_stats",
+    "factor_descriptions", "pipeline_cache", "relationship_cache",
+)
+# Background jobs run concurrently per server process
+JOB_WORKERS_ENV = "CAUSAL_APP_JOB_WORKERS"
+DEFAULT_JOB_WORKERS = 4
+# Exceptions raised while reading a model response, as opposed to calling the model
+PARSE_ERRORS = (ValueError, SyntaxError)
+
+# Initialize LLM providers once per process so their concurrency limits are shared by all sessions
+@st.cache_resource
+def get_provider_registry():
+    """Get the configured LLM providers."""
+    return load_providers()
+
+# One usage log per process; it writes in the background so pages never wait on it
+@st.cache_resource
+def get_usage_log():
+    """Get the log that records LLM calls for the usage dashboard."""
+    return UsageLog()
+
+# Circuit breakers and last good answers are shared by all sessions, like the providers they guard
+@st.cache_resource
+def get_llm_fallback():
+    """Get the circuit breakers and stale-answer fallback for the LLM providers."""
+    return load_fallback()
+
+# Inside a background job: the session values the job was submitted with
+_job_session = threading.local()
+
+def current_session():
+    """Return the session state, or inside a background job its copy of the submitting session's values."""
+    values = getattr(_job_session, "values", None)
+    return st.session_state if values is None else values
+
+def record_parse_failure(stage):
+    """Count a model response for ``stage`` that could not be parsed."""
+    get_usage_log().record(stage, owner=get_job_owner(), event=PARSE_FAILURE)
+
+def init_model_routing():
+    """Load the model routing table and per-route stats into session state."""
+    if 'model_routes' in current_session():
+        return
+    try:
+        config = load_route_config()
+    except (OSError, ValueError) as e:
+        st.error(f"Error loading model routes, using defaults: {str(e)}")
+        config = load_route_config(path=os.devnull)
+    
+    # Fall back to whichever provider is configured, e.g. a local server without an OpenAI key
+    providers = get_provider_registry()
+    available_models = providers.route_models(AVAILABLE_MODELS)
+    if not providers.is_available(config["default"]) and available_models:
+        config["default"] = available_models[0]
+    routes = {
+        stage: model if model and providers.is_available(model) else None
+        for stage, model in config["routes"].items()
+    }
+    
+    st.session_state.default_llm_model = config["default"]
+    st.session_state.model_routes = routes
+    st.session_state.model_prices = config["prices"]
+    st.session_state.route_stats = RouteStats()
+
+def get_llm_router():
+    """Get a client that sends each analysis stage to its routed provider and model."""
+    providers = get_provider_registry()
+    if not providers.configured():
+        st.error(LLM_PROVIDER_ERROR)
         return None
-    return OpenAI(api_key=api_key)
+    init_model_routing()
+    session = current_session()
+    # Appended to from worker threads too, so the list is looked up here, not in the callback
+    stale_answers = session.setdefault('stale_answers', [])
+    return LLMRouter(
+        providers,
+        routes=session['model_routes'],
+        default_model=session['default_llm_model'],
+        prices=session['model_prices'],
+        stats=session['route_stats'],
+        log=get_usage_log(),
+        owner=get_job_owner(),
+        fallback=get_llm_fallback(),
+        on_stale=lambda stage, age: stale_answers.append((stage, age))
+    )
+
+def format_age(seconds):
+    """Describe an age in seconds as e.g. "3 min"."""
+    for unit, size in (("day", 86400), ("h", 3600), ("min", 60)):
+        if seconds >= size:
+            count = int(seconds // size)
+            return f"{count} {unit}{'s' if unit == 'day' and count > 1 else ''}"
+    return f"{int(seconds)} s"
+
+def show_stale_answers(placeholder):
+    """Explain in ``placeholder`` which answers of this run came from the last good response."""
+    stale_answers = st.session_state.pop('stale_answers', [])
+    open_providers = [name for name, state in get_llm_fallback().states().items() if state == OPEN]
+    if not stale_answers and not open_providers:
+        placeholder.empty()
+        return
+    lines = []
+    if stale_answers:
+        stages = {}
+        for stage, age in stale_answers:
+            stages[stage] = max(age, stages.get(stage, 0.0))
+        shown = ", ".join(f"{ROUTE_STAGES.get(stage, stage)} ({format_age(age)} old)" for stage, age in stages.items())
+        lines.append(
+            f"The LLM provider is failing or slow, so these results reuse the last good answer for the same inputs: {shown}. "
+            "Fresh answers are fetched in the background and used the next time you run the step."
+        )
+    if open_providers:
+        lines.append(
+            f"Calls to {', '.join(open_providers)} are paused after repeated errors or slow responses "
+            "and resume automatically once the provider recovers."
+        )
+    placeholder.warning("⏳ " + " ".join(lines))
 
 # Set page config
 st.set_page_config(
@@ -215,6 +371,34 @@ st.markdown("""
         font-weight: 500;
         font-family: 'Segoe UI', Arial, sans-serif;
     }
+
+    /* Result Panels */
+    .result-item {
+        border: 1px solid #E0E0E0;
+        border-radius: 8px;
+        padding: 8px 14px;
+        margin: 8px 0;
+    }
+    .result-item summary {
+        font-size: 18px;
+        font-weight: 500;
+        color: #2C3E50;
+        cursor: pointer;
+    }
+    .result-item[open] summary {
+        margin-bottom: 10px;
+    }
+    .confidence-high, .confidence-medium, .confidence-low {
+        font-weight: bold;
+        margin-bottom: 10px;
+    }
+    .confidence-high { color: #27ae60; }
+    .confidence-medium { color: #f39c12; }
+    .confidence-low { color: #e74c3c; }
+    .result-note {
+        color: #757575;
+        font-style: italic;
+    }
     </style>
 """, unsafe_allow_html=True)
 
@@ -360,66 +544,57 @@ def convert_tuples_to_lists(obj):
     else:
         return obj
 
+# Result panels are rendered as one HTML block each
+RESULT_PANELS = {
+    "relationships": relationships_html,
+    "confounders": confounders_html,
+    "backdoor": backdoor_html,
+    "mediators": mediators_html,
+    "ivs": ivs_html,
+    "edge_critiques": edge_critiques_html,
+}
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def result_panel_html(kind, result):
+    """Build a result panel's HTML once per distinct result."""
+    return RESULT_PANELS[kind](result)
+
+def paged_rows(rows, key, where=None):
+    """Show filter, sort and page controls for result rows and return the rows on the current page."""
+    col1, col2, col3, col4 = st.columns([3, 2, 2, 2])
+    with col1:
+        query = st.text_input("Filter by variable", key=f"{key}_filter", placeholder="Source or target contains...")
+    with col2:
+        sort_by = st.selectbox("Sort by", ["confidence", "source", "target"], format_func=str.title, key=f"{key}_sort")
+    with col3:
+        order = st.selectbox("Order", ["Descending", "Ascending"], key=f"{key}_order")
+    with col4:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{key}_page_size")
+    min_confidence = st.slider("Minimum confidence", 0.0, 1.0, 0.0, 0.05, key=f"{key}_min_confidence")
+    
+    matching = filter_rows(rows, query, min_confidence=min_confidence or None, where=where)
+    pages = page_count(matching, page_size)
+    page_key = f"{key}_page"
+    # Filters can shrink the result, so keep the stored page in range
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=page_key) if pages > 1 else 1
+    
+    visible = select_page(matching, sort_by, order == "Descending", page, page_size)
+    if matching:
+        start = (page - 1) * page_size + 1
+        filtered = f" (filtered from {len(rows)})" if len(matching) < len(rows) else ""
+        st.caption(f"Showing {start}-{start + len(visible) - 1} of {len(matching)}{filtered}")
+    else:
+        st.caption(f"No rows match the filters (of {len(rows)}).")
+    return visible
+
 def format_confounder_output(confounders):
     """Format confounders into human-readable text with explanations."""
     if not confounders:
         return st.markdown("_No confounding variables identified._")
     
-    def format_variable_name(name):
-        """Format variable names consistently."""
-        return str(name).replace('_', ' ').strip().title()
-    
-    def format_relationship(source, target, score=None):
-        """Format a single relationship in human-readable text."""
-        source = format_variable_name(source)
-        target = format_variable_name(target)
-        
-        st.markdown(f"### {source} → {target}")
-        
-        if score:
-            confidence = "High" if score > 0.7 else "Medium" if score > 0.4 else "Low"
-            confidence_color = "#27ae60" if confidence == "High" else "#f39c12" if confidence == "Medium" else "#e74c3c"
-            
-            st.markdown(f"""
-                <div style='color: {confidence_color}; font-weight: bold; margin-bottom: 10px;'>
-                    Confidence Level: {confidence}
-                    <br>
-                    Relationship Strength: {score:.2f}
-                </div>
-            """, unsafe_allow_html=True)
-            
-            st.markdown(f"💡 {source} shows a {confidence.lower()} likelihood of being a confounder.")
-        else:
-            st.markdown(f"💡 {source} may act as a confounder through its relationship with {target}.")
-    
-    st.markdown("## Identified Confounding Variables")
-    
-    if isinstance(confounders, (list, tuple)):
-        for item in confounders:
-            if isinstance(item, (list, tuple)):
-                if len(item) >= 2:
-                    format_relationship(item[0], item[1], item[2] if len(item) > 2 else None)
-            else:
-                var_name = format_variable_name(item)
-                st.markdown(f"### {var_name}")
-                st.markdown(f"💡 This variable may confound the relationship between treatment and outcome.")
-    
-    # Add explanation section
-    st.markdown("### 🔍 Understanding Confounding Variables")
-    st.markdown("""
-    1. Confounders can create spurious associations between variables
-    2. They affect both the treatment and outcome variables
-    3. Controlling for confounders is crucial for accurate causal inference
-    """)
-    
-    # Add recommendations
-    st.markdown("### 📊 Recommendations")
-    st.markdown("""
-    1. Include these variables in your data collection plan
-    2. Use appropriate statistical methods to control for their effects
-    3. Consider stratification or matching based on these variables
-    4. Document any unmeasured confounders that might affect your analysis
-    """)
+    st.markdown(result_panel_html("confounders", confounders), unsafe_allow_html=True)
 
 def format_list_to_text(items):
     """Convert a list of items into a readable text format."""
@@ -545,79 +720,24 @@ def format_backdoor_set(backdoor_set):
         if isinstance(backdoor_set, (list, tuple)):
             for var in backdoor_set:
                 if isinstance(var, dict):
-                    name = var.get('name', '')
-                    confidence = var.get('confidence', 'medium')
-                    if name:
-                        if name not in nodes:
-                            dot.node(name, name)
-                            nodes.add(name)
-                            
-                        # Format the variable details
-                        st.markdown(f"### {name}")
-                        confidence_color = "#27ae60" if confidence == "high" else "#f39c12" if confidence == "medium" else "#e74c3c"
-                        st.markdown(f"""
-                            <div style='color: {confidence_color}; font-weight: bold; margin-bottom: 10px;'>
-                                Confidence Level: {confidence.title()}
-                            </div>
-                        """, unsafe_allow_html=True)
-                        
+                    names = [var.get('name', '')]
                 elif isinstance(var, (list, tuple)):
-                    # Handle relationship format
-                    if len(var) >= 2:
-                        source = str(var[0])
-                        target = str(var[1])
-                        
-                        # Add nodes if they don't exist
-                        if source not in nodes:
-                            dot.node(source, source)
-                            nodes.add(source)
-                        if target not in nodes:
-                            dot.node(target, target)
-                            nodes.add(target)
-                            
-                        # Add edge
-                        dot.edge(source, target)
-                        
-                        # Format the relationship
-                        st.markdown(f"### {source} → {target}")
-                        st.markdown("This relationship is part of the backdoor adjustment set.")
+                    names = [str(v) for v in var[:2]] if len(var) >= 2 else []
                 else:
-                    # Handle single variable
-                    var_name = str(var)
-                    if var_name not in nodes:
-                        dot.node(var_name, var_name)
-                        nodes.add(var_name)
-                    st.markdown(f"### {var_name}")
-                    st.markdown("This variable should be included in the backdoor adjustment set.")
+                    names = [str(var)]
+                for name in names:
+                    if name and name not in nodes:
+                        dot.node(name, name)
+                        nodes.add(name)
+                if isinstance(var, (list, tuple)) and len(names) == 2:
+                    dot.edge(names[0], names[1])
         
         # Display the visualization
         if nodes:
             st.graphviz_chart(dot)
         
-        # Add explanation section
-        with st.expander("🔍 Understanding Backdoor Adjustment", expanded=True):
-            st.markdown("""
-            ### What is Backdoor Adjustment?
-            Backdoor adjustment helps control for confounding variables in causal analysis by:
-            1. Identifying variables that affect both treatment and outcome
-            2. Blocking "backdoor paths" that create spurious associations
-            3. Enabling unbiased estimation of causal effects
-            
-            ### How to Use These Variables
-            - Include these variables in your analysis model
-            - Collect data on these variables during your study
-            - Consider stratification or matching based on these variables
-            - Document any unmeasured confounders
-            """)
-        
-        # Add recommendations
-        with st.expander("📊 Recommendations", expanded=True):
-            st.markdown("""
-            1. Prioritize collecting data on high-confidence backdoor variables
-            2. Use appropriate statistical methods to control for these variables
-            3. Consider both direct and indirect paths in your analysis
-            4. Validate the completeness of the backdoor set with domain experts
-            """)
+        # The variables, explanation and recommendations in one block
+        st.markdown(result_panel_html("backdoor", backdoor_set), unsafe_allow_html=True)
         
     except Exception as e:
         st.error(f"""
@@ -627,59 +747,44 @@ def format_backdoor_set(backdoor_set):
         """)
         return None
 
-def validate_dag_input(dag_str):
+def validate_dag_input(dag_str, fmt="auto"):
     """Validate DAG input and return tuple of (is_valid, dag_dict, error_message)."""
     if not dag_str or dag_str.strip() == '{}':
         return False, {}, "Please enter a DAG structure."
     
     try:
-        # First try to parse as JSON
-        dag_dict = json.loads(dag_str)
-        if not isinstance(dag_dict, dict):
-            return False, {}, "❌ Input must be a dictionary/object."
-        
-        # Validate structure
-        for source, targets in dag_dict.items():
-            if not isinstance(source, str):
-                return False, {}, f"❌ Key '{source}' must be a string."
-            if not isinstance(targets, list):
-                if isinstance(targets, str):
-                    # Convert single string to list
-                    dag_dict[source] = [targets]
-                else:
-                    return False, {}, f"❌ Value for '{source}' must be a list of strings or a single string."
-            else:
-                for target in targets:
-                    if not isinstance(target, str):
-                        return False, {}, f"❌ Target '{target}' in list for '{source}' must be a string."
-        
-        return True, dag_dict, "✅ Valid DAG structure"
-    except json.JSONDecodeError:
-        try:
-            # Try to evaluate as Python dict if JSON fails
-            dag_dict = eval(dag_str)
-            if not isinstance(dag_dict, dict):
-                return False, {}, "❌ Input must be a dictionary."
-            
-            # Convert to proper format
-            formatted_dict = {}
-            for source, targets in dag_dict.items():
-                if isinstance(targets, str):
-                    formatted_dict[source] = [targets]
-                elif isinstance(targets, (list, tuple)):
-                    formatted_dict[source] = list(targets)
-                else:
-                    return False, {}, f"❌ Value for '{source}' must be a list of strings or a single string."
-            
-            return True, formatted_dict, "✅ Valid DAG structure"
-        except:
-            return False, {}, "❌ Invalid input format. Please use valid JSON or Python dictionary format."
+        dag_dict = parse_dag(dag_str, fmt)
+    except DagFormatError as e:
+        return False, {}, f"❌ {str(e)}"
+    
+    # Reject cycles so the structure can be used as a causal DAG
+    cycle = find_cycle(dag_dict)
+    if cycle:
+        return False, {}, f"❌ The structure contains a cycle: {' → '.join(cycle)}."
+    
+    return True, dag_dict, "✅ Valid DAG structure"
 
-def create_dag_visualization(relationships):
-    """Create a visual DAG using Graphviz."""
+def create_dag_visualization(relationships, factors=None, stability=None, highlight=None):
+    """Create a visual DAG using Graphviz, with bootstrap edge stability and highlighted nodes when given."""
     if not relationships:
         return None
     
+    # Resolve node names to the input factors so spelling variants share one node
+    if factors is None:
+        factors = parse_factor_list(st.session_state.get('factors_input', ''))
+    index = get_variable_index(factors)
+    extra_names = {}
+    
+    def node_name(name):
+        name = index.lookup(name) or str(name).strip()
+        return extra_names.setdefault(normalize_name(name), name)
+    
+    stability = {
+        (node_name(source), node_name(target)): score
+        for (source, target), score in (stability or {}).items()
+    }
+    highlight = {node_name(node): color for node, color in (highlight or {}).items()}
+    
     # Create a new directed graph
     dot = graphviz.Digraph()
     dot.attr(rankdir='LR')  # Left to right layout
@@ -705,123 +810,70 @@ def create_dag_visualization(relationships):
     # Add nodes and edges
     for rel in relationships:
         if isinstance(rel, (list, tuple)) and len(rel) >= 2:
-            source = str(rel[0]).strip()
-            target = str(rel[1]).strip()
+            source = node_name(rel[0])
+            target = node_name(rel[1])
             
             # Add nodes if they don't exist
-            if source not in nodes:
-                dot.node(source, source)
-                nodes.add(source)
-            if target not in nodes:
-                dot.node(target, target)
-                nodes.add(target)
+            for node in (source, target):
+                if node not in nodes:
+                    if node in highlight:
+                        dot.node(node, node, fillcolor=highlight[node])
+                    else:
+                        dot.node(node, node)
+                    nodes.add(node)
             
             # Add edge with confidence as label if available
+            label = ""
             if len(rel) > 2:
                 confidence = float(rel[2])
                 # Only show confidence label if it's significant
                 if confidence > 0.5:
-                    dot.edge(source, target, label=f" {confidence:.2f}")
-                else:
-                    dot.edge(source, target)
+                    label = f" {confidence:.2f}"
+            attributes = {}
+            if (source, target) in stability:
+                score = stability[(source, target)]
+                label += f" · boot {score:.2f}" if label else f" boot {score:.2f}"
+                # Edges the data rarely supports are drawn dashed
+                if score < EDGE_STABILITY_THRESHOLD:
+                    attributes = {"style": "dashed", "color": "#E53935"}
+            if label:
+                dot.edge(source, target, label=label, **attributes)
             else:
-                dot.edge(source, target)
+                dot.edge(source, target, **attributes)
     
     return dot
 
-def format_relationship_output(relationships):
-    """Format relationships into readable text with explanations and visualization."""
+@st.cache_data(max_entries=256, show_spinner=False)
+def relationship_graph_source(edges, factors):
+    """Build the DOT source for ``(source, target, confidence)`` edges once per distinct page."""
+    dot = create_dag_visualization([list(edge) for edge in edges], factors=list(factors))
+    return dot.source if dot else None
+
+def format_relationship_output(relationships, key="relationships"):
+    """Format relationships into readable text with explanations and visualization.
+    
+    ``key`` keeps the page controls of each place the list is shown apart.
+    """
     if not relationships:
         return st.markdown("_No relationships identified._")
     
     try:
-        # Create and display the DAG visualization
-        dot = create_dag_visualization(relationships)
-        if dot:
-            st.graphviz_chart(dot)
-        
-        st.markdown("## Detailed Relationship Analysis")
-        
-        for rel in relationships:
-            if isinstance(rel, (list, tuple)) and len(rel) >= 2:
-                source = str(rel[0]).strip()
-                target = str(rel[1]).strip()
-                confidence_score = float(rel[2]) if len(rel) > 2 else 0.5
-                
-                # Determine confidence level and color
-                if confidence_score > 0.7:
-                    confidence = "high"
-                    confidence_color = "#27ae60"
-                elif confidence_score > 0.4:
-                    confidence = "medium"
-                    confidence_color = "#f39c12"
-                else:
-                    confidence = "low"
-                    confidence_color = "#e74c3c"
-                
-                # Create expandable section for each relationship
-                with st.expander(f"🔍 {source} → {target}"):
-                    st.markdown(f"""
-                        <div style='color: {confidence_color}; font-weight: bold; margin-bottom: 10px;'>
-                            Confidence Level: {confidence.title()}
-                            <br>
-                            Relationship Strength: {confidence_score:.2f}
-                        </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Add relationship explanation
-                    explanation = get_relationship_explanation(source, target, confidence)
-                    st.markdown(f"**Analysis:** {explanation}")
-                    
-                    # Add recommendation
-                    recommendation = get_relationship_recommendation(confidence)
-                    st.markdown(f"**Recommendation:** {recommendation}")
-        
-        # Add explanation section
-        with st.expander("🔍 Understanding These Relationships", expanded=False):
-            st.markdown("""
-            ### Interpreting the Diagram
-            1. **Nodes:** Represent variables in your causal model
-            2. **Arrows:** Show the direction of causal influence
-            3. **Numbers:** Indicate the strength of relationships (0-1)
-            
-            ### Confidence Levels
-            - **High (>0.7):** Strong evidence of direct causal effect
-            - **Medium (0.4-0.7):** Moderate evidence, possible indirect effects
-            - **Low (<0.4):** Weak evidence, needs further investigation
-            """)
-        
-        # Add next steps
-        with st.expander("📊 Next Steps", expanded=False):
-            st.markdown("""
-            1. Focus on high-confidence relationships for primary analysis
-            2. Consider indirect effects through medium-confidence paths
-            3. Validate relationships with domain experts
-            4. Look for potential mediating variables
-            """)
+        # Only the current page is drawn and becomes collapsible items, so a long result costs one page per rerun
+        page = paged_rows(relationship_rows(relationships), key)
+        edges = [[row["source"], row["target"], row["confidence"]] for row in page]
+        factors = tuple(parse_factor_list(st.session_state.get('factors_input', '')))
+        graph = relationship_graph_source(tuple(map(tuple, edges)), factors)
+        if graph:
+            st.graphviz_chart(graph)
+        st.markdown(
+            result_panel_html("relationships", edges),
+            unsafe_allow_html=True
+        )
         
     except Exception as e:
         st.error(f"Error formatting relationships: {str(e)}")
         return None
 
-def get_relationship_explanation(source, target, confidence):
-    """Generate explanations for relationships based on confidence level"""
-    if confidence == 'high':
-        return f"Strong evidence suggests that changes in {source} directly affect {target}."
-    elif confidence == 'medium':
-        return f"There appears to be a moderate relationship between {source} and {target}, possibly involving other factors."
-    else:
-        return f"The relationship between {source} and {target} requires further investigation to establish causality."
-
-def get_relationship_recommendation(confidence):
-    """Generate recommendations based on confidence level"""
-    if confidence == 'high':
-        return "Consider this relationship as a primary focus for your causal analysis."
-    elif confidence == 'medium':
-        return "Further investigation may be needed to strengthen evidence for this relationship."
-    else:
-        return "Additional data or expert validation recommended before including in analysis."
-
 def format_domain_expertises(expertises):
     """Format domain expertises into readable text."""
     if not expertises:
@@ -906,18 +958,36 @@ def generate_critique_explanation(category, critique):
     else:
         return "Consider this point to improve your causal analysis."
 
+def describe_factors(factors, descriptions=None):
+    """Return a prompt block with the known descriptions of the given factors, or an empty string."""
+    if descriptions is None:
+        descriptions = current_session().get('factor_descriptions') or {}
+    if not descriptions:
+        return ""
+    by_key = {normalize_name(name): desc for name, desc in descriptions.items() if desc}
+    lines = []
+    for factor in dict.fromkeys(factors):
+        desc = by_key.get(normalize_name(factor))
+        if desc:
+            if len(desc) > MAX_DESCRIPTION_LENGTH:
+                desc = desc[:MAX_DESCRIPTION_LENGTH].rstrip() + "..."
+            lines.append(f"- {factor}: {desc}")
+    if not lines:
+        return ""
+    return "\nVariable descriptions:\n" + "\n".join(lines)
+
 def suggest_variables_from_factors(factors, openai_api_key):
     """Use OpenAI to suggest treatment and outcome variables from the input factors."""
     if not factors:
         return None, None
     
     try:
-        client = get_openai_client()
+        client = get_llm_router()
         if not client:
             return None, None
             
         # Create a prompt for the OpenAI API
-        prompt = f"""Given these factors in a causal analysis context: {', '.join(factors)}
+        prompt = f"""Given these factors in a causal analysis context: {', '.join(factors)}{describe_factors(factors)}
 
 For a causal analysis similar to the example of how parental income and tutoring affect school quality and ultimately job offers through college admission, please identify:
 1. The most likely treatment variable (the cause/intervention)
@@ -931,8 +1001,8 @@ outcome: Job Offer
 
 Your response:"""
 
-        response = client.chat.completions.create(
-            model="gpt-4",
+        response = client.complete(
+            "variables",
             messages=[
                 {"role": "system", "content": "You are a causal inference expert helping to identify treatment and outcome variables."},
                 {"role": "user", "content": prompt}
@@ -947,12 +1017,13 @@ Your response:"""
         
         treatment = None
         outcome = None
+        index = get_variable_index(factors)
         
         for line in lines:
             if line.startswith('treatment:'):
-                treatment = line.replace('treatment:', '').strip()
+                treatment = index.canonicalize(line.replace('treatment:', ''))
             elif line.startswith('outcome:'):
-                outcome = line.replace('outcome:', '').strip()
+                outcome = index.canonicalize(line.replace('outcome:', ''))
         
         return treatment, outcome
         
@@ -974,14 +1045,14 @@ def suggest_confounders_from_factors(treatment, outcome, factors, openai_api_key
         return None
     
     try:
-        client = get_openai_client()
+        client = get_llm_router()
         if not client:
             return None
 
         prompt = f"""Given:
 - Treatment variable: {treatment}
 - Outcome variable: {outcome}
-- All factors: {', '.join(factors)}
+- All factors: {', '.join(factors)}{describe_factors(factors)}
 
 Please identify potential confounding variables that might affect both the treatment and outcome.
 Consider variables that could create spurious associations.
@@ -991,8 +1062,8 @@ Format your response as a list of confounders with confidence levels (high/mediu
 
 Your response:"""
 
-        response = client.chat.completions.create(
-            model="gpt-4",
+        response = client.complete(
+            "confounders",
             messages=[
                 {"role": "system", "content": "You are a causal inference expert helping to identify confounding variables."},
                 {"role": "user", "content": prompt}
@@ -1003,10 +1074,11 @@ Your response:"""
         
         # Parse the response
         try:
-            suggestion = response.choices[0].message.content.strip()
-            confounders = json.loads(suggestion)
-            return confounders
-        except json.JSONDecodeError:
+            confounders = parse_object(response.choices[0].message.content)
+            index = get_variable_index(factors)
+            return {index.canonicalize(name): level for name, level in confounders.items()}
+        except ValueError:
+            record_parse_failure("confounders")
             st.error("Error parsing the confounders suggestion. Please try again.")
             return None
             
@@ -1014,13 +1086,122 @@ Your response:"""
         st.error(f"Error suggesting confounders: {str(e)}")
         return None
 
+def parse_confounder_levels(suggestion):
+    """Parse a ``{"variable": "high"}`` confounder response, normalizing unknown levels to medium."""
+    levels = {}
+    for name, level in parse_object(suggestion).items():
+        level = str(level).strip().lower()
+        levels[str(name).strip()] = level if level in CONFOUNDER_LEVELS else "medium"
+    return levels
+
+def confounder_token_limit(chunk):
+    """Return a token limit that fits every candidate in ``chunk`` being named a confounder."""
+    # Each entry is written as "name": "medium", at about 3 characters per token; the rest is margin
+    return 64 + sum(len(name) + 14 for name in chunk) // 2
+
+def suggest_confounders_chunked(treatment, outcome, factors, openai_api_key, chunk_size=CONFOUNDER_CHUNK_SIZE, max_concurrency=4):
+    """Search the factor list for confounders in concurrent chunks and merge the results.
+    
+    Names are deduplicated through the variable index. A confounder named by
+    several chunks keeps its highest confidence level.
+    """
+    if not factors or not treatment or not outcome:
+        return None
+    
+    client = get_llm_router()
+    if not client:
+        return None
+    
+    index = get_variable_index(factors)
+    excluded = {index.canonicalize(treatment), index.canonicalize(outcome)}
+    candidates = [f for f in dict.fromkeys(f.strip() for f in factors if f.strip()) if f not in excluded]
+    if not candidates:
+        return {}
+    # Read in this thread; chunks run in worker threads without session state
+    descriptions = current_session().get('factor_descriptions') or {}
+    
+    def search_chunk(chunk):
+        prompt = f"""Given:
+- Treatment variable: {treatment}
+- Outcome variable: {outcome}
+- Candidate factors: {', '.join(chunk)}{describe_factors(chunk, descriptions)}
+
+Please identify which of the candidate factors are potential confounding variables that might affect both the treatment and outcome.
+Only include candidates that could create spurious associations; leave the others out.
+
+Format your response as a JSON object of confounders with confidence levels (high/medium/low) like this:
+{{"variable1": "high", "variable2": "medium"}}
+
+Return ONLY the JSON object, or {{}} if none of the candidates is a confounder."""
+
+        response = client.complete(
+            "confounders",
+            messages=[
+                {"role": "system", "content": "You are a causal inference expert helping to identify confounding variables."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=confounder_token_limit(chunk)
+        )
+        choice = response.choices[0]
+        if choice.finish_reason == "length":
+            # A cut-off object would silently drop the confounders after the cut
+            raise RuntimeError("The confounder answer was cut off by the token limit.")
+        return parse_confounder_levels(choice.message.content)
+    
+    results = run_concurrently(search_chunk, chunked(candidates, chunk_size), max_concurrency)
+    
+    confounders = {}
+    seen = {}
+    failed = 0
+    for chunk, levels, error in results:
+        if error is not None:
+            if isinstance(error, PARSE_ERRORS):
+                record_parse_failure("confounders")
+            failed += len(chunk)
+            continue
+        for name, level in levels.items():
+            name = index.canonicalize(name)
+            # Names outside the factor list are merged by their normalized spelling
+            name = seen.setdefault(normalize_name(name), name)
+            if name in excluded or not normalize_name(name):
+                continue
+            current = confounders.get(name)
+            if current is None or CONFOUNDER_LEVELS.index(level) < CONFOUNDER_LEVELS.index(current):
+                confounders[name] = level
+    
+    if failed == len(candidates):
+        st.error("Error suggesting confounders: every factor chunk failed. Please try again.")
+        return None
+    if failed:
+        st.warning(f"{failed} of {len(candidates)} factors could not be checked for confounding and were skipped.")
+    return dict(sorted(confounders.items(), key=lambda item: CONFOUNDER_LEVELS.index(item[1])))
+
+def parse_relationships_response(suggestion, factors=()):
+    """Parse a model response into a list of [source, target, confidence] relationships."""
+    index = get_variable_index(factors)
+    relationships = parse_list(suggestion)
+    
+    # Validate and format relationships
+    formatted_relationships = []
+    if isinstance(relationships, list):
+        for rel in relationships:
+            if isinstance(rel, (list, tuple)) and len(rel) >= 2:
+                # Map names back to the input factors and ensure numerical confidence
+                source = index.canonicalize(rel[0])
+                target = index.canonicalize(rel[1])
+                confidence = parse_confidence(rel[2]) if len(rel) > 2 else 0.5
+                formatted_relationships.append([source, target, confidence])
+    
+    return formatted_relationships
+
 def suggest_relationships_from_factors(treatment, outcome, factors, openai_api_key):
     """Use OpenAI to suggest pair-wise relationships for DAG."""
     if not factors or not treatment or not outcome:
         return None
     
     try:
-        client = get_openai_client()
+        client = get_llm_router()
         if not client:
             return None
 
@@ -1028,7 +1209,7 @@ def suggest_relationships_from_factors(treatment, outcome, factors, openai_api_k
         prompt = f"""Given these variables in a causal analysis context:
 - Treatment: {treatment}
 - Outcome: {outcome}
-- Other factors: {', '.join(f for f in factors if f not in [treatment, outcome])}
+- Other factors: {', '.join(f for f in factors if f not in [treatment, outcome])}{describe_factors(factors)}
 
 Please identify potential causal relationships between these variables.
 Focus on direct relationships and provide confidence scores.
@@ -1053,8 +1234,8 @@ Ensure:
 
 Your response:"""
 
-        response = client.chat.completions.create(
-            model="gpt-4",
+        response = client.complete(
+            "relationships",
             messages=[
                 {"role": "system", "content": "You are a causal inference expert. Provide relationships in the exact format requested."},
                 {"role": "user", "content": prompt}
@@ -1065,38 +1246,7 @@ Your response:"""
         
         # Parse the response
         try:
-            suggestion = response.choices[0].message.content.strip()
-            
-            # Clean up the response to handle common formatting issues
-            suggestion = suggestion.replace("'", '"')  # Replace single quotes with double quotes
-            suggestion = suggestion.replace("None", "null")  # Replace Python None with JSON null
-            
-            # Extract the list part from the response if there's additional text
-            import re
-            list_pattern = r'\[([\s\S]*)\]'  # Match everything between first [ and last ]
-            match = re.search(list_pattern, suggestion)
-            if match:
-                suggestion = f"[{match.group(1)}]"
-            
-            try:
-                # Try parsing as JSON first
-                relationships = json.loads(suggestion)
-            except json.JSONDecodeError:
-                # If JSON parsing fails, try evaluating as Python literal
-                import ast
-                relationships = ast.literal_eval(suggestion)
-            
-            # Validate and format relationships
-            formatted_relationships = []
-            if isinstance(relationships, list):
-                for rel in relationships:
-                    if isinstance(rel, (list, tuple)) and len(rel) >= 2:
-                        # Ensure proper string formatting and numerical confidence
-                        source = str(rel[0]).strip()
-                        target = str(rel[1]).strip()
-                        confidence = float(rel[2]) if len(rel) > 2 and rel[2] is not None else 0.5
-                        confidence = max(0.0, min(1.0, confidence))  # Clamp between 0 and 1
-                        formatted_relationships.append([source, target, confidence])
+            formatted_relationships = parse_relationships_response(response.choices[0].message.content, factors)
             
             if formatted_relationships:
                 return formatted_relationships
@@ -1105,6 +1255,7 @@ Your response:"""
                 return None
                 
         except Exception as e:
+            record_parse_failure("relationships")
             st.error(f"Error parsing relationships: {str(e)}")
             st.info("The model's response could not be properly parsed. Please try again.")
             return None
@@ -1113,203 +1264,579 @@ Your response:"""
         st.error(f"Error suggesting relationships: {str(e)}")
         return None
 
-def suggest_backdoor_from_factors(treatment, outcome, factors, openai_api_key):
-    """Use OpenAI to suggest backdoor adjustment set."""
-    if not factors or not treatment or not outcome:
+def suggest_relationships_for_new_factors(treatment, outcome, new_factors, existing_factors, openai_api_key):
+    """Use OpenAI to suggest only the relationships that involve newly added factors."""
+    if not new_factors or not treatment or not outcome:
         return None
     
     try:
-        client = get_openai_client()
+        client = get_llm_router()
         if not client:
             return None
 
-        prompt = f"""Given a causal analysis with:
-Treatment: {treatment}
-Outcome: {outcome}
-All factors: {', '.join(factors)}
+        new_example = new_factors[0]
+        prompt = f"""Given these variables in a causal analysis context:
+- Treatment: {treatment}
+- Outcome: {outcome}
+- Existing factors: {', '.join(f for f in existing_factors if f not in [treatment, outcome])}
+- Newly added factors: {', '.join(new_factors)}{describe_factors(list(existing_factors) + list(new_factors))}
 
-Please identify the backdoor adjustment set - variables that should be controlled for to estimate the causal effect of {treatment} on {outcome}.
+Relationships among the existing variables are already known.
+Please identify ONLY the direct causal relationships in which at least one of the newly added factors is the source or the target.
 
-Consider:
-1. Variables that affect both treatment and outcome
-2. Variables that create backdoor paths
-3. Variables that might confound the relationship
+Format your response EXACTLY as a list of lists, where each inner list contains:
+1. Source variable (string)
+2. Target variable (string)
+3. Confidence score (number between 0 and 1)
 
-Format your response as a list of variables with their roles, like this:
+Example format:
 [
-    ["parental_income", "affects both school quality and college admission"],
-    ["tutoring", "mediates between income and school quality"],
-    ["student_motivation", "affects both school performance and job prospects"]
+    ["{new_example}", "{outcome}", 0.6],
+    ["{treatment}", "{new_example}", 0.7]
 ]
 
 Your response:"""
 
-        response = client.chat.completions.create(
-            model="gpt-4",
+        response = client.complete(
+            "relationships",
             messages=[
-                {"role": "system", "content": "You are a causal inference expert helping to identify backdoor adjustment sets."},
+                {"role": "system", "content": "You are a causal inference expert. Provide relationships in the exact format requested."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
             max_tokens=200
         )
         
-        # Parse the response
         try:
-            suggestion = response.choices[0].message.content.strip()
-            
-            # Clean up the response
-            suggestion = suggestion.replace("'", '"')
-            
-            # Extract the list part from the response
-            import re
-            list_pattern = r'\[([\s\S]*)\]'
-            match = re.search(list_pattern, suggestion)
-            if match:
-                suggestion = f"[{match.group(1)}]"
-            
-            # Parse the response
-            try:
-                backdoor_set = json.loads(suggestion)
-            except json.JSONDecodeError:
-                import ast
-                backdoor_set = ast.literal_eval(suggestion)
-            
-            # Format the backdoor set
-            formatted_set = []
-            if isinstance(backdoor_set, list):
-                for var in backdoor_set:
-                    if isinstance(var, (list, tuple)) and len(var) >= 2:
-                        name = str(var[0]).strip()
-                        explanation = str(var[1]).strip()
-                        formatted_set.append({
-                            "name": name,
-                            "explanation": explanation,
-                            "confidence": "high" if "both" in explanation.lower() else "medium"
-                        })
-            
-            return formatted_set if formatted_set else None
-            
+            relationships = parse_relationships_response(
+                response.choices[0].message.content, list(existing_factors) + list(new_factors)
+            )
         except Exception as e:
-            st.error(f"Error parsing backdoor set suggestion: {str(e)}")
+            record_parse_failure("relationships")
+            st.error(f"Error parsing relationships for new factors: {str(e)}")
             return None
+        
+        # Keep only edges that actually touch a new factor
+        new_set = set(new_factors)
+        return [rel for rel in relationships if rel[0] in new_set or rel[1] in new_set]
             
     except Exception as e:
-        st.error(f"Error suggesting backdoor set: {str(e)}")
+        st.error(f"Error suggesting relationships for new factors: {str(e)}")
         return None
 
-def suggest_mediator_from_factors(treatment, outcome, factors, openai_api_key):
-    """Use OpenAI to suggest mediator variables."""
+def diff_factors(previous, current):
+    """Return (added, removed) factors between two factor lists, preserving order."""
+    # Compare normalized names so that re-spelling a factor is not treated as a change
+    previous_keys = {normalize_name(f) for f in previous}
+    current_keys = {normalize_name(f) for f in current}
+    added = [f for f in current if normalize_name(f) not in previous_keys]
+    removed = [f for f in previous if normalize_name(f) not in current_keys]
+    return added, removed
+
+def merge_relationships(existing, new, removed=(), factors=()):
+    """Merge new relationships into existing ones, dropping edges that touch removed factors."""
+    removed = {normalize_name(f) for f in removed}
+    index = get_variable_index(factors)
+    merged = {}
+    for rel in list(existing or []) + list(new or []):
+        source, target = index.canonicalize(rel[0]), index.canonicalize(rel[1])
+        if normalize_name(source) in removed or normalize_name(target) in removed:
+            continue
+        # Later suggestions replace earlier ones for the same edge
+        merged[(normalize_name(source), normalize_name(target))] = [source, target] + list(rel[2:])
+    return list(merged.values())
+
+def suggest_relationships_incremental(treatment, outcome, factors, openai_api_key, cache):
+    """Suggest relationships, only querying pairs that involve factors added since the last run.
+
+    ``cache`` is a dict holding the previous run's treatment, outcome, factors,
+    relationships, routed model and descriptions fingerprint. It is updated in
+    place after every successful run.
+    """
     if not factors or not treatment or not outcome:
-        st.warning("Missing required inputs: treatment, outcome, and factors are all required.")
+        return None
+    client = get_llm_router()
+    if not client:
         return None
     
-    try:
-        client = get_openai_client()
-        if not client:
-            return None
-
-        # Clean and validate inputs
-        treatment = treatment.strip()
-        outcome = outcome.strip()
-        factors = [f.strip() for f in factors if f.strip()]
-        
-        if not treatment or not outcome or not factors:
-            st.warning("Invalid inputs: treatment, outcome, and factors cannot be empty.")
-            return None
-
+    factors = [f.strip() for f in factors if f.strip()]
+    previous_factors = cache.get('factors')
+    model = client.model_for("relationships")
+    descriptions = fingerprint(current_session().get('factor_descriptions') or {})
+    
+    # A changed treatment, outcome, model or set of descriptions invalidates every cached edge
+    if (
+        previous_factors is None
+        or cache.get('treatment') != treatment
+        or cache.get('outcome') != outcome
+        or cache.get('model') != model
+        or cache.get('descriptions') != descriptions
+    ):
+        relationships = suggest_relationships_from_factors(treatment, outcome, factors, openai_api_key)
+    else:
+        added, removed = diff_factors(previous_factors, factors)
+        new_relationships = []
+        if added:
+            existing = [f for f in factors if f not in added]
+            new_relationships = suggest_relationships_for_new_factors(
+                treatment, outcome, added, existing, openai_api_key
+            )
+            if new_relationships is None:
+                return None
+        relationships = merge_relationships(cache.get('relationships'), new_relationships, removed, factors)
+    
+    if relationships is None:
+        return None
+    
+    cache.update({
+        'treatment': treatment,
+        'outcome': outcome,
+        'factors': factors,
+        'relationships': relationships,
+        'model': model,
+        'descriptions': descriptions,
+    })
+    return relationships
+
+def parse_pair_judgements(suggestion, batch):
+    """Parse a batched pair response into (source, target, direction, confidence) tuples."""
+    judgements = parse_list(suggestion)
+    
+    parsed = []
+    if isinstance(judgements, list):
+        for item in judgements:
+            if not isinstance(item, (list, tuple)) or len(item) < 2:
+                continue
+            try:
+                number = int(item[0])
+            except (ValueError, TypeError):
+                continue
+            if not 1 <= number <= len(batch):
+                continue
+            direction = str(item[1]).strip().lower()
+            confidence = parse_confidence(item[2]) if len(item) > 2 else 0.5
+            source, target = batch[number - 1]
+            parsed.append((source, target, direction, confidence))
+    return parsed
+
+def score_pairs_batched(treatment, outcome, factors, openai_api_key, pairs=None, batch_size=10, max_concurrency=4):
+    """Judge variable pairs k at a time with concurrent prompts and merge them into a ConfidenceMatrix."""
+    if not factors or not treatment or not outcome:
+        return None
+    
+    client = get_llm_router()
+    if not client:
+        return None
+    
+    variables = list(dict.fromkeys([treatment, outcome] + [f.strip() for f in factors if f.strip()]))
+    if pairs is None:
+        pairs = candidate_pairs(variables)
+    matrix = ConfidenceMatrix(variables)
+    if not pairs:
+        return matrix
+    # Read in this thread; batches run in worker threads without session state
+    descriptions = current_session().get('factor_descriptions') or {}
+    
+    def score_batch(batch):
+        pair_lines = "\n".join(f'{i}. "{a}" and "{b}"' for i, (a, b) in enumerate(batch, start=1))
         prompt = f"""Given a causal analysis with:
 Treatment: {treatment}
 Outcome: {outcome}
-All factors: {', '.join(factors)}
-
-Please identify potential mediator variables - variables that lie on the causal path between {treatment} and {outcome}.
 
-Consider the example of how school quality affects job offers through college admission:
-- College admission is a mediator because:
-  1. School quality affects college admission chances
-  2. College admission then affects job offers
-  3. It's on the causal path between treatment and outcome
+For each numbered pair of variables below, decide whether one directly causes the other:
+{pair_lines}{describe_factors([name for pair in batch for name in pair], descriptions)}
 
-Format your response EXACTLY as a JSON array of arrays, where each inner array contains:
-1. The name of the mediator variable (string)
-2. A brief explanation of its mediating role (string)
+Format your response EXACTLY as a JSON array with one entry per pair, where each entry contains:
+1. The pair number (integer)
+2. The direction: "forward" if the first variable causes the second, "backward" if the second causes the first, or "none" if there is no direct causal link
 3. A confidence score between 0 and 1 (number)
 
 Example format:
 [
-    ["college_admission", "mediates between school quality and job offers", 0.8],
-    ["academic_performance", "links school quality to college prospects", 0.7]
+    [1, "forward", 0.8],
+    [2, "none", 0.9]
 ]
 
-Important:
-- Return ONLY the JSON array, no additional text
-- Each mediator must have all three elements
-- Confidence scores must be between 0 and 1
-- Focus on variables that truly mediate between {treatment} and {outcome}"""
+Return ONLY the JSON array, no additional text."""
 
-        response = client.chat.completions.create(
-            model="gpt-4",
+        response = client.complete(
+            "relationship_pairs",
             messages=[
                 {"role": "system", "content": "You are a causal inference expert. Return ONLY the requested JSON array format, no additional text."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.7,
-            max_tokens=300  # Increased for better response
+            # An entry such as [10, "backward", 0.85], takes about 10 tokens; the rest is margin
+            max_tokens=64 + 20 * len(batch)
         )
-        
+        choice = response.choices[0]
+        if choice.finish_reason == "length":
+            raise RuntimeError("The pair judgements were cut off by the token limit.")
+        return parse_pair_judgements(choice.message.content, batch)
+    
+    results = run_concurrently(score_batch, chunked(pairs, batch_size), max_concurrency)
+    
+    failed = 0
+    for batch, judgements, error in results:
+        if error is not None:
+            if isinstance(error, PARSE_ERRORS):
+                record_parse_failure("relationship_pairs")
+            failed += len(batch)
+            continue
+        # Pairs the model skipped were not evaluated either
+        answered = {(source, target) for source, target, _, _ in judgements}
+        failed += sum(1 for pair in batch if tuple(pair) not in answered)
+        for source, target, direction, confidence in judgements:
+            if direction == "forward":
+                matrix.set(source, target, confidence)
+            elif direction == "backward":
+                matrix.set(target, source, confidence)
+            else:
+                matrix.mark_evaluated(source, target)
+    
+    if failed == len(pairs):
+        st.error("Error suggesting relationships: every pair batch failed. Please try again.")
+        return None
+    if failed:
+        st.warning(f"{failed} of {len(pairs)} variable pairs could not be evaluated and were skipped.")
+    return matrix
+
+def pair_constraints_from_inputs(variables):
+    """Build edge constraints from the constraint inputs, with names mapped to the variables."""
+    index = get_variable_index(variables)
+    return PairConstraints(
+        forbidden=parse_edge_lines(st.session_state.get('forbidden_edges', ''), index.canonicalize),
+        required=parse_edge_lines(st.session_state.get('required_edges', ''), index.canonicalize),
+        tiers=parse_tiers(st.session_state.get('temporal_tiers', ''), index.canonicalize)
+    )
+
+def prefilter_candidate_pairs(treatment, outcome, factors, budget=DEFAULT_PAIR_BUDGET, dataset=None, constraints=None):
+    """Score every variable pair without the LLM and keep the best ``budget`` pairs for it to judge."""
+    variables = list(dict.fromkeys([treatment, outcome] + [f.strip() for f in factors if f.strip()]))
+    score = lexical_scorer(variables, current_session().get('factor_descriptions'))
+    if dataset:
         try:
-            suggestion = response.choices[0].message.content.strip()
-            
-            # Clean up the response
-            suggestion = suggestion.replace("'", '"')  # Replace single quotes with double quotes
-            suggestion = suggestion.replace("\n", " ")  # Remove newlines
-            suggestion = suggestion.replace("\t", " ")  # Remove tabs
-            
-            # Extract just the array part if there's additional text
-            import re
-            array_pattern = r'\[[\s\S]*\]'  # Less greedy pattern that matches the outermost brackets
-            match = re.search(array_pattern, suggestion)
-            if not match:
-                st.warning("Could not find a valid array in the response.")
-                return None
-                
-            suggestion = match.group(0)
-            
-            # Try parsing as JSON first
-            try:
-                mediators = json.loads(suggestion)
-            except json.JSONDecodeError:
-                # If JSON fails, try Python literal evaluation
-                try:
-                    import ast
-                    mediators = ast.literal_eval(suggestion)
-                except:
-                    st.warning("Could not parse the mediator suggestions. Please try again.")
-                    return None
-            
-            # Validate and clean the mediators
-            if not isinstance(mediators, list):
-                st.warning("Invalid response format. Expected a list of mediator variables.")
-                return None
-            
-            valid_mediators = []
+            column_index = get_variable_index(dataset["columns"])
+            score = correlation_scorer(dataset["data"], dataset["columns"], variables, column_index.lookup, score)
+        except (DatasetError, ValueError) as e:
+            st.warning(f"Could not screen pairs with the dataset, using variable names instead: {str(e)}")
+    pairs, settled = select_pairs(variables, score, budget, constraints, keep=[(treatment, outcome)])
+    total = len(variables) * (len(variables) - 1) // 2
+    st.caption(
+        f"Judging {len(pairs)} of {total} variable pairs"
+        + (f"; {settled} settled by your edge constraints." if settled else ".")
+    )
+    return pairs
+
+def assign_factor_domains(factors, domains, openai_api_key, chunk_size=40, max_concurrency=4):
+    """Ask which of the given domains each factor belongs to. Returns ``{factor: domain}``."""
+    client = get_llm_router()
+    if not client or not factors or not domains:
+        return {}
+    
+    domain_by_key = {normalize_name(domain): domain for domain in domains}
+    domain_lines = "\n".join(f"- {domain}" for domain in domains)
+    
+    def assign_chunk(chunk):
+        factor_lines = "\n".join(f"{i}. {factor}" for i, factor in enumerate(chunk, start=1))
+        prompt = f"""Assign each numbered variable below to the one domain it belongs to most:
+{factor_lines}
+
+Domains:
+{domain_lines}
+
+Format your response EXACTLY as a JSON array with one entry per variable, where each entry contains:
+1. The variable number (integer)
+2. The domain name, exactly as listed (string)
+
+Return ONLY the JSON array, no additional text."""
+
+        response = client.complete(
+            "relationships",
+            messages=[
+                {"role": "system", "content": "You are a domain expert. Return ONLY the requested JSON array format, no additional text."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.2,
+            max_tokens=20 + 10 * len(chunk)
+        )
+        assignments = parse_list(response.choices[0].message.content)
+        assigned = {}
+        for item in assignments if isinstance(assignments, list) else []:
+            if isinstance(item, (list, tuple)) and len(item) >= 2:
+                try:
+                    number = int(item[0])
+                except (ValueError, TypeError):
+                    continue
+                domain = domain_by_key.get(normalize_name(item[1]))
+                if domain and 1 <= number <= len(chunk):
+                    assigned[chunk[number - 1]] = domain
+        return assigned
+    
+    domains_by_factor = {}
+    for _, assigned, error in run_concurrently(assign_chunk, chunked(factors, chunk_size), max_concurrency):
+        if error is None:
+            domains_by_factor.update(assigned)
+    return domains_by_factor
+
+def domain_names(expertises):
+    """Return the domain names of a domain expertise suggestion, a list or a dict keyed by domain."""
+    if isinstance(expertises, (list, tuple, dict)):
+        return [str(domain).strip() for domain in expertises if str(domain).strip()]
+    return []
+
+def suggest_relationships_clustered(treatment, outcome, factors, openai_api_key, cluster_by="name",
+                                    cluster_size=DEFAULT_CLUSTER_SIZE, batch_size=10, max_concurrency=4):
+    """Suggest relationships in two levels: edges within factor clusters, then between cluster representatives.
+    
+    ``cluster_by`` is "name" to group factors by shared name words, or
+    "domain" to group them by the suggested domain expertises.
+    """
+    if not factors or not treatment or not outcome:
+        return None
+    
+    client = get_llm_router()
+    if not client:
+        return None
+    
+    variables = list(dict.fromkeys([treatment, outcome] + [f.strip() for f in factors if f.strip()]))
+    clusters = None
+    if cluster_by == "domain":
+        domains = domain_names(st.session_state.get('domain_expertises'))
+        if domains:
+            clusters = cluster_by_domain(variables, assign_factor_domains(variables, domains, openai_api_key), cluster_size)
+        else:
+            st.info("No domain expertises suggested yet; grouping factors by name instead.")
+    if clusters is None:
+        clusters = cluster_by_name(variables, cluster_size)
+    # Read in this thread; clusters run in worker threads without session state
+    descriptions = current_session().get('factor_descriptions') or {}
+    
+    def discover_cluster(cluster):
+        prompt = f"""Given a causal analysis with:
+Treatment: {treatment}
+Outcome: {outcome}
+
+Please identify the direct causal relationships among ONLY these variables:
+{', '.join(cluster)}{describe_factors(cluster, descriptions)}
+
+Format your response EXACTLY as a list of lists, where each inner list contains:
+1. Source variable (string)
+2. Target variable (string)
+3. Confidence score (number between 0 and 1)
+
+Example format:
+[
+    ["factor1", "factor2", 0.8],
+    ["factor3", "factor1", 0.6]
+]
+
+Return ONLY the list, or [] if none of these variables directly causes another."""
+
+        response = client.complete(
+            "relationships",
+            messages=[
+                {"role": "system", "content": "You are a causal inference expert. Provide relationships in the exact format requested."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=40 + 25 * len(cluster)
+        )
+        members = set(cluster)
+        return [
+            rel for rel in parse_relationships_response(response.choices[0].message.content, variables)
+            if rel[0] in members and rel[1] in members
+        ]
+    
+    results = run_concurrently(discover_cluster, [c for c in clusters if len(c) > 1], max_concurrency)
+    intra_edges = []
+    failed = 0
+    for cluster, edges, error in results:
+        if error is not None:
+            if isinstance(error, PARSE_ERRORS):
+                record_parse_failure("relationships")
+            failed += 1
+            continue
+        intra_edges.extend(edges)
+    if results and failed == len(results):
+        st.error("Error suggesting relationships: every cluster query failed. Please try again.")
+        return None
+    if failed:
+        st.warning(f"{failed} of {len(results)} factor clusters could not be analyzed and were skipped.")
+    
+    # Only the representatives of different clusters are judged pairwise, plus the treatment
+    # and outcome against every factor, so their edges never depend on who represents a cluster
+    pairs = inter_cluster_pairs([
+        representatives(cluster, intra_edges, required=(treatment, outcome)) for cluster in clusters
+    ])
+    pairs += anchor_pairs(variables, (treatment, outcome), exclude=pairs)
+    matrix = score_pairs_batched(
+        treatment, outcome, variables, openai_api_key,
+        pairs=pairs, batch_size=batch_size, max_concurrency=max_concurrency
+    )
+    if matrix is None:
+        return None
+    for source, target, confidence in intra_edges:
+        matrix.set(source, target, confidence)
+    
+    st.caption(
+        f"Grouped {len(variables)} variables into {len(clusters)} clusters: "
+        f"{len(results)} cluster prompts and {len(pairs)} representative and treatment/outcome pairs in "
+        f"{len(chunked(pairs, batch_size))} batched prompts."
+    )
+    return matrix.edges() or None
+
+def suggest_backdoor_from_factors(treatment, outcome, factors, openai_api_key):
+    """Use OpenAI to suggest backdoor adjustment set."""
+    if not factors or not treatment or not outcome:
+        return None
+    
+    try:
+        client = get_llm_router()
+        if not client:
+            return None
+
+        prompt = f"""Given a causal analysis with:
+Treatment: {treatment}
+Outcome: {outcome}
+All factors: {', '.join(factors)}{describe_factors(factors)}
+
+Please identify the backdoor adjustment set - variables that should be controlled for to estimate the causal effect of {treatment} on {outcome}.
+
+Consider:
+1. Variables that affect both treatment and outcome
+2. Variables that create backdoor paths
+3. Variables that might confound the relationship
+
+Format your response as a list of variables with their roles, like this:
+[
+    ["parental_income", "affects both school quality and college admission"],
+    ["tutoring", "mediates between income and school quality"],
+    ["student_motivation", "affects both school performance and job prospects"]
+]
+
+Your response:"""
+
+        response = client.complete(
+            "backdoor",
+            messages=[
+                {"role": "system", "content": "You are a causal inference expert helping to identify backdoor adjustment sets."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=200
+        )
+        
+        # Parse the response
+        try:
+            backdoor_set = parse_list(response.choices[0].message.content)
+            
+            # Format the backdoor set, mapping names back to the input factors
+            index = get_variable_index(factors)
+            formatted_set = []
+            if isinstance(backdoor_set, list):
+                for var in backdoor_set:
+                    if isinstance(var, (list, tuple)) and len(var) >= 2:
+                        name = index.canonicalize(var[0])
+                        explanation = str(var[1]).strip()
+                        formatted_set.append({
+                            "name": name,
+                            "explanation": explanation,
+                            "confidence": "high" if "both" in explanation.lower() else "medium"
+                        })
+            
+            return formatted_set if formatted_set else None
+            
+        except Exception as e:
+            record_parse_failure("backdoor")
+            st.error(f"Error parsing backdoor set suggestion: {str(e)}")
+            return None
+            
+    except Exception as e:
+        st.error(f"Error suggesting backdoor set: {str(e)}")
+        return None
+
+def suggest_mediator_from_factors(treatment, outcome, factors, openai_api_key):
+    """Use OpenAI to suggest mediator variables."""
+    if not factors or not treatment or not outcome:
+        st.warning("Missing required inputs: treatment, outcome, and factors are all required.")
+        return None
+    
+    try:
+        client = get_llm_router()
+        if not client:
+            return None
+
+        # Clean and validate inputs
+        treatment = treatment.strip()
+        outcome = outcome.strip()
+        factors = [f.strip() for f in factors if f.strip()]
+        
+        if not treatment or not outcome or not factors:
+            st.warning("Invalid inputs: treatment, outcome, and factors cannot be empty.")
+            return None
+
+        prompt = f"""Given a causal analysis with:
+Treatment: {treatment}
+Outcome: {outcome}
+All factors: {', '.join(factors)}{describe_factors(factors)}
+
+Please identify potential mediator variables - variables that lie on the causal path between {treatment} and {outcome}.
+
+Consider the example of how school quality affects job offers through college admission:
+- College admission is a mediator because:
+  1. School quality affects college admission chances
+  2. College admission then affects job offers
+  3. It's on the causal path between treatment and outcome
+
+Format your response EXACTLY as a JSON array of arrays, where each inner array contains:
+1. The name of the mediator variable (string)
+2. A brief explanation of its mediating role (string)
+3. A confidence score between 0 and 1 (number)
+
+Example format:
+[
+    ["college_admission", "mediates between school quality and job offers", 0.8],
+    ["academic_performance", "links school quality to college prospects", 0.7]
+]
+
+Important:
+- Return ONLY the JSON array, no additional text
+- Each mediator must have all three elements
+- Confidence scores must be between 0 and 1
+- Focus on variables that truly mediate between {treatment} and {outcome}"""
+
+        response = client.complete(
+            "mediators",
+            messages=[
+                {"role": "system", "content": "You are a causal inference expert. Return ONLY the requested JSON array format, no additional text."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=300  # Increased for better response
+        )
+        
+        try:
+            try:
+                mediators = parse_list(response.choices[0].message.content)
+            except ValueError:
+                record_parse_failure("mediators")
+                st.warning("Could not parse the mediator suggestions. Please try again.")
+                return None
+            
+            # Map names back to the input factors
+            index = get_variable_index(factors)
+            valid_mediators = []
             for mediator in mediators:
                 try:
                     if not isinstance(mediator, (list, tuple)) or len(mediator) < 3:
                         continue
                     
-                    name = str(mediator[0]).strip()
+                    name = index.canonicalize(mediator[0])
                     explanation = str(mediator[1]).strip()
                     
-                    try:
-                        score = float(mediator[2])
-                        score = max(0.0, min(1.0, score))  # Clamp between 0 and 1
-                    except (ValueError, TypeError):
-                        score = 0.5  # Default score if invalid
-                    
                     if name and explanation:  # Only include if we have at least a name and explanation
-                        valid_mediators.append([name, explanation, score])
+                        valid_mediators.append([name, explanation, parse_confidence(mediator[2])])
                 except Exception as e:
                     continue  # Skip invalid mediators instead of failing
             
@@ -1334,7 +1861,7 @@ def suggest_iv_from_factors(treatment, outcome, factors, openai_api_key):
         return None
     
     try:
-        client = get_openai_client()
+        client = get_llm_router()
         if not client:
             return None
 
@@ -1350,7 +1877,7 @@ def suggest_iv_from_factors(treatment, outcome, factors, openai_api_key):
         prompt = f"""Given a causal analysis with:
 Treatment: {treatment}
 Outcome: {outcome}
-All factors: {', '.join(factors)}
+All factors: {', '.join(factors)}{describe_factors(factors)}
 
 Please identify potential instrumental variables (IVs) that could help estimate the causal effect of {treatment} on {outcome}.
 
@@ -1378,8 +1905,8 @@ Example format:
 
 Ensure your response is a valid JSON array and includes ONLY the array, no additional text."""
 
-        response = client.chat.completions.create(
-            model="gpt-4",
+        response = client.complete(
+            "ivs",
             messages=[
                 {"role": "system", "content": "You are a causal inference expert. Return ONLY the requested JSON array format, no additional text."},
                 {"role": "user", "content": prompt}
@@ -1389,94 +1916,31 @@ Ensure your response is a valid JSON array and includes ONLY the array, no addit
         )
         
         try:
-            suggestion = response.choices[0].message.content.strip()
-            
-            # Clean up the response
-            suggestion = suggestion.replace("'", '"')  # Replace single quotes with double quotes
-            suggestion = suggestion.replace("\n", " ")  # Remove newlines
-            suggestion = suggestion.replace("\t", " ")  # Remove tabs
-            
-            # Extract just the array part if there's additional text
-            import re
-            array_pattern = r'\[(.*)\]'
-            match = re.search(array_pattern, suggestion)
-            if not match:
-                st.warning("Could not find a valid array in the response.")
+            try:
+                ivs = parse_list(response.choices[0].message.content)
+            except ValueError:
+                record_parse_failure("ivs")
+                st.warning("Could not parse the IV suggestions. Please try again.")
                 return None
-                
-            suggestion = f"[{match.group(1)}]"
             
-            try:
-                # Try parsing as JSON first
-                ivs = json.loads(suggestion)
-                
-                # Validate the structure
-                if not isinstance(ivs, list):
-                    st.warning("Invalid response format. Expected a list of instrumental variables.")
-                    return None
-                
-                # Clean and validate each IV
-                valid_ivs = []
-                for iv in ivs:
-                    if not isinstance(iv, list) or len(iv) < 3:
-                        continue
-                        
-                    name = str(iv[0]).strip()
-                    explanation = str(iv[1]).strip()
-                    
-                    try:
-                        score = float(iv[2])
-                        score = max(0.0, min(1.0, score))  # Clamp between 0 and 1
-                    except (ValueError, TypeError):
-                        score = 0.5
+            # Map names back to the input factors
+            index = get_variable_index(factors)
+            valid_ivs = []
+            for iv in ivs:
+                if not isinstance(iv, (list, tuple)) or len(iv) < 3:
+                    continue
                     
-                    if name and explanation:  # Only include if we have at least a name and explanation
-                        valid_ivs.append([name, explanation, score])
+                name = index.canonicalize(iv[0])
+                explanation = str(iv[1]).strip()
                 
-                if not valid_ivs:
-                    st.warning("No valid instrumental variables could be extracted from the response.")
-                    return None
-                    
-                return valid_ivs
+                if name and explanation:  # Only include if we have at least a name and explanation
+                    valid_ivs.append([name, explanation, parse_confidence(iv[2])])
+            
+            if not valid_ivs:
+                st.warning("No valid instrumental variables could be extracted from the response.")
+                return None
                 
-            except json.JSONDecodeError:
-                # If JSON fails, try Python literal evaluation
-                import ast
-                try:
-                    ivs = ast.literal_eval(suggestion)
-                    
-                    # Apply the same validation as above
-                    if not isinstance(ivs, list):
-                        st.warning("Invalid response format. Expected a list of instrumental variables.")
-                        return None
-                    
-                    # Clean and validate each IV
-                    valid_ivs = []
-                    for iv in ivs:
-                        if not isinstance(iv, list) or len(iv) < 3:
-                            continue
-                            
-                        name = str(iv[0]).strip()
-                        explanation = str(iv[1]).strip()
-                        
-                        try:
-                            score = float(iv[2])
-                            score = max(0.0, min(1.0, score))  # Clamp between 0 and 1
-                        except (ValueError, TypeError):
-                            score = 0.5
-                        
-                        if name and explanation:  # Only include if we have at least a name and explanation
-                            valid_ivs.append([name, explanation, score])
-                    
-                    if not valid_ivs:
-                        st.warning("No valid instrumental variables could be extracted from the response.")
-                        return None
-                        
-                    return valid_ivs
-                    
-                except:
-                    st.warning("Could not parse the IV suggestions. Please try again.")
-                    return None
+            return valid_ivs
             
         except Exception as e:
             st.error(f"Error processing IV suggestions: {str(e)}")
@@ -1521,62 +1985,15 @@ def format_mediator_output(mediators):
         for med in mediators:
             if isinstance(med, (list, tuple)) and len(med) >= 2:
                 mediator = str(med[0]).strip()
-                explanation = str(med[1]).strip()
-                confidence = float(med[2]) if len(med) > 2 else 0.5
-                
-                # Add mediator node
                 dot.node(mediator, mediator)
-                
-                # Add edges
                 dot.edge(treatment, mediator)
                 dot.edge(mediator, outcome)
-                
-                # Format confidence level
-                if confidence > 0.7:
-                    confidence_level = "high"
-                    confidence_color = "#27ae60"
-                elif confidence > 0.4:
-                    confidence_level = "medium"
-                    confidence_color = "#f39c12"
-                else:
-                    confidence_level = "low"
-                    confidence_color = "#e74c3c"
-                
-                # Display mediator information
-                with st.expander(f"🔄 {mediator} (Mediator)", expanded=True):
-                    st.markdown(f"""
-                        <div style='color: {confidence_color}; font-weight: bold; margin-bottom: 10px;'>
-                            Confidence Level: {confidence_level.title()}
-                            <br>
-                            Mediation Strength: {confidence:.2f}
-                        </div>
-                    """, unsafe_allow_html=True)
-                    
-                    st.markdown(f"**Role:** {explanation}")
-                    st.markdown("""
-                        **Mediation Path:**
-                        1. Treatment → Mediator
-                        2. Mediator → Outcome
-                    """)
         
         # Display the visualization
         st.graphviz_chart(dot)
         
-        # Add explanation
-        with st.expander("🔍 Understanding Mediation", expanded=True):
-            st.markdown("""
-            ### What are Mediator Variables?
-            Mediator variables help explain *how* or *why* the treatment affects the outcome:
-            1. They are affected by the treatment
-            2. They in turn affect the outcome
-            3. They represent the mechanism of the causal effect
-            
-            ### How to Use Mediators
-            - Include them in path analysis
-            - Test for indirect effects
-            - Consider them in intervention design
-            - Use them to understand causal mechanisms
-            """)
+        # Mediator details and explanation in one block
+        st.markdown(result_panel_html("mediators", mediators), unsafe_allow_html=True)
         
     except Exception as e:
         st.error(f"Error formatting mediators: {str(e)}")
@@ -1593,6 +2010,18 @@ def format_iv_output(ivs):
             st.warning("Invalid IV data structure. Expected a list of instrumental variables.")
             return None
         
+        # Add treatment and outcome nodes
+        treatment = st.session_state.treatment_input
+        outcome = st.session_state.outcome_input
+        if not treatment or not outcome:
+            st.warning("Treatment or outcome variable is missing.")
+            return None
+        
+        panel, valid_ivs = result_panel_html("ivs", ivs)
+        if not valid_ivs:
+            st.warning("No valid instrumental variables could be processed. Please check the data format.")
+            return None
+        
         # Create visualization
         dot = graphviz.Digraph()
         dot.attr(rankdir='LR')
@@ -1612,468 +2041,26 @@ def format_iv_output(ivs):
             penwidth='2'
         )
         
-        # Add treatment and outcome nodes
-        treatment = st.session_state.treatment_input
-        outcome = st.session_state.outcome_input
-        if not treatment or not outcome:
-            st.warning("Treatment or outcome variable is missing.")
-            return None
-            
         dot.node(treatment, treatment)
         dot.node(outcome, outcome)
         
-        # Track if any valid IVs were processed
-        valid_ivs_found = False
-        
-        # Add IV nodes and edges
+        # Add IV nodes and edges (only to treatment)
         for iv in ivs:
-            try:
-                if not isinstance(iv, (list, tuple)) or len(iv) < 2:
-                    continue
-                
+            if isinstance(iv, (list, tuple)) and len(iv) >= 2 and str(iv[0]).strip():
                 iv_name = str(iv[0]).strip()
-                if not iv_name:
-                    continue
-                    
-                explanation = str(iv[1]).strip()
-                try:
-                    validity = float(iv[2]) if len(iv) > 2 else 0.5
-                    validity = max(0.0, min(1.0, validity))  # Clamp between 0 and 1
-                except (ValueError, TypeError):
-                    validity = 0.5
-                
-                # Add IV node
                 dot.node(iv_name, iv_name)
-                
-                # Add edge (only to treatment)
                 dot.edge(iv_name, treatment)
-                
-                # Format validity level
-                if validity > 0.7:
-                    validity_level = "high"
-                    validity_color = "#27ae60"
-                elif validity > 0.4:
-                    validity_level = "medium"
-                    validity_color = "#f39c12"
-                else:
-                    validity_level = "low"
-                    validity_color = "#e74c3c"
-                
-                # Display IV information
-                with st.expander(f"🎯 {iv_name} (Instrumental Variable)", expanded=True):
-                    st.markdown(f"""
-                        <div style='color: {validity_color}; font-weight: bold; margin-bottom: 10px;'>
-                            Validity Level: {validity_level.title()}
-                            <br>
-                            Instrument Strength: {validity:.2f}
-                        </div>
-                    """, unsafe_allow_html=True)
-                    
-                    st.markdown(f"**Justification:** {explanation}")
-                    st.markdown("""
-                        **IV Assumptions:**
-                        1. ✓ Affects treatment
-                        2. ✓ No direct effect on outcome
-                        3. ✓ Independent of confounders
-                    """)
-                
-                valid_ivs_found = True
-                
-            except Exception as e:
-                st.warning(f"Skipped invalid IV entry: {str(e)}")
-                continue
-        
-        if not valid_ivs_found:
-            st.warning("No valid instrumental variables could be processed. Please check the data format.")
-            return None
         
         # Display the visualization
         st.graphviz_chart(dot)
         
-        # Add explanation
-        with st.expander("🔍 Understanding Instrumental Variables", expanded=True):
-            st.markdown("""
-            ### What are Instrumental Variables?
-            IVs help estimate causal effects when there are unmeasured confounders:
-            1. They influence the treatment
-            2. They only affect the outcome through the treatment
-            3. They are independent of confounders
-            
-            ### How to Use IVs
-            - Use them in IV regression
-            - Test instrument strength
-            - Validate exclusion restriction
-            - Consider multiple instruments if available
-            """)
+        # IV details and explanation in one block
+        st.markdown(panel, unsafe_allow_html=True)
         
     except Exception as e:
         st.error(f"Error formatting instrumental variables: {str(e)}")
         return None
 
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-
-if not openai_api_key:
-    st.error(OPENAI_API_KEY_ERROR)
-else:
-    # Main title and attribution
-    st.markdown('<h1 class="main-title">PyWhy-LLM Causal Analysis Assistant</h1>', unsafe_allow_html=True)
-    st.markdown('<p class="attribution">(Created by <a href="https://www.linkedin.com/in/syedalihasannaqvi/" target="_blank">Syed Hasan</a>)</p>', unsafe_allow_html=True)
-    
-    # Introduction section
-    st.markdown('<h2 class="section-header">Welcome to PyWhy-LLM</h2>', unsafe_allow_html=True)
-    with st.expander("ℹ️ What is PyWhy-LLM?", expanded=True):
-        st.markdown("""
-        <div class="info-box">
-        <p>PyWhy-LLM is an innovative tool that combines Large Language Models (LLMs) with causal analysis to help researchers and analysts:</p>
-        <ul>
-            <li>Identify potential causal relationships</li>
-            <li>Suggest confounding variables</li>
-            <li>Validate causal assumptions</li>
-            <li>Build and critique DAGs (Directed Acyclic Graphs)</li>
-        </ul>
-        </div>
-        """, unsafe_allow_html=True)
-
-    # Quick Start Guide
-    st.markdown('<h2 class="section-header">Quick Start Guide</h2>', unsafe_allow_html=True)
-    with st.expander("📚 How to Use PyWhy-LLM", expanded=True):
-        st.markdown("""
-        <div class="step-box">
-        <ol>
-            <li>Select your analysis step from the sidebar</li>
-            <li>Enter your variables and factors in the input fields</li>
-            <li>Follow the step-by-step process for your chosen analysis</li>
-            <li>Review and interpret the results</li>
-        </ol>
-        </div>
-        """, unsafe_allow_html=True)
-
-    # Initialize session state variables if they don't exist
-    if 'suggested_treatment' not in st.session_state:
-        st.session_state.suggested_treatment = ""
-    if 'suggested_outcome' not in st.session_state:
-        st.session_state.suggested_outcome = ""
-    if 'factors_input' not in st.session_state:
-        st.session_state.factors_input = ""
-    if 'treatment_input' not in st.session_state:
-        st.session_state.treatment_input = ""
-    if 'outcome_input' not in st.session_state:
-        st.session_state.outcome_input = ""
-
-    # Main Analysis Interface
-    col1, col2 = st.columns([1, 2])
-    
-    with col1:
-        st.markdown('<h2 class="section-header">Analysis Configuration</h2>', unsafe_allow_html=True)
-        
-        llm_model = st.selectbox("Choose LLM Model", ["gpt-4"])
-        
-        analysis_type = st.selectbox(
-            "📊 Choose Analysis Step",
-            ["Model Suggestion", "Identification Suggestion", "Validation Suggestion"]
-        )
-        
-        st.markdown('<h3 class="section-header">Variables Input</h3>', unsafe_allow_html=True)
-        
-        factors_help = """
-        Examples by domain:
-        • Medical: "smoking, lung cancer, exercise habits, air pollution"
-        • Education: "study hours, test scores, sleep quality, stress"
-        • Economics: "interest rates, inflation, unemployment, gdp"
-        • Environmental: "co2 emissions, temperature, deforestation, rainfall"
-        """
-        
-        all_factors_str = st.text_area(
-            "📝 Enter all relevant factors (comma-separated):", 
-            value=st.session_state.factors_input,
-            help=factors_help,
-            key="factors_area"
-        )
-        
-        # Update session state for factors
-        if all_factors_str != st.session_state.factors_input:
-            st.session_state.factors_input = all_factors_str
-        
-        all_factors = [factor.strip() for factor in all_factors_str.split(',') if factor.strip()]
-
-        # Add a button to suggest variables
-        if st.button("🎯 Suggest Treatment and Outcome Variables"):
-            if all_factors:
-                with st.spinner("Analyzing factors to suggest variables..."):
-                    try:
-                        suggested_treatment, suggested_outcome = suggest_variables_from_factors(all_factors, openai_api_key)
-                        if suggested_treatment and suggested_outcome:
-                            st.session_state.suggested_treatment = suggested_treatment
-                            st.session_state.suggested_outcome = suggested_outcome
-                            st.session_state.treatment_input = suggested_treatment
-                            st.session_state.outcome_input = suggested_outcome
-                            st.success(f"Variables suggested! Treatment: {suggested_treatment}, Outcome: {suggested_outcome}")
-                        else:
-                            st.warning("Could not generate suggestions. Please check your input factors.")
-                    except Exception as e:
-                        st.error(f"Error during suggestion: {str(e)}")
-            else:
-                st.warning(MISSING_FACTORS_ERROR)
-
-        # Treatment input with session state
-        treatment = st.text_input(
-            "🎯 Enter the treatment variable:",
-            value=st.session_state.treatment_input,
-            help="The variable whose effect you want to study.",
-            key="treatment_field"
-        )
-        
-        # Update session state for treatment
-        if treatment != st.session_state.treatment_input:
-            st.session_state.treatment_input = treatment
-
-        # Outcome input with session state
-        outcome = st.text_input(
-            "🎯 Enter the outcome variable:",
-            value=st.session_state.outcome_input,
-            help="The variable you want to measure the effect on.",
-            key="outcome_field"
-        )
-        
-        # Update session state for outcome
-        if outcome != st.session_state.outcome_input:
-            st.session_state.outcome_input = outcome
-
-    with col2:
-        st.markdown('<h2 class="section-header">Analysis Steps</h2>', unsafe_allow_html=True)
-        
-        # Initialize session state
-        if 'domain_expertises' not in st.session_state:
-            st.session_state.domain_expertises = None
-
-        if analysis_type == "Model Suggestion":
-            st.markdown('<div class="model-step-title">🔍 Model Suggestion Step</div>', unsafe_allow_html=True)
-            st.markdown("""
-            <div class="info-box">
-            Build your initial causal model through these steps:
-            <ol>
-                <li>Identify required domain expertise</li>
-                <li>Discover potential confounding variables</li>
-                <li>Establish pair-wise relationships between variables</li>
-            </ol>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            modeler = ModelSuggester(llm_model)
-
-            if st.button("Suggest Domain Expertises"):
-                if all_factors:
-                    st.session_state.domain_expertises = modeler.suggest_domain_expertises(all_factors)
-                    st.subheader("Suggested Domain Expertises:")
-                    formatted_expertises = format_domain_expertises(st.session_state.domain_expertises)
-                    st.markdown(formatted_expertises)
-                else:
-                    st.warning("Please enter the relevant factors.")
-
-            if st.button("Suggest Potential Confounders"):
-                if all_factors and treatment and outcome:
-                    with st.spinner("Analyzing potential confounding variables..."):
-                        try:
-                            suggested_confounders = suggest_confounders_from_factors(
-                                treatment, outcome, all_factors, openai_api_key
-                            )
-                            if suggested_confounders:
-                                st.subheader("Potential Confounding Variables")
-                                formatted_confounders = format_confounder_output(suggested_confounders)
-                                st.markdown(formatted_confounders)
-                        except Exception as e:
-                            st.error(f"Error during confounders suggestion: {str(e)}")
-                else:
-                    st.warning(MISSING_VARIABLES_ERROR)
-
-            if st.button("Suggest Pair-wise Relationships (DAG)"):
-                if all_factors and treatment and outcome:
-                    if not openai_api_key:
-                        st.error("Please set your OpenAI API key in the environment variables.")
-                    else:
-                        with st.spinner("Analyzing potential relationships between variables..."):
-                            try:
-                                suggested_relationships = suggest_relationships_from_factors(
-                                    treatment, outcome, all_factors, openai_api_key
-                                )
-                                if suggested_relationships:
-                                    st.subheader("Suggested Pair-wise Relationships (Potential DAG Edges)")
-                                    st.success("Successfully identified relationships between variables!")
-                                    formatted_relationships = format_relationship_output(suggested_relationships)
-                                    if formatted_relationships:
-                                        st.markdown(formatted_relationships)
-                                    else:
-                                        st.warning("No clear relationships were identified. Try adjusting your input variables or adding more context.")
-                                else:
-                                    st.warning("No relationships could be identified. Please check your input variables and try again.")
-                            except Exception as e:
-                                st.error(f"An error occurred while analyzing relationships: {str(e)}")
-                                st.info("Try simplifying your input or checking for any special characters in variable names.")
-                else:
-                    st.warning(MISSING_VARIABLES_ERROR)
-
-        elif analysis_type == "Identification Suggestion":
-            st.markdown("""
-            <div class="info-box">
-            <h3>🔍 Identification Suggestion Step</h3>
-            Identify key components for causal estimation:
-            <ol>
-                <li>Find backdoor adjustment sets</li>
-                <li>Discover potential mediator variables</li>
-                <li>Locate possible instrumental variables</li>
-            </ol>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            identifier = IdentificationSuggester(llm_model)
-
-            if st.button("Suggest Backdoor Set"):
-                if all_factors and treatment and outcome:
-                    if not openai_api_key:
-                        st.error("Please set your OpenAI API key in the environment variables.")
-                    else:
-                        with st.spinner("Analyzing variables to identify backdoor adjustment set..."):
-                            try:
-                                suggested_backdoor = suggest_backdoor_from_factors(
-                                    treatment, outcome, all_factors, openai_api_key
-                                )
-                                if suggested_backdoor:
-                                    st.success("Successfully identified backdoor adjustment set!")
-                                    formatted_backdoor = format_backdoor_set(suggested_backdoor)
-                                    st.markdown(formatted_backdoor)
-                                else:
-                                    st.warning("No clear backdoor adjustment set could be identified. Please check your input variables.")
-                            except Exception as e:
-                                st.error(f"Error during backdoor set suggestion: {str(e)}")
-                else:
-                    st.warning(MISSING_VARIABLES_ERROR)
-
-            if st.button("Suggest Mediator Set"):
-                if all_factors and treatment and outcome:
-                    if not openai_api_key:
-                        st.error("Please set your OpenAI API key in the environment variables.")
-                    else:
-                        with st.spinner("Analyzing variables to identify mediators..."):
-                            try:
-                                suggested_mediators = suggest_mediator_from_factors(
-                                    treatment, outcome, all_factors, openai_api_key
-                                )
-                                if suggested_mediators:
-                                    st.success("Successfully identified mediator variables!")
-                                    format_mediator_output(suggested_mediators)
-                                else:
-                                    st.warning("No clear mediator variables could be identified. Please check your input variables.")
-                            except Exception as e:
-                                st.error(f"Error during mediator suggestion: {str(e)}")
-                else:
-                    st.warning(MISSING_VARIABLES_ERROR)
-
-            if st.button("Suggest Instrumental Variables (IVs)"):
-                if all_factors and treatment and outcome:
-                    if not openai_api_key:
-                        st.error("Please set your OpenAI API key in the environment variables.")
-                    else:
-                        with st.spinner("Analyzing variables to identify instrumental variables..."):
-                            try:
-                                suggested_ivs = suggest_iv_from_factors(
-                                    treatment, outcome, all_factors, openai_api_key
-                                )
-                                if suggested_ivs:
-                                    st.success("Successfully identified instrumental variables!")
-                                    format_iv_output(suggested_ivs)
-                                else:
-                                    st.warning("No clear instrumental variables could be identified. Please check your input variables.")
-                            except Exception as e:
-                                st.error(f"Error during IV suggestion: {str(e)}")
-                else:
-                    st.warning(MISSING_VARIABLES_ERROR)
-
-        elif analysis_type == "Validation Suggestion":
-            st.markdown("""
-            <div class="info-box">
-            <h3>✅ Validation Suggestion Step</h3>
-            Validate and improve your causal model:
-            <ol>
-                <li>Review and edit the automatically generated DAG</li>
-                <li>Get comprehensive model validation</li>
-                <li>Identify potential improvements</li>
-            </ol>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Update the DAG interface with the new user-friendly version
-            update_dag_interface()
-            
-            # Add validation buttons in a row
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                if st.button("🔍 Validate Model"):
-                    if 'current_dag' in st.session_state:
-                        with st.spinner("Analyzing your causal model..."):
-                            validation_results = validate_causal_model(
-                                st.session_state.treatment_input,
-                                st.session_state.outcome_input,
-                                [f.strip() for f in st.session_state.factors_input.split(',') if f.strip()],
-                                st.session_state.current_dag
-                            )
-                            if validation_results:
-                                display_validation_results(validation_results)
-                            else:
-                                st.warning("Could not validate the model. Please check your inputs and try again.")
-                    else:
-                        st.warning("Please define your DAG structure first.")
-            
-            with col2:
-                if st.button("📋 Show Validation Guide"):
-                    st.markdown("""
-                    ### 📚 Validation Guide
-                    
-                    #### What We Check
-                    1. **DAG Structure**
-                       - Missing relationships
-                       - Questionable relationships
-                       - Causal direction plausibility
-                    
-                    2. **Confounding**
-                       - Unmeasured confounders
-                       - Control variables
-                       - Backdoor paths
-                    
-                    3. **Assumptions**
-                       - Temporal ordering
-                       - No unmeasured confounding
-                       - Causal sufficiency
-                    
-                    #### How to Use Results
-                    1. Review all identified issues
-                    2. Prioritize critical problems
-                    3. Document assumptions
-                    4. Update your model iteratively
-                    """)
-            
-            # Add help text
-            with st.expander("❓ Need Help?"):
-                st.markdown("""
-                **Common Questions:**
-                
-                1. **What is a DAG?**
-                   - A Directed Acyclic Graph showing causal relationships
-                   - Arrows indicate direction of causation
-                   - No cycles allowed (A→B→A is invalid)
-                
-                2. **What are negative controls?**
-                   - Variables that should not be affected by your treatment
-                   - Help validate your causal assumptions
-                   - Example: Past values of outcome variable
-                
-                3. **What are latent confounders?**
-                   - Unmeasured variables affecting both treatment and outcome
-                   - Can bias your causal estimates
-                   - Important to identify and control for if possible
-                """)
-
 def generate_dag_from_inputs(treatment, outcome, factors):
     """Automatically generate DAG structure from input variables."""
     if not treatment or not outcome or not factors:
@@ -2089,34 +2076,150 @@ def generate_dag_from_inputs(treatment, outcome, factors):
     
     try:
         # Create initial DAG with direct treatment -> outcome relationship
-        dag = {
-            treatment: [outcome]
-        }
+        graph = CompactDAG([treatment, outcome])
+        graph.add_edge(treatment, outcome)
         
-        # Add relationships from factors to outcome
-        # We'll assume factors can affect the outcome
+        # We'll assume factors can affect the outcome and some might affect the treatment
         for factor in factors:
-            if factor not in dag:
-                dag[factor] = [outcome]
-            else:
-                if outcome not in dag[factor]:
-                    dag[factor].append(outcome)
+            graph.add_edge(factor, outcome)
+            graph.add_edge(factor, treatment)
         
-        # Add potential relationships between factors and treatment
-        for factor in factors:
-            # Some factors might affect the treatment
-            if factor not in dag:
-                dag[factor] = [treatment]
-            else:
-                if treatment not in dag[factor]:
-                    dag[factor].append(treatment)
-        
-        return dag
+        return graph.to_dict()
         
     except Exception as e:
         st.error(f"Error generating DAG structure: {str(e)}")
         return None
 
+def generate_dag_from_relationships(relationships, treatment, outcome, factors):
+    """Build a DAG from suggested relationships, falling back to the naive input-based DAG."""
+    if not relationships:
+        return generate_dag_from_inputs(treatment, outcome, factors)
+
+    graph = CompactDAG()
+    # Add the most confident edges first so that cycles are broken at the weakest link
+    ordered = sorted(
+        (rel for rel in relationships if isinstance(rel, (list, tuple)) and len(rel) >= 2),
+        key=lambda rel: float(rel[2]) if len(rel) > 2 else 0.5,
+        reverse=True
+    )
+    for rel in ordered:
+        source = str(rel[0]).strip()
+        target = str(rel[1]).strip()
+        if not source or not target or source == target:
+            continue
+        if graph.has_edge(source, target) or graph.creates_cycle(source, target):
+            continue
+        graph.add_edge(source, target)
+
+    return graph.to_dict() or generate_dag_from_inputs(treatment, outcome, factors)
+
+def import_dag_into_session():
+    """Parse the uploaded or pasted DAG and use it to seed the editor. Used as a button callback."""
+    uploaded = st.session_state.get('dag_import_file')
+    if uploaded is not None:
+        dag_str = uploaded.getvalue().decode('utf-8', errors='replace')
+    else:
+        dag_str = st.session_state.get('dag_import_text', '')
+    
+    is_valid, dag_dict, message = validate_dag_input(dag_str, st.session_state.get('dag_import_format', 'auto'))
+    if not is_valid:
+        st.session_state.dag_import_message = ("error", message)
+        return
+    
+    st.session_state.imported_dag = dag_dict
+    # Drop the edge editors so they are recreated from the imported DAG
+    for key in [k for k in st.session_state.keys() if str(k).startswith(DAG_EDIT_KEY_PREFIX)]:
+        st.session_state.pop(key, None)
+    edge_count = sum(len(targets) for targets in dag_dict.values())
+    st.session_state.dag_import_message = ("success", f"{message}: imported {len(dag_dict)} variables and {edge_count} relationships.")
+
+def clear_imported_dag():
+    """Go back to the auto-generated DAG. Used as a button callback."""
+    st.session_state.pop('imported_dag', None)
+    st.session_state.pop('dag_import_message', None)
+    for key in [k for k in st.session_state.keys() if str(k).startswith(DAG_EDIT_KEY_PREFIX)]:
+        st.session_state.pop(key, None)
+
+def dag_import_panel():
+    """Show the DAG import controls."""
+    with st.expander("📥 Import DAG"):
+        st.markdown("Upload or paste a DAG as a JSON dictionary, a JSON edge list, Graphviz DOT or GML.")
+        st.selectbox(
+            "Format",
+            ["auto"] + list(FORMATS),
+            format_func=lambda fmt: "Detect automatically" if fmt == "auto" else FORMATS[fmt],
+            key="dag_import_format"
+        )
+        st.file_uploader("DAG file", type=["json", "dot", "gv", "gml", "txt"], key="dag_import_file")
+        st.text_area(
+            "Or paste the DAG here",
+            placeholder='{"education": ["income"], "income": ["health"]}',
+            key="dag_import_text"
+        )
+        col1, col2 = st.columns(2)
+        with col1:
+            st.button("Import DAG", on_click=import_dag_into_session)
+        with col2:
+            st.button("Use auto-generated DAG", on_click=clear_imported_dag, disabled='imported_dag' not in st.session_state)
+        
+        message = st.session_state.get('dag_import_message')
+        if message:
+            kind, text = message
+            if kind == "success":
+                st.success(text)
+            else:
+                st.error(text)
+
+def dag_export_panel(dag):
+    """Show download buttons for the DAG in every supported format."""
+    with st.expander("📤 Export DAG"):
+        fmt = st.selectbox(
+            "Export format",
+            list(FORMATS),
+            format_func=lambda fmt: FORMATS[fmt],
+            key="dag_export_format"
+        )
+        st.download_button(
+            f"⬇️ Download {FORMATS[fmt]}",
+            data=serialize_dag(dag, fmt),
+            file_name=f"causal_dag.{FILE_EXTENSIONS[fmt]}",
+            mime="application/json" if FILE_EXTENSIONS[fmt] == "json" else "text/plain",
+            key="dag_export_download"
+        )
+        st.markdown("**DoWhy graph** - pass this string as `CausalModel(graph=...)`:")
+        st.code(to_dowhy_graph(dag), language="text")
+
+def suggested_confidences():
+    """Return the LLM confidence of each suggested relationship, keyed by (source, target)."""
+    return {
+        (str(rel[0]).strip(), str(rel[1]).strip()): float(rel[2])
+        for rel in st.session_state.get('suggested_relationships') or []
+        if isinstance(rel, (list, tuple)) and len(rel) > 2
+    }
+
+def display_causal_paths(reachability, treatment, outcome):
+    """Summarize the directed paths between treatment and outcome in the edited DAG."""
+    if reachability.has_cycle():
+        st.warning("⚠️ The DAG contains a cycle. Remove a relationship to make it acyclic.")
+    if not treatment or not outcome:
+        return
+    
+    st.markdown("#### 🧭 Causal Paths")
+    if reachability.is_ancestor(treatment, outcome):
+        st.markdown(f"✅ **{treatment}** has a directed path to **{outcome}**.")
+        mediators = reachability.between(treatment, outcome)
+        if mediators:
+            st.markdown(f"**On causal paths (mediators):** {', '.join(mediators)}")
+    else:
+        st.warning(f"There is no directed path from {treatment} to {outcome}, so the DAG implies no causal effect.")
+    
+    descendants = reachability.descendants_of(treatment)
+    if descendants:
+        st.markdown(f"**Descendants of {treatment} (do not adjust for these):** {', '.join(descendants)}")
+    ancestors = [node for node in reachability.ancestors_of(outcome) if node != treatment]
+    if ancestors:
+        st.markdown(f"**Other ancestors of {outcome}:** {', '.join(ancestors)}")
+
 def update_dag_interface():
     """Update the DAG input interface to be more user-friendly."""
     st.markdown("""
@@ -2124,60 +2227,99 @@ def update_dag_interface():
     The Directed Acyclic Graph (DAG) shows how variables influence each other in your causal model.
     """)
     
+    dag_import_panel()
+    
     # Auto-generate DAG from inputs
     treatment = st.session_state.get('treatment_input', '')
     outcome = st.session_state.get('outcome_input', '')
     factors_str = st.session_state.get('factors_input', '')
-    factors = [f.strip() for f in factors_str.split(',') if f.strip()] if factors_str else []
+    factors = parse_factor_list(factors_str)
     
-    initial_dag = generate_dag_from_inputs(treatment, outcome, factors)
+    # Seed from an imported DAG or the suggested relationships, otherwise use the naive DAG
+    suggested_relationships = st.session_state.get('suggested_relationships')
+    imported_dag = st.session_state.get('imported_dag')
+    if imported_dag:
+        initial_dag = imported_dag
+    elif treatment and outcome and suggested_relationships:
+        initial_dag = generate_dag_from_relationships(suggested_relationships, treatment, outcome, factors)
+    else:
+        initial_dag = generate_dag_from_inputs(treatment, outcome, factors)
+    confidences = suggested_confidences()
     
     if initial_dag:
-        st.markdown("#### 🔄 Auto-generated DAG Structure")
-        st.markdown("This is an initial suggestion based on your inputs. You can modify it below.")
+        if imported_dag:
+            st.markdown("#### 📥 Imported DAG Structure")
+            st.markdown("This DAG was imported from a file. You can modify it below.")
+        else:
+            st.markdown("#### 🔄 Auto-generated DAG Structure")
+            st.markdown("This is an initial suggestion based on your inputs. You can modify it below.")
         
         # Show the auto-generated DAG
         st.json(initial_dag)
         
         # Create a more user-friendly interface for editing relationships
         st.markdown("#### ✏️ Edit Relationships")
-        st.markdown("Select which variables influence each other:")
+        st.markdown("Select which variables each variable influences:")
         
-        # Get all unique variables
-        all_vars = list(set([treatment, outcome] + factors))
+        # Intern every variable once; the graph is edited by integer id
+        initial_graph = CompactDAG.from_dict(initial_dag, [v for v in dict.fromkeys([treatment, outcome] + factors) if v])
+        all_vars = initial_graph.nodes
         
-        # Create a matrix of checkboxes for relationships
-        modified_dag = {}
+        # One multiselect per source instead of a checkbox per pair
+        modified_graph = CompactDAG(all_vars)
         for source in all_vars:
-            st.markdown(f"**From {source} to:**")
-            cols = st.columns(len(all_vars))
-            modified_dag[source] = []
-            
-            for i, target in enumerate(all_vars):
-                if source != target:  # No self-loops
-                    with cols[i]:
-                        # Check if this relationship exists in the initial DAG
-                        initial_exists = target in initial_dag.get(source, [])
-                        if st.checkbox(target, value=initial_exists, key=f"rel_{source}_{target}"):
-                            modified_dag[source].append(target)
+            targets = st.multiselect(
+                f"From {source} to:",
+                options=[v for v in all_vars if v != source],  # No self-loops
+                default=initial_graph.successors(source),
+                key=f"{DAG_EDIT_KEY_PREFIX}{source}"
+            )
+            for target in targets:
+                modified_graph.add_edge(source, target)
         
         # Update the DAG structure
-        if modified_dag:
-            # Remove empty lists to keep the DAG clean
-            modified_dag = {k: v for k, v in modified_dag.items() if v}
+        if all_vars:
+            modified_dag = modified_graph.to_dict()
             st.session_state['current_dag'] = modified_dag
             
+            # Keep the reachability index across reruns and apply only the edited edges
+            reachability = st.session_state.get('dag_reachability')
+            if reachability is None:
+                reachability = ReachabilityIndex(modified_graph)
+                st.session_state.dag_reachability = reachability
+            else:
+                reachability.sync(modified_graph)
+            
             # Visualize the modified DAG
             st.markdown("#### 🎯 Current DAG Structure")
-            relationships = []
-            for source, targets in modified_dag.items():
-                for target in targets:
-                    relationships.append([source, target, 0.7])  # Default confidence
+            relationships = [
+                [source, target, confidences.get((source, target), 0.7)]  # Default confidence
+                for source, target in modified_graph.edges()
+            ]
+            
+            focus = st.selectbox(
+                "Highlight ancestors and descendants of",
+                all_vars,
+                index=all_vars.index(treatment) if treatment in all_vars else 0,
+                key="dag_focus"
+            )
+            highlight = {node: ANCESTOR_COLOR for node in reachability.ancestors_of(focus)}
+            highlight.update({node: DESCENDANT_COLOR for node in reachability.descendants_of(focus)})
+            highlight[focus] = FOCUS_COLOR
             
             if relationships:
-                dot = create_dag_visualization(relationships)
+                dot = create_dag_visualization(
+                    relationships,
+                    stability=st.session_state.get('edge_stability'),
+                    highlight=highlight
+                )
                 if dot:
                     st.graphviz_chart(dot)
+                st.caption(f"Yellow: {focus}. Green: its ancestors. Orange: its descendants.")
+            
+            display_causal_paths(reachability, treatment, outcome)
+            
+            dag_export_panel(modified_dag)
     else:
         st.warning("Please enter treatment, outcome, and factors to generate the DAG structure.")
 
@@ -2187,7 +2329,7 @@ def validate_causal_model(treatment, outcome, factors, dag_structure):
         return None
     
     try:
-        client = get_openai_client()
+        client = get_llm_router()
         if not client:
             return None
 
@@ -2195,7 +2337,7 @@ def validate_causal_model(treatment, outcome, factors, dag_structure):
         prompt = f"""Given a causal model with:
 Treatment: {treatment}
 Outcome: {outcome}
-Factors: {', '.join(factors)}
+Factors: {', '.join(factors)}{describe_factors(factors)}
 DAG Structure: {json.dumps(dag_structure, indent=2)}
 
 Please provide a comprehensive validation of this causal model. Consider:
@@ -2215,24 +2357,24 @@ Please provide a comprehensive validation of this causal model. Consider:
    - Causal sufficiency
 
 Format your response as a JSON object with these sections:
-{
-    "critiques": {
+{{
+    "critiques": {{
         "missing_relationships": ["list of missing important relationships"],
         "questionable_relationships": ["list of relationships that need review"],
         "assumption_violations": ["list of violated assumptions"]
-    },
+    }},
     "latent_confounders": [
         ["confounder name", "explanation", confidence_score]
     ],
     "negative_controls": [
         ["control variable", "justification", confidence_score]
     ]
-}
+}}
 
 Ensure each section provides specific, actionable feedback."""
 
-        response = client.chat.completions.create(
-            model="gpt-4",
+        response = client.complete(
+            "validation",
             messages=[
                 {"role": "system", "content": "You are a causal inference expert providing detailed model validation."},
                 {"role": "user", "content": prompt}
@@ -2242,9 +2384,9 @@ Ensure each section provides specific, actionable feedback."""
         )
         
         try:
-            validation = json.loads(response.choices[0].message.content.strip())
-            return validation
-        except json.JSONDecodeError as e:
+            return parse_object(response.choices[0].message.content)
+        except ValueError as e:
+            record_parse_failure("validation")
             st.error(f"Error parsing validation response: {str(e)}")
             return None
             
@@ -2252,6 +2394,298 @@ Ensure each section provides specific, actionable feedback."""
         st.error(f"Error during model validation: {str(e)}")
         return None
 
+def parse_edge_critiques(suggestion, chunk):
+    """Parse a chunk critique response into critiques keyed by "source → target"."""
+    items = parse_list(suggestion)
+    
+    critiques = {}
+    if isinstance(items, list):
+        for item in items:
+            if not isinstance(item, (list, tuple)) or len(item) < 2:
+                continue
+            try:
+                number = int(item[0])
+            except (ValueError, TypeError):
+                continue
+            if not 1 <= number <= len(chunk):
+                continue
+            source, target = chunk[number - 1]
+            verdict = str(item[1]).strip().lower()
+            if verdict not in ("keep", "reverse", "remove"):
+                verdict = "review"
+            confidence = parse_confidence(item[2]) if len(item) > 2 else 0.5
+            critiques[f"{source} → {target}"] = {
+                "source": source,
+                "target": target,
+                "verdict": verdict,
+                "confidence": confidence,
+                "explanation": str(item[3]).strip() if len(item) > 3 else "",
+            }
+    return critiques
+
+def critique_dag_chunked(treatment, outcome, factors, dag_structure, openai_api_key, chunk_size=15, max_concurrency=4):
+    """Critique the DAG's edges in concurrent chunks and merge the critiques keyed by edge."""
+    if not treatment or not outcome or not factors or not dag_structure:
+        return None
+    
+    client = get_llm_router()
+    if not client:
+        return None
+    
+    edges = [
+        (source, target)
+        for source, targets in dag_structure.items()
+        for target in targets
+    ]
+    if not edges:
+        return None
+    # Read in this thread; chunks run in worker threads without session state
+    factor_descriptions = describe_factors(factors)
+    
+    def critique_chunk(chunk):
+        edge_lines = "\n".join(f"{i}. {source} → {target}" for i, (source, target) in enumerate(chunk, start=1))
+        prompt = f"""Given a causal model with:
+Treatment: {treatment}
+Outcome: {outcome}
+Factors: {', '.join(factors)}{factor_descriptions}
+
+Please critique each of these numbered edges of the model's DAG:
+{edge_lines}
+
+For each edge decide whether it should be kept, reversed or removed, considering temporal ordering, plausibility of the mechanism and whether the effect is direct.
+
+Format your response EXACTLY as a JSON array with one entry per edge, where each entry contains:
+1. The edge number (integer)
+2. The verdict: "keep", "reverse" or "remove"
+3. A confidence score between 0 and 1 (number)
+4. A brief explanation (string)
+
+Example format:
+[
+    [1, "keep", 0.8, "well established mechanism"],
+    [2, "reverse", 0.6, "the effect precedes the cause"]
+]
+
+Return ONLY the JSON array, no additional text."""
+
+        response = client.complete(
+            "critique",
+            messages=[
+                {"role": "system", "content": "You are a causal inference expert. Return ONLY the requested JSON array format, no additional text."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.7,
+            max_tokens=50 + 60 * len(chunk)
+        )
+        return parse_edge_critiques(response.choices[0].message.content, chunk)
+    
+    results = run_concurrently(critique_chunk, chunked(edges, chunk_size), max_concurrency)
+    
+    critiques = {}
+    failed = 0
+    for chunk, chunk_critiques, error in results:
+        if error is not None:
+            if isinstance(error, PARSE_ERRORS):
+                record_parse_failure("critique")
+            failed += len(chunk)
+            continue
+        critiques.update(chunk_critiques)
+    
+    if failed == len(edges):
+        st.error("Error during model critique: every edge chunk failed. Please try again.")
+        return None
+    if failed:
+        st.warning(f"{failed} of {len(edges)} edges could not be critiqued and were skipped.")
+    return critiques
+
+def display_edge_critiques(edge_critiques, key="edge_critiques"):
+    """Display per-edge critiques one page at a time, filterable by verdict."""
+    if not edge_critiques:
+        st.warning("No edge critiques available.")
+        return
+    
+    verdict_labels = {
+        "remove": "❌ Remove",
+        "reverse": "🔄 Reverse",
+        "review": "⚠️ Review",
+        "keep": "✅ Keep",
+    }
+    
+    st.markdown("### 🔍 Edge-by-Edge Critique")
+    rows = list(edge_critiques.values())
+    counts = {verdict: sum(row["verdict"] == verdict for row in rows) for verdict in verdict_labels}
+    st.markdown(" · ".join(f"{label}: **{counts[verdict]}**" for verdict, label in verdict_labels.items()))
+    verdicts = st.multiselect(
+        "Verdicts",
+        list(verdict_labels),
+        default=list(verdict_labels),
+        format_func=verdict_labels.get,
+        key=f"{key}_verdicts"
+    )
+    page = paged_rows(rows, key, where=lambda row: row["verdict"] in verdicts)
+    st.markdown(result_panel_html("edge_critiques", page), unsafe_allow_html=True)
+
+# Parsed datasets are shared by every session that uploads the same file
+@st.cache_resource(max_entries=DATASET_CACHE_ENTRIES, show_spinner=False)
+def load_shared_dataset(digest, filename, _uploaded):
+    """Load a dataset's numeric columns once per file content; the array is read-only."""
+    columns, data = load_numeric_dataset(_uploaded, filename)
+    data.flags.writeable = False
+    return columns, data
+
+def load_uploaded_dataset(uploaded):
+    """Load an uploaded dataset's numeric columns without storing them in session state."""
+    dataset_key = (uploaded.name, uploaded.size)
+    dataset = st.session_state.get('dataset')
+    if dataset and dataset["key"] == dataset_key:
+        return dataset
+    try:
+        with uploaded.getbuffer() as content:
+            digest = hashlib.sha256(content).hexdigest()
+        uploaded.seek(0)
+        columns, data = load_shared_dataset(digest, uploaded.name, uploaded)
+    except (DatasetError, OSError, ValueError) as e:
+        st.error(f"Error loading dataset: {str(e)}")
+        return None
+    return {"key": dataset_key, "name": uploaded.name, "columns": columns, "data": data}
+
+def load_session_dataset(uploaded):
+    """Load an uploaded dataset's numeric columns into session state, once per file."""
+    dataset = load_uploaded_dataset(uploaded)
+    if dataset is not None:
+        st.session_state.dataset = dataset
+    return dataset
+
+def test_dag_with_data(dag_structure, dataset, alpha=DEFAULT_ALPHA):
+    """Test the DAG's implied independencies and edges against the dataset."""
+    if not dag_structure or not dataset:
+        return None
+    try:
+        index = get_variable_index(dataset["columns"])
+        return test_dag_against_data(dag_structure, dataset["columns"], dataset["data"], alpha, lookup=index.lookup)
+    except (DatasetError, ValueError, np.linalg.LinAlgError) as e:
+        st.error(f"Error testing the DAG against the data: {str(e)}")
+        return None
+
+def compute_edge_stability(dag_structure, dataset, n_resamples=200, alpha=DEFAULT_ALPHA, max_workers=None):
+    """Score each DAG edge by how often the data supports it across bootstrap resamples."""
+    if not dag_structure or not dataset:
+        return None
+    try:
+        index = get_variable_index(dataset["columns"])
+        scores = edge_stability(
+            dataset["data"],
+            dataset["columns"],
+            dag_structure,
+            n_resamples=n_resamples,
+            alpha=alpha,
+            max_workers=max_workers,
+            lookup=index.lookup
+        )
+    except (DatasetError, ValueError, OSError, np.linalg.LinAlgError) as e:
+        st.error(f"Error computing edge stability: {str(e)}")
+        return None
+    if not scores:
+        st.warning("None of the DAG's edges have both variables in the dataset.")
+        return None
+    st.session_state.edge_stability = scores
+    return scores
+
+def display_ci_results(ci_results):
+    """Display the data-backed independence tests of the DAG."""
+    if not ci_results:
+        st.warning("No independence test results available.")
+        return
+    
+    st.markdown("### 📈 Data-backed Validation")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Rows used", ci_results["n"])
+    with col2:
+        st.metric("Implied independencies held", f"{ci_results['satisfied']} / {ci_results['independence_tests']}")
+    with col3:
+        st.metric("Edges supported", f"{ci_results['edge_tests'] - len(ci_results['unsupported_edges'])} / {ci_results['edge_tests']}")
+    
+    if ci_results["unmatched"]:
+        st.info(f"No data column for: {', '.join(ci_results['unmatched'])}. Tests involving these variables were skipped.")
+    
+    def rows(tests):
+        return [
+            {
+                "variables": f"{t['x']} ⊥ {t['y']}",
+                "given": ", ".join(t["given"]) or "—",
+                "partial correlation": t["partial_corr"],
+                "p-value": round(t["p_value"], 4),
+            }
+            for t in tests
+        ]
+    
+    st.markdown(f"#### ❌ Violated Independencies (p < {ci_results['alpha']})")
+    if ci_results["violated"]:
+        st.markdown("The data shows a dependence the DAG rules out. A relationship may be missing.")
+        st.dataframe(rows(ci_results["violated"]))
+    else:
+        st.markdown("_None: every implied independency is consistent with the data._")
+    
+    st.markdown(f"#### ⚠️ Edges Not Supported by the Data (p ≥ {ci_results['alpha']})")
+    if ci_results["unsupported_edges"]:
+        st.markdown("These variables look independent given the target's other parents. The edge may be unnecessary.")
+        st.dataframe(rows(ci_results["unsupported_edges"]))
+    else:
+        st.markdown("_None: the data shows a dependence for every edge._")
+
+def discover_relationships_from_data(treatment, outcome, factors, dataset, alpha=DEFAULT_ALPHA, max_level=3,
+                                     max_workers=None, priors=None, prune_threshold=None):
+    """Run PC discovery on the dataset columns that match the factors, seeded with LLM relationship priors."""
+    if not dataset:
+        return None
+    
+    # Match each variable to a dataset column
+    column_index = get_variable_index(dataset["columns"])
+    matched = {}
+    unmatched = []
+    for variable in dict.fromkeys([treatment, outcome] + list(factors)):
+        column = column_index.lookup(variable)
+        if column is None or column in matched.values():
+            unmatched.append(variable)
+        else:
+            matched[variable] = column
+    if len(matched) < 2:
+        st.warning("Fewer than two of your variables match a dataset column.")
+        return None
+    if unmatched:
+        st.info(f"No data column for: {', '.join(unmatched)}. These variables were left out of the discovery.")
+    
+    # Keep the engine, and its memoized tests, while the dataset and variables stay the same
+    positions = [dataset["columns"].index(column) for column in matched.values()]
+    engine_key = (dataset["key"], tuple(positions), tuple(matched))
+    cached = st.session_state.get('pc_engine')
+    if cached and cached[0] == engine_key:
+        engine = cached[1]
+    else:
+        try:
+            engine = PCDiscovery.from_data(dataset["data"][:, positions], list(matched))
+        except DatasetError as e:
+            st.error(f"Error preparing the dataset: {str(e)}")
+            return None
+        st.session_state.pc_engine = (engine_key, engine)
+    
+    variable_index = get_variable_index(list(matched))
+    prior_confidences = {}
+    for rel in priors or []:
+        if isinstance(rel, (list, tuple)) and len(rel) > 2:
+            source, target = variable_index.lookup(rel[0]), variable_index.lookup(rel[1])
+            if source and target:
+                prior_confidences[(source, target)] = float(rel[2])
+    
+    return engine.run(
+        alpha=alpha,
+        priors=prior_confidences,
+        max_level=max_level,
+        max_workers=max_workers,
+        prune_threshold=prune_threshold
+    )
+
 def display_validation_results(validation_results):
     """Display validation results in a user-friendly format."""
     if not validation_results:
@@ -2320,4 +2754,1170 @@ def display_validation_results(validation_results):
         """)
         
     except Exception as e:
-        st.error(f"Error displaying validation results: {str(e)}")
\ No newline at end of file
+        st.error(f"Error displaying validation results: {str(e)}")
+
+# Stages of the end-to-end analysis pipeline, in display order
+PIPELINE_STAGES = {
+    "variables": "Treatment and Outcome",
+    "domain_expertises": "Domain Expertises",
+    "confounders": "Confounders",
+    "relationships": "Pair-wise Relationships",
+    "dag": "DAG",
+    "backdoor": "Backdoor Set",
+    "mediators": "Mediators",
+    "ivs": "Instrumental Variables",
+    "validation": "Model Validation",
+    "edge_critiques": "Edge Critiques",
+}
+
+# LLM routes each pipeline stage calls, where they differ from the stage name
+PIPELINE_STAGE_ROUTES = {
+    "relationships": ("relationships", "relationship_pairs"),
+    "edge_critiques": ("critique",),
+}
+
+def build_analysis_pipeline(openai_api_key, job_values=None):
+    """Wire the suggest_* steps into a dependency graph of memoized stages.
+
+    ``job_values`` holds the session values a background job was submitted
+    with; its stages read those instead of any session.
+    """
+    session = st.session_state if job_values is None else job_values
+    # Reuse the pipeline cache across reruns so unchanged stages are not recomputed
+    if 'pipeline_cache' not in session:
+        session['pipeline_cache'] = {}
+
+    if job_values is None:
+        # Let worker threads report errors into the current page
+        ctx = get_script_run_ctx()
+        initializer = lambda: add_script_run_ctx(threading.current_thread(), ctx)
+    else:
+        initializer = lambda: setattr(_job_session, "values", job_values)
+    pipeline = Pipeline(
+        cache=session['pipeline_cache'],
+        max_workers=4,
+        initializer=initializer,
+        # Re-spelled or reordered factors reuse the cached results
+        key_normalizers={
+            "factors": factor_keys,
+            "treatment": normalize_name,
+            "outcome": normalize_name,
+        }
+    )
+
+    def variables(factors, treatment, outcome):
+        if treatment and outcome:
+            return {"treatment": treatment, "outcome": outcome}
+        suggested_treatment, suggested_outcome = suggest_variables_from_factors(factors, openai_api_key)
+        if not suggested_treatment or not suggested_outcome:
+            return None
+        return {"treatment": suggested_treatment, "outcome": suggested_outcome}
+
+    def domain_expertises(factors):
+        return ModelSuggester(PYWHYLLM_MODEL).suggest_domain_expertises(factors)
+
+    def confounders(factors, variables):
+        if len(factors) > CONFOUNDER_CHUNK_SIZE:
+            return suggest_confounders_chunked(variables["treatment"], variables["outcome"], factors, openai_api_key)
+        return suggest_confounders_from_factors(variables["treatment"], variables["outcome"], factors, openai_api_key)
+
+    relationship_cache = session.setdefault('relationship_cache', {})
+
+    def relationships(factors, variables):
+        return suggest_relationships_incremental(
+            variables["treatment"], variables["outcome"], factors, openai_api_key, relationship_cache
+        )
+
+    def dag(factors, variables, relationships):
+        return generate_dag_from_relationships(relationships, variables["treatment"], variables["outcome"], factors)
+
+    def backdoor(factors, variables):
+        return suggest_backdoor_from_factors(variables["treatment"], variables["outcome"], factors, openai_api_key)
+
+    def mediators(factors, variables):
+        return suggest_mediator_from_factors(variables["treatment"], variables["outcome"], factors, openai_api_key)
+
+    def ivs(factors, variables):
+        return suggest_iv_from_factors(variables["treatment"], variables["outcome"], factors, openai_api_key)
+
+    def validation(factors, variables, dag):
+        return validate_causal_model(variables["treatment"], variables["outcome"], factors, dag)
+
+    def edge_critiques(factors, variables, dag):
+        return critique_dag_chunked(variables["treatment"], variables["outcome"], factors, dag, openai_api_key)
+
+    pipeline.add_stage("variables", variables, inputs=["factors", "treatment", "outcome"], key_inputs=["model_variables", "factor_descriptions"])
+    pipeline.add_stage("domain_expertises", domain_expertises, inputs=["factors"])
+    pipeline.add_stage("confounders", confounders, inputs=["factors"], depends_on=["variables"], key_inputs=["model_confounders", "factor_descriptions"])
+    pipeline.add_stage("relationships", relationships, inputs=["factors"], depends_on=["variables"], key_inputs=["model_relationships", "factor_descriptions"])
+    pipeline.add_stage("dag", dag, inputs=["factors"], depends_on=["variables", "relationships"])
+    pipeline.add_stage("backdoor", backdoor, inputs=["factors"], depends_on=["variables"], key_inputs=["model_backdoor", "factor_descriptions"])
+    pipeline.add_stage("mediators", mediators, inputs=["factors"], depends_on=["variables"], key_inputs=["model_mediators", "factor_descriptions"])
+    pipeline.add_stage("ivs", ivs, inputs=["factors"], depends_on=["variables"], key_inputs=["model_ivs", "factor_descriptions"])
+    pipeline.add_stage("validation", validation, inputs=["factors"], depends_on=["variables", "dag"], key_inputs=["model_validation", "factor_descriptions"])
+    pipeline.add_stage("edge_critiques", edge_critiques, inputs=["factors"], depends_on=["variables", "dag"], key_inputs=["model_critique", "factor_descriptions"])
+    
+    def unless_stale(name, func):
+        # A stage that used a last good answer is shown but not memoized, so the next run fetches fresh ones
+        routes = PIPELINE_STAGE_ROUTES.get(name, (name,))
+        
+        def call(**kwargs):
+            stale_answers = current_session().setdefault('stale_answers', [])
+            seen = len(stale_answers)
+            value = func(**kwargs)
+            if not any(stage in routes for stage, _ in stale_answers[seen:]):
+                return value
+            if name == "relationships":
+                # The incremental cache would otherwise keep serving the stale edges
+                relationship_cache.clear()
+            return Provisional(value)
+        return call
+    
+    for stage in pipeline.stages.values():
+        stage.func = unless_stale(stage.name, stage.func)
+    return pipeline
+
+def display_pipeline_results(run):
+    """Display a stage summary and the results of a pipeline run."""
+    st.markdown("### ⚡ Pipeline Summary")
+    summary = []
+    for name, label in PIPELINE_STAGES.items():
+        status = run.status(name)
+        if status == "not run":
+            continue
+        timing = run.timings.get(name)
+        summary.append(f"- **{label}:** {status}" + (f" ({timing:.1f}s)" if timing else ""))
+        if name in run.provisional:
+            summary.append("  - ⏳ Used last good answers; recomputed on the next run")
+        if name in run.errors:
+            summary.append(f"  - ❌ {run.errors[name]}")
+    st.markdown("\n".join(summary))
+
+    available = [name for name in PIPELINE_STAGES if name in run.results and name != "variables"]
+    if not available:
+        return
+
+    tabs = st.tabs([PIPELINE_STAGES[name] for name in available])
+    for tab, name in zip(tabs, available):
+        result = run.results[name]
+        with tab:
+            if name == "domain_expertises":
+                st.markdown(format_domain_expertises(result))
+            elif name == "confounders":
+                format_confounder_output(result)
+            elif name == "relationships":
+                format_relationship_output(result, key="pipeline_relationships")
+            elif name == "dag":
+                st.json(result)
+                dot = create_dag_visualization([[source, target] for source, targets in result.items() for target in targets])
+                if dot:
+                    st.graphviz_chart(dot)
+            elif name == "backdoor":
+                format_backdoor_set(result)
+            elif name == "mediators":
+                format_mediator_output(result)
+            elif name == "ivs":
+                format_iv_output(result)
+            elif name == "validation":
+                display_validation_results(result)
+            elif name == "edge_critiques":
+                display_edge_critiques(result, key="pipeline_edge_critiques")
+
+def ingest_factors_into_session():
+    """Load factors and descriptions from the uploaded files or server data directory. Used as a button callback."""
+    dataset = st.session_state.get('factor_file')
+    data_dir = os.getenv(DATA_DIR_ENV)
+    dataset_path = st.session_state.get('factor_file_path', '').strip() if data_dir else ''
+    dictionary = st.session_state.get('factor_dictionary')
+    
+    try:
+        factors, descriptions = [], {}
+        if dataset is not None:
+            factors, descriptions = ingest_factor_file(dataset, dataset.name)
+        elif dataset_path:
+            factors, descriptions = ingest_factor_file(resolve_data_path(dataset_path, data_dir), dataset_path)
+        if dictionary is not None:
+            dictionary_factors, dictionary_descriptions = ingest_factor_file(dictionary, dictionary.name, kind="dictionary")
+            descriptions.update(dictionary_descriptions)
+            if not factors:
+                factors = dictionary_factors
+    except (FactorIngestError, OSError) as e:
+        st.session_state.factor_ingest_message = ("error", f"Error reading factors: {str(e)}")
+        return
+    
+    if not factors:
+        st.session_state.factor_ingest_message = ("error", "Please choose a dataset or data dictionary file first.")
+        return
+    
+    st.session_state.factors_input = format_factor_list(factors)
+    st.session_state.factor_descriptions = descriptions
+    # Drop widget state so the text area is recreated from the loaded factors
+    st.session_state.pop('factors_area', None)
+    st.session_state.factor_ingest_message = (
+        "success",
+        f"Loaded {len(factors)} factors" + (f" with {len(descriptions)} descriptions." if descriptions else ".")
+    )
+
+@st.cache_resource
+def get_project_store():
+    """Get the shared project store."""
+    return ProjectStore()
+
+@st.cache_resource
+def get_job_queue():
+    """Get the background job queue shared by all sessions."""
+    return JobQueue(max_workers=int(os.getenv(JOB_WORKERS_ENV, DEFAULT_JOB_WORKERS)))
+
+def get_job_owner():
+    """Return the id that groups this session's background jobs and LLM usage."""
+    session = current_session()
+    if 'job_owner' not in session:
+        session['job_owner'] = uuid.uuid4().hex[:12]
+    return session['job_owner']
+
+def submit_pipeline_job(openai_api_key, inputs, targets=None, force=()):
+    """Run the analysis pipeline as a background job and return the job id."""
+    init_model_routing()
+    get_job_owner()
+    # Results computed by the job still warm this session's caches
+    st.session_state.setdefault('pipeline_cache', {})
+    st.session_state.setdefault('relationship_cache', {})
+    # The job gets the values its stages read, not the session, which may be gone before it finishes
+    job_values = {key: st.session_state[key] for key in JOB_SESSION_KEYS if key in st.session_state}
+    pipeline = build_analysis_pipeline(openai_api_key, job_values)
+    
+    def run_job(report):
+        def on_progress(name, status, done, total):
+            report(done / total, f"{PIPELINE_STAGES[name]}: {status}")
+        
+        _job_session.values = job_values
+        try:
+            run = pipeline.run(inputs, targets=targets, force=force, on_progress=on_progress)
+            record_cache_hits(run)
+            return run.to_dict()
+        finally:
+            # Job threads are reused by later jobs
+            _job_session.values = None
+    
+    # Identical inputs reuse a queued, running or finished job unless a recompute was requested
+    return get_job_queue().submit(
+        "pipeline",
+        {"inputs": inputs, "targets": targets, "force": list(force)},
+        run_job,
+        owner=get_job_owner(),
+        dedupe=not force
+    )
+
+def record_cache_hits(run):
+    """Count the stages a pipeline run reused from its cache as cache hits in the usage log."""
+    log = get_usage_log()
+    owner = get_job_owner()
+    for name in run.reused:
+        stage = "critique" if name == "edge_critiques" else name
+        if stage in ROUTE_STAGES:
+            log.record(stage, owner=owner, event=CACHE_HIT)
+
+def apply_pipeline_run(run):
+    """Record a pipeline run's results and feed them back into the step-by-step views."""
+    st.session_state.pipeline_run = run
+    for name, value in run.results.items():
+        record_stage_result(name, value, run.timings.get(name), stale=name in run.provisional)
+    
+    if variables := run.results.get("variables"):
+        st.session_state.treatment_input = variables["treatment"]
+        st.session_state.outcome_input = variables["outcome"]
+    if "domain_expertises" in run.results:
+        st.session_state.domain_expertises = run.results["domain_expertises"]
+    if "relationships" in run.results:
+        st.session_state.suggested_relationships = run.results["relationships"]
+    if "dag" in run.results:
+        st.session_state.current_dag = run.results["dag"]
+
+def load_job_into_session(job_id=None):
+    """Load a finished pipeline job's results. Used as a button callback."""
+    job_id = (job_id or st.session_state.get('job_lookup', '')).strip()
+    job = get_job_queue().get(job_id) if job_id else None
+    if job is None:
+        st.session_state.job_message = ("error", f"No background job with id '{job_id}'.")
+        return
+    if job["kind"] != "pipeline":
+        st.session_state.job_message = ("error", f"Job '{job_id}' is not a pipeline run.")
+        return
+    if job["status"] != DONE:
+        message = job["error"] or f"Job '{job_id}' is {job['status']}."
+        st.session_state.job_message = ("warning", message)
+        return
+    apply_pipeline_run(PipelineResult.from_dict(job["result"]))
+    st.session_state.job_message = ("success", f"Loaded the results of job '{job_id}'.")
+
+def background_jobs_panel():
+    """List this session's background jobs with their progress."""
+    queue = get_job_queue()
+    st.markdown("#### 🧵 Background Jobs")
+    st.markdown("Background runs continue if you close this tab. Keep the job id to load the results later.")
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        st.text_input("Job ID", key="job_lookup", placeholder="Paste a job id to load its results")
+    with col2:
+        st.button("📥 Load Job", on_click=load_job_into_session)
+    
+    if 'job_message' in st.session_state:
+        kind, text = st.session_state.pop('job_message')
+        getattr(st, kind)(text)
+    
+    jobs = queue.list_jobs(owner=get_job_owner(), limit=10)
+    if not jobs:
+        st.markdown("_No background jobs yet._")
+        return
+    
+    # Polling: each rerun reads the latest state from the job store
+    st.button("🔄 Refresh Jobs")
+    for job in jobs:
+        started = datetime.datetime.fromtimestamp(job["created_at"]).strftime("%H:%M:%S")
+        status = f"`{job['id']}` · {job['status']} · submitted {started}"
+        if job["message"]:
+            status += f" · {job['message']}"
+        st.progress(job["progress"], text=status)
+        if job["status"] in ACTIVE_STATUSES:
+            st.button("Cancel", key=f"cancel_job_{job['id']}", on_click=queue.cancel, args=(job["id"],))
+        elif job["status"] == DONE:
+            st.button("Load results", key=f"load_job_{job['id']}", on_click=load_job_into_session, args=(job["id"],))
+        elif job["error"]:
+            st.caption(f"❌ {job['error']}")
+
+def record_stage_result(stage, result, elapsed=None, stale=False):
+    """Keep a stage's parsed result in session state so it can be saved with the project.
+
+    ``stale`` marks a result built from last good answers instead of fresh ones.
+    """
+    st.session_state.setdefault('stage_results', {})[stage] = result
+    stale_stages = st.session_state.setdefault('stale_stages', set())
+    if stale:
+        stale_stages.add(stage)
+    else:
+        stale_stages.discard(stage)
+    if elapsed is not None:
+        st.session_state.setdefault('stage_timings', {})[stage] = elapsed
+
+def save_current_project(name):
+    """Save the current inputs, stage results, DAG and timings under the given name."""
+    results = dict(st.session_state.get('stage_results', {}))
+    pipeline_cache = st.session_state.get('pipeline_cache', {})
+    metadata = {
+        # Pipeline fingerprints let a reloaded project reuse its results without LLM calls
+        "pipeline_keys": {stage: entry[0] for stage, entry in pipeline_cache.items() if stage in results},
+        "relationship_cache": st.session_state.get('relationship_cache', {}),
+        "stale_stages": sorted(st.session_state.get('stale_stages', set()) & set(results)),
+        "route_stats": st.session_state.route_stats.summary() if 'route_stats' in st.session_state else [],
+    }
+    return get_project_store().save_project(
+        name,
+        inputs={
+            "factors": st.session_state.get('factors_input', ''),
+            "treatment": st.session_state.get('treatment_input', ''),
+            "outcome": st.session_state.get('outcome_input', ''),
+            "factor_descriptions": st.session_state.get('factor_descriptions', {}),
+            "default_llm_model": st.session_state.get('default_llm_model'),
+            "model_routes": st.session_state.get('model_routes'),
+        },
+        results=results,
+        dag=st.session_state.get('current_dag'),
+        timings=st.session_state.get('stage_timings', {}),
+        metadata=metadata
+    )
+
+def load_project_into_session(project_id):
+    """Restore a saved project into session state. Used as a button callback."""
+    project = get_project_store().load_project(project_id)
+    if not project:
+        st.session_state.project_message = ("error", "The selected project no longer exists.")
+        return
+    
+    inputs = project["inputs"]
+    results = project["results"]
+    st.session_state.factors_input = inputs.get("factors", "")
+    st.session_state.treatment_input = inputs.get("treatment", "")
+    st.session_state.outcome_input = inputs.get("outcome", "")
+    st.session_state.factor_descriptions = inputs.get("factor_descriptions", {})
+    if inputs.get("default_llm_model"):
+        st.session_state.default_llm_model = inputs["default_llm_model"]
+    if inputs.get("model_routes"):
+        st.session_state.model_routes = inputs["model_routes"]
+    # Drop widget state so the inputs are recreated from the restored values
+    for key in ["factors_area", "treatment_field", "outcome_field"] + [f"route_{stage}" for stage in ROUTE_STAGES]:
+        st.session_state.pop(key, None)
+    
+    st.session_state.stage_results = results
+    st.session_state.stage_timings = project["timings"]
+    st.session_state.domain_expertises = results.get("domain_expertises")
+    st.session_state.suggested_relationships = results.get("relationships")
+    if project["dag"]:
+        st.session_state.current_dag = project["dag"]
+    else:
+        st.session_state.pop('current_dag', None)
+    
+    metadata = project["metadata"]
+    st.session_state.relationship_cache = metadata.get("relationship_cache", {})
+    st.session_state.stale_stages = set(metadata.get("stale_stages", []))
+    st.session_state.pipeline_cache = {
+        stage: (key, results[stage])
+        for stage, key in metadata.get("pipeline_keys", {}).items()
+        if stage in results
+    }
+    
+    run = PipelineResult()
+    run.results = {stage: results[stage] for stage in PIPELINE_STAGES if stage in results}
+    run.reused = list(run.results)
+    run.provisional = [stage for stage in run.results if stage in st.session_state.stale_stages]
+    run.timings = {stage: project["timings"].get(stage, 0.0) for stage in run.results}
+    st.session_state.pipeline_run = run
+    st.session_state.project_message = ("success", f"Loaded project '{project['name']}'.")
+
+def project_sidebar():
+    """Show the sidebar for saving and reloading analysis projects."""
+    with st.sidebar:
+        st.markdown("## 💾 Projects")
+        
+        if message := st.session_state.pop('project_message', None):
+            level, text = message
+            getattr(st, level)(text)
+        
+        project_name = st.text_input("Project name", key="project_name")
+        if st.button("Save Project"):
+            if project_name.strip():
+                try:
+                    save_current_project(project_name.strip())
+                    st.success(f"Saved project '{project_name.strip()}'.")
+                except Exception as e:
+                    st.error(f"Error saving project: {str(e)}")
+            else:
+                st.warning("Please enter a project name.")
+        
+        try:
+            projects = get_project_store().list_projects()
+        except Exception as e:
+            st.error(f"Error listing projects: {str(e)}")
+            return
+        if not projects:
+            st.markdown("_No saved projects yet._")
+            return
+        
+        labels = {
+            project["id"]: (
+                f"{project['name']} — {project['stages']} results, "
+                f"{datetime.datetime.fromtimestamp(project['updated_at']):%Y-%m-%d %H:%M}"
+            )
+            for project in projects
+        }
+        selected_project = st.selectbox("Saved projects", list(labels), format_func=labels.get)
+        load_col, delete_col = st.columns(2)
+        with load_col:
+            st.button("Load", on_click=load_project_into_session, args=(selected_project,))
+        with delete_col:
+            st.button("Delete", on_click=get_project_store().delete_project, args=(selected_project,))
+
+load_dotenv()
+openai_api_key = os.getenv("OPENAI_API_KEY")
+llm_available = bool(get_provider_registry().configured())
+
+if not llm_available:
+    st.error(LLM_PROVIDER_ERROR + " Steps that need a language model are disabled; data-driven discovery and tests still work.")
+
+# Main title and attribution
+st.markdown('<h1 class="main-title">PyWhy-LLM Causal Analysis Assistant</h1>', unsafe_allow_html=True)
+st.markdown('<p class="attribution">(Created by <a href="https://www.linkedin.com/in/syedalihasannaqvi/" target="_blank">Syed Hasan</a>)</p>', unsafe_allow_html=True)
+# Filled at the end of the run, once every LLM call of this run has been made
+stale_notice = st.empty()
+
+# Introduction section
+st.markdown('<h2 class="section-header">Welcome to PyWhy-LLM</h2>', unsafe_allow_html=True)
+with st.expander("ℹ️ What is PyWhy-LLM?", expanded=True):
+    st.markdown("""
+    <div class="info-box">
+    <p>PyWhy-LLM is an innovative tool that combines Large Language Models (LLMs) with causal analysis to help researchers and analysts:</p>
+    <ul>
+        <li>Identify potential causal relationships</li>
+        <li>Suggest confounding variables</li>
+        <li>Validate causal assumptions</li>
+        <li>Build and critique DAGs (Directed Acyclic Graphs)</li>
+    </ul>
+    </div>
+    """, unsafe_allow_html=True)
+
+# Quick Start Guide
+st.markdown('<h2 class="section-header">Quick Start Guide</h2>', unsafe_allow_html=True)
+with st.expander("📚 How to Use PyWhy-LLM", expanded=True):
+    st.markdown("""
+    <div class="step-box">
+    <ol>
+        <li>Select your analysis step from the sidebar</li>
+        <li>Enter your variables and factors in the input fields</li>
+        <li>Follow the step-by-step process for your chosen analysis</li>
+        <li>Review and interpret the results</li>
+    </ol>
+    </div>
+    """, unsafe_allow_html=True)
+
+# Initialize session state variables if they don't exist
+if 'suggested_treatment' not in st.session_state:
+    st.session_state.suggested_treatment = ""
+if 'suggested_outcome' not in st.session_state:
+    st.session_state.suggested_outcome = ""
+if 'factors_input' not in st.session_state:
+    st.session_state.factors_input = ""
+if 'treatment_input' not in st.session_state:
+    st.session_state.treatment_input = ""
+if 'outcome_input' not in st.session_state:
+    st.session_state.outcome_input = ""
+
+project_sidebar()
+
+# Main Analysis Interface
+col1, col2 = st.columns([1, 2])
+
+with col1:
+    st.markdown('<h2 class="section-header">Analysis Configuration</h2>', unsafe_allow_html=True)
+    
+    init_model_routing()
+    route_models = get_provider_registry().route_models(AVAILABLE_MODELS)
+    model_options = list(dict.fromkeys(route_models + [st.session_state.default_llm_model]))
+    llm_model = st.selectbox(
+        "Choose LLM Model",
+        model_options,
+        index=model_options.index(st.session_state.default_llm_model),
+        help="Default model for every step that has no model of its own in the routing table."
+    )
+    st.session_state.default_llm_model = llm_model
+    
+    with st.expander("⚙️ Model Routing"):
+        st.markdown("Assign a model to each analysis step. Steps set to _(default)_ use the model chosen above.")
+        routes = st.session_state.model_routes
+        route_options = ["(default)"] + list(dict.fromkeys(
+            route_models + [model for model in routes.values() if model]
+        ))
+        for stage, label in ROUTE_STAGES.items():
+            current = routes.get(stage) or "(default)"
+            choice = st.selectbox(
+                label,
+                route_options,
+                index=route_options.index(current),
+                key=f"route_{stage}"
+            )
+            routes[stage] = None if choice == "(default)" else choice
+    
+    with st.expander("⏱️ Latency and Cost by Route"):
+        route_summary = st.session_state.route_stats.summary()
+        if route_summary:
+            st.dataframe(route_summary)
+            st.markdown(f"**Estimated session cost:** ${sum(row['cost ($)'] for row in route_summary):.4f}")
+        else:
+            st.markdown("_No model calls yet._")
+    
+    analysis_type = st.selectbox(
+        "📊 Choose Analysis Step",
+        ["Model Suggestion", "Identification Suggestion", "Validation Suggestion", "Full Analysis Pipeline"]
+    )
+    
+    st.markdown('<h3 class="section-header">Variables Input</h3>', unsafe_allow_html=True)
+    
+    factors_help = """
+    Examples by domain:
+    • Medical: "smoking, lung cancer, exercise habits, air pollution"
+    • Education: "study hours, test scores, sleep quality, stress"
+    • Economics: "interest rates, inflation, unemployment, gdp"
+    • Environmental: "co2 emissions, temperature, deforestation, rainfall"
+    
+    Put names that contain commas in double quotes: "income, household", age
+    """
+    
+    all_factors_str = st.text_area(
+        "📝 Enter all relevant factors (comma-separated):", 
+        value=st.session_state.factors_input,
+        help=factors_help,
+        key="factors_area"
+    )
+    
+    with st.expander("📂 Load factors from a file"):
+        st.markdown("Only the header of a CSV file or the schema of a Parquet file is read, so wide tables load quickly.")
+        st.file_uploader("Dataset (CSV or Parquet)", type=["csv", "tsv", "txt", "parquet", "pq"], key="factor_file")
+        if os.getenv(DATA_DIR_ENV):
+            st.text_input(
+                "Or a file in the server data directory",
+                help="Large files can be read in place instead of uploaded. Only files in the configured data directory are available.",
+                key="factor_file_path"
+            )
+        st.file_uploader(
+            "Data dictionary (optional)",
+            type=["csv", "json"],
+            help="A CSV with name and description columns, or JSON mapping each variable to its description.",
+            key="factor_dictionary"
+        )
+        st.button("Load factors", on_click=ingest_factors_into_session)
+        
+        message = st.session_state.get('factor_ingest_message')
+        if message:
+            kind, text = message
+            if kind == "success":
+                st.success(text)
+            else:
+                st.error(text)
+        if st.session_state.get('factor_descriptions'):
+            st.markdown(f"**Variable descriptions** ({len(st.session_state.factor_descriptions)}), included in the prompts:")
+            st.dataframe([
+                {"variable": name, "description": desc}
+                for name, desc in st.session_state.factor_descriptions.items()
+            ])
+    
+    # Update session state for factors
+    if all_factors_str != st.session_state.factors_input:
+        st.session_state.factors_input = all_factors_str
+    
+    all_factors = parse_factor_list(all_factors_str)
+
+    # Add a button to suggest variables
+    if st.button("🎯 Suggest Treatment and Outcome Variables", disabled=not llm_available):
+        if all_factors:
+            with st.spinner("Analyzing factors to suggest variables..."):
+                try:
+                    suggested_treatment, suggested_outcome = suggest_variables_from_factors(all_factors, openai_api_key)
+                    if suggested_treatment and suggested_outcome:
+                        st.session_state.suggested_treatment = suggested_treatment
+                        st.session_state.suggested_outcome = suggested_outcome
+                        st.session_state.treatment_input = suggested_treatment
+                        st.session_state.outcome_input = suggested_outcome
+                        st.success(f"Variables suggested! Treatment: {suggested_treatment}, Outcome: {suggested_outcome}")
+                    else:
+                        st.warning("Could not generate suggestions. Please check your input factors.")
+                except Exception as e:
+                    st.error(f"Error during suggestion: {str(e)}")
+        else:
+            st.warning(MISSING_FACTORS_ERROR)
+
+    # Treatment input with session state
+    treatment = st.text_input(
+        "🎯 Enter the treatment variable:",
+        value=st.session_state.treatment_input,
+        help="The variable whose effect you want to study.",
+        key="treatment_field"
+    )
+    
+    # Update session state for treatment
+    if treatment != st.session_state.treatment_input:
+        st.session_state.treatment_input = treatment
+
+    # Outcome input with session state
+    outcome = st.text_input(
+        "🎯 Enter the outcome variable:",
+        value=st.session_state.outcome_input,
+        help="The variable you want to measure the effect on.",
+        key="outcome_field"
+    )
+    
+    # Update session state for outcome
+    if outcome != st.session_state.outcome_input:
+        st.session_state.outcome_input = outcome
+
+with col2:
+    st.markdown('<h2 class="section-header">Analysis Steps</h2>', unsafe_allow_html=True)
+    
+    # Initialize session state
+    if 'domain_expertises' not in st.session_state:
+        st.session_state.domain_expertises = None
+    if 'relationship_cache' not in st.session_state:
+        st.session_state.relationship_cache = {}
+
+    if analysis_type == "Model Suggestion":
+        st.markdown('<div class="model-step-title">🔍 Model Suggestion Step</div>', unsafe_allow_html=True)
+        st.markdown("""
+        <div class="info-box">
+        Build your initial causal model through these steps:
+        <ol>
+            <li>Identify required domain expertise</li>
+            <li>Discover potential confounding variables</li>
+            <li>Establish pair-wise relationships between variables</li>
+        </ol>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        if st.button("Suggest Domain Expertises", disabled=not llm_available):
+            if all_factors:
+                # Built on click: the suggester needs an API key as soon as it is created
+                modeler = ModelSuggester(PYWHYLLM_MODEL)
+                st.session_state.domain_expertises = modeler.suggest_domain_expertises(all_factors)
+                record_stage_result("domain_expertises", st.session_state.domain_expertises)
+                st.subheader("Suggested Domain Expertises:")
+                formatted_expertises = format_domain_expertises(st.session_state.domain_expertises)
+                st.markdown(formatted_expertises)
+            else:
+                st.warning("Please enter the relevant factors.")
+
+        chunked_confounders = st.checkbox(
+            "Search confounders in parallel chunks",
+            value=len(all_factors or []) > CONFOUNDER_CHUNK_SIZE,
+            help="Splits the factor list into chunks that are checked concurrently, so long factor lists fit in each response."
+        )
+        if chunked_confounders:
+            confounder_chunk_size = st.slider("Factors per prompt", min_value=5, max_value=50, value=CONFOUNDER_CHUNK_SIZE, key="confounder_chunk_size")
+            confounder_concurrency = st.slider("Concurrent prompts", min_value=1, max_value=16, value=4, key="confounder_concurrency")
+
+        if st.button("Suggest Potential Confounders", disabled=not llm_available):
+            if all_factors and treatment and outcome:
+                with st.spinner("Analyzing potential confounding variables..."):
+                    try:
+                        if chunked_confounders:
+                            suggested_confounders = suggest_confounders_chunked(
+                                treatment, outcome, all_factors, openai_api_key,
+                                chunk_size=confounder_chunk_size, max_concurrency=confounder_concurrency
+                            )
+                        else:
+                            suggested_confounders = suggest_confounders_from_factors(
+                                treatment, outcome, all_factors, openai_api_key
+                            )
+                        if suggested_confounders:
+                            record_stage_result("confounders", suggested_confounders)
+                            st.subheader("Potential Confounding Variables")
+                            formatted_confounders = format_confounder_output(suggested_confounders)
+                            st.markdown(formatted_confounders)
+                    except Exception as e:
+                        st.error(f"Error during confounders suggestion: {str(e)}")
+            else:
+                st.warning(MISSING_VARIABLES_ERROR)
+
+        relationship_strategy = st.radio(
+            "Relationship strategy",
+            ["Single prompt", "Batched pairwise", "Clustered", "Data-driven discovery (PC)"],
+            horizontal=True,
+            help="Batched pairwise judges every variable pair, several pairs per prompt, with prompts sent concurrently. "
+                 "Clustered finds edges within groups of related factors, then judges only pairs of group representatives, "
+                 "so large models need far fewer prompts. "
+                 "Data-driven discovery runs the PC algorithm on a dataset, using suggested relationships as priors."
+        )
+        if relationship_strategy in ("Batched pairwise", "Clustered"):
+            if relationship_strategy == "Clustered":
+                cluster_by = st.radio(
+                    "Group factors by",
+                    ["name", "domain"],
+                    format_func={"name": "Shared name words", "domain": "Suggested domain expertise"}.get,
+                    horizontal=True
+                )
+                cluster_size = st.slider("Largest cluster", min_value=5, max_value=40, value=DEFAULT_CLUSTER_SIZE)
+            pair_batch_size = st.slider("Pairs per prompt", min_value=1, max_value=30, value=10)
+            pair_concurrency = st.slider("Concurrent prompts", min_value=1, max_value=16, value=4)
+            incremental_relationships = False
+            if relationship_strategy == "Batched pairwise":
+                pair_count = len(all_factors or []) * (len(all_factors or []) - 1) // 2
+                prefilter_pairs = st.checkbox(
+                    "Prefilter candidate pairs",
+                    value=pair_count > DEFAULT_PAIR_BUDGET,
+                    help="Ranks pairs by data correlation, or by similar names and descriptions without a dataset, "
+                         "and only sends the best ones to the LLM."
+                )
+                if prefilter_pairs:
+                    pair_budget = st.number_input("Pair budget", min_value=10, value=DEFAULT_PAIR_BUDGET, step=50)
+                    screening_dataset = st.file_uploader(
+                        "Dataset for correlation screening (optional)",
+                        type=["csv", "tsv", "parquet", "pq"],
+                        key="screening_dataset"
+                    )
+                with st.expander("📌 Edge constraints"):
+                    st.text_area("Forbidden edges", key="forbidden_edges", placeholder="One per line: source -> target")
+                    st.text_area("Required edges", key="required_edges", placeholder="One per line: source -> target")
+                    st.text_area(
+                        "Temporal tiers",
+                        key="temporal_tiers",
+                        placeholder="One tier per line, earliest first, e.g.\nage, sex\nsmoking\nlung cancer",
+                        help="Edges never point from a later tier to an earlier one."
+                    )
+        elif relationship_strategy == "Data-driven discovery (PC)":
+            discovery_dataset = st.file_uploader("Dataset (CSV or Parquet)", type=["csv", "tsv", "parquet", "pq"], key="discovery_dataset")
+            discovery_alpha = st.slider("Significance level", 0.001, 0.2, DEFAULT_ALPHA, 0.001, format="%.3f", key="pc_alpha")
+            discovery_max_level = st.slider("Largest conditioning set", min_value=0, max_value=5, value=3)
+            cpu_count = os.cpu_count() or 1
+            discovery_workers = st.slider("Worker processes", min_value=1, max_value=max(2, cpu_count), value=min(4, cpu_count))
+            llm_priors = st.session_state.get('stage_results', {}).get("relationships")
+            use_priors = st.checkbox(
+                "Use suggested relationships as priors",
+                value=bool(llm_priors),
+                disabled=not llm_priors,
+                help="Strong suggestions are kept, weak ones are pruned unless the data strongly disagrees, "
+                     "and likely confounders are tested first."
+            )
+            incremental_relationships = False
+        else:
+            incremental_relationships = st.checkbox(
+                "Incremental relationship update",
+                value=True,
+                help="Only query relationships for factors added since the last run and drop edges of removed factors."
+            )
+
+        if st.button("Suggest Pair-wise Relationships (DAG)"):
+            if all_factors and treatment and outcome:
+                if relationship_strategy == "Data-driven discovery (PC)" and discovery_dataset is None:
+                    st.warning("Please upload a dataset first.")
+                elif not llm_available and relationship_strategy != "Data-driven discovery (PC)":
+                    st.error(LLM_PROVIDER_ERROR)
+                else:
+                    with st.spinner("Analyzing potential relationships between variables..."):
+                        try:
+                            if relationship_strategy == "Data-driven discovery (PC)":
+                                discovery = discover_relationships_from_data(
+                                    treatment, outcome, all_factors, load_session_dataset(discovery_dataset),
+                                    alpha=discovery_alpha, max_level=discovery_max_level, max_workers=discovery_workers,
+                                    priors=llm_priors if use_priors else None,
+                                    prune_threshold=0.3 if use_priors else None
+                                )
+                                suggested_relationships = discovery["edges"] if discovery else None
+                                if discovery:
+                                    record_stage_result("discovery", discovery)
+                                    st.markdown(
+                                        f"Ran {discovery['tests']} independence tests "
+                                        f"({discovery['cached_tests']} reused from earlier runs)."
+                                    )
+                                    if discovery["undirected"]:
+                                        st.info(
+                                            "The direction of these relationships could not be determined: "
+                                            + ", ".join(f"{a} — {b}" for a, b in discovery["undirected"])
+                                        )
+                            elif relationship_strategy == "Batched pairwise":
+                                constraints = pair_constraints_from_inputs([treatment, outcome] + all_factors)
+                                candidate_pairs_to_judge = None
+                                if prefilter_pairs:
+                                    screening = load_uploaded_dataset(screening_dataset) if screening_dataset else st.session_state.get('dataset')
+                                    candidate_pairs_to_judge = prefilter_candidate_pairs(
+                                        treatment, outcome, all_factors, budget=pair_budget,
+                                        dataset=screening, constraints=constraints
+                                    )
+                                confidence_matrix = score_pairs_batched(
+                                    treatment, outcome, all_factors, openai_api_key, pairs=candidate_pairs_to_judge,
+                                    batch_size=pair_batch_size, max_concurrency=pair_concurrency
+                                )
+                                suggested_relationships = constraints.apply(confidence_matrix.edges()) if confidence_matrix else None
+                                if confidence_matrix:
+                                    with st.expander("📐 Confidence Matrix (rows cause columns)"):
+                                        st.dataframe([
+                                            {"cause": source, **row}
+                                            for source, row in confidence_matrix.to_dict().items()
+                                        ])
+                            elif relationship_strategy == "Clustered":
+                                suggested_relationships = suggest_relationships_clustered(
+                                    treatment, outcome, all_factors, openai_api_key,
+                                    cluster_by=cluster_by, cluster_size=cluster_size,
+                                    batch_size=pair_batch_size, max_concurrency=pair_concurrency
+                                )
+                            elif incremental_relationships:
+                                suggested_relationships = suggest_relationships_incremental(
+                                    treatment, outcome, all_factors, openai_api_key,
+                                    st.session_state.relationship_cache
+                                )
+                            else:
+                                suggested_relationships = suggest_relationships_from_factors(
+                                    treatment, outcome, all_factors, openai_api_key
+                                )
+                            if suggested_relationships:
+                                # Seed the DAG editor in the validation step with these edges
+                                st.session_state.suggested_relationships = suggested_relationships
+                                if relationship_strategy != "Data-driven discovery (PC)":
+                                    record_stage_result("relationships", suggested_relationships)
+                                st.subheader("Suggested Pair-wise Relationships (Potential DAG Edges)")
+                                st.success("Successfully identified relationships between variables!")
+                                format_relationship_output(suggested_relationships, key="step_relationships")
+                            else:
+                                st.warning("No relationships could be identified. Please check your input variables and try again.")
+                        except Exception as e:
+                            st.error(f"An error occurred while analyzing relationships: {str(e)}")
+                            st.info("Try simplifying your input or checking for any special characters in variable names.")
+            else:
+                st.warning(MISSING_VARIABLES_ERROR)
+        elif st.session_state.get('suggested_relationships'):
+            # Page and filter changes rerun the script, so the last result stays on screen
+            st.subheader("Suggested Pair-wise Relationships (Potential DAG Edges)")
+            format_relationship_output(st.session_state.suggested_relationships, key="step_relationships")
+
+    elif analysis_type == "Identification Suggestion":
+        st.markdown("""
+        <div class="info-box">
+        <h3>🔍 Identification Suggestion Step</h3>
+        Identify key components for causal estimation:
+        <ol>
+            <li>Find backdoor adjustment sets</li>
+            <li>Discover potential mediator variables</li>
+            <li>Locate possible instrumental variables</li>
+        </ol>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        if st.button("Suggest Backdoor Set", disabled=not llm_available):
+            if all_factors and treatment and outcome:
+                with st.spinner("Analyzing variables to identify backdoor adjustment set..."):
+                    try:
+                        suggested_backdoor = suggest_backdoor_from_factors(
+                            treatment, outcome, all_factors, openai_api_key
+                        )
+                        if suggested_backdoor:
+                            record_stage_result("backdoor", suggested_backdoor)
+                            st.success("Successfully identified backdoor adjustment set!")
+                            formatted_backdoor = format_backdoor_set(suggested_backdoor)
+                            st.markdown(formatted_backdoor)
+                        else:
+                            st.warning("No clear backdoor adjustment set could be identified. Please check your input variables.")
+                    except Exception as e:
+                        st.error(f"Error during backdoor set suggestion: {str(e)}")
+            else:
+                st.warning(MISSING_VARIABLES_ERROR)
+
+        if st.button("Suggest Mediator Set", disabled=not llm_available):
+            if all_factors and treatment and outcome:
+                with st.spinner("Analyzing variables to identify mediators..."):
+                    try:
+                        suggested_mediators = suggest_mediator_from_factors(
+                            treatment, outcome, all_factors, openai_api_key
+                        )
+                        if suggested_mediators:
+                            record_stage_result("mediators", suggested_mediators)
+                            st.success("Successfully identified mediator variables!")
+                            format_mediator_output(suggested_mediators)
+                        else:
+                            st.warning("No clear mediator variables could be identified. Please check your input variables.")
+                    except Exception as e:
+                        st.error(f"Error during mediator suggestion: {str(e)}")
+            else:
+                st.warning(MISSING_VARIABLES_ERROR)
+
+        if st.button("Suggest Instrumental Variables (IVs)", disabled=not llm_available):
+            if all_factors and treatment and outcome:
+                with st.spinner("Analyzing variables to identify instrumental variables..."):
+                    try:
+                        suggested_ivs = suggest_iv_from_factors(
+                            treatment, outcome, all_factors, openai_api_key
+                        )
+                        if suggested_ivs:
+                            record_stage_result("ivs", suggested_ivs)
+                            st.success("Successfully identified instrumental variables!")
+                            format_iv_output(suggested_ivs)
+                        else:
+                            st.warning("No clear instrumental variables could be identified. Please check your input variables.")
+                    except Exception as e:
+                        st.error(f"Error during IV suggestion: {str(e)}")
+            else:
+                st.warning(MISSING_VARIABLES_ERROR)
+
+    elif analysis_type == "Validation Suggestion":
+        st.markdown("""
+        <div class="info-box">
+        <h3>✅ Validation Suggestion Step</h3>
+        Validate and improve your causal model:
+        <ol>
+            <li>Review and edit the automatically generated DAG</li>
+            <li>Get comprehensive model validation</li>
+            <li>Identify potential improvements</li>
+        </ol>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        # Update the DAG interface with the new user-friendly version
+        update_dag_interface()
+        
+        # Add validation buttons in a row
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            validation_mode = st.radio(
+                "Validation mode",
+                ["Whole model", "Edge-by-edge critique"],
+                help="Edge-by-edge critique splits the DAG into chunks of edges that are reviewed concurrently, so it scales to large models."
+            )
+            if st.button("🔍 Validate Model", disabled=not llm_available):
+                if 'current_dag' in st.session_state:
+                    validation_factors = parse_factor_list(st.session_state.factors_input)
+                    if validation_mode == "Edge-by-edge critique":
+                        with st.spinner("Critiquing the edges of your causal model..."):
+                            edge_critiques = critique_dag_chunked(
+                                st.session_state.treatment_input,
+                                st.session_state.outcome_input,
+                                validation_factors,
+                                st.session_state.current_dag,
+                                openai_api_key
+                            )
+                            if edge_critiques:
+                                record_stage_result("edge_critiques", edge_critiques)
+                                display_edge_critiques(edge_critiques, key="step_edge_critiques")
+                            else:
+                                st.warning("Could not critique the model. Please check your inputs and try again.")
+                    else:
+                        with st.spinner("Analyzing your causal model..."):
+                            validation_results = validate_causal_model(
+                                st.session_state.treatment_input,
+                                st.session_state.outcome_input,
+                                validation_factors,
+                                st.session_state.current_dag
+                            )
+                            if validation_results:
+                                record_stage_result("validation", validation_results)
+                                display_validation_results(validation_results)
+                            else:
+                                st.warning("Could not validate the model. Please check your inputs and try again.")
+                else:
+                    st.warning("Please define your DAG structure first.")
+            elif validation_mode == "Edge-by-edge critique" and st.session_state.get('stage_results', {}).get("edge_critiques"):
+                display_edge_critiques(st.session_state.stage_results["edge_critiques"], key="step_edge_critiques")
+        
+        with col2:
+            if st.button("📋 Show Validation Guide"):
+                st.markdown("""
+                ### 📚 Validation Guide
+                
+                #### What We Check
+                1. **DAG Structure**
+                   - Missing relationships
+                   - Questionable relationships
+                   - Causal direction plausibility
+                
+                2. **Confounding**
+                   - Unmeasured confounders
+                   - Control variables
+                   - Backdoor paths
+                
+                3. **Assumptions**
+                   - Temporal ordering
+                   - No unmeasured confounding
+                   - Causal sufficiency
+                
+                #### How to Use Results
+                1. Review all identified issues
+                2. Prioritize critical problems
+                3. Document assumptions
+                4. Update your model iteratively
+                """)
+        
+        # Test the DAG against data instead of asking the model
+        with st.expander("📈 Test the DAG Against Data"):
+            st.markdown("Upload a dataset to check the independencies implied by your DAG with partial-correlation tests.")
+            uploaded_dataset = st.file_uploader("Dataset (CSV or Parquet)", type=["csv", "tsv", "parquet", "pq"], key="validation_dataset")
+            alpha = st.slider("Significance level", 0.001, 0.2, DEFAULT_ALPHA, 0.001, format="%.3f", key="ci_alpha")
+            if st.button("🧪 Run Independence Tests"):
+                if uploaded_dataset is None:
+                    st.warning("Please upload a dataset first.")
+                elif 'current_dag' not in st.session_state:
+                    st.warning("Please define your DAG structure first.")
+                else:
+                    with st.spinner("Testing the DAG against the data..."):
+                        dataset = load_session_dataset(uploaded_dataset)
+                        ci_results = test_dag_with_data(st.session_state.current_dag, dataset, alpha)
+                        if ci_results:
+                            record_stage_result("ci_tests", ci_results)
+                            display_ci_results(ci_results)
+            
+            st.markdown("**Edge stability:** re-test every edge on bootstrap resamples of the data.")
+            n_resamples = st.slider("Bootstrap resamples", 50, 1000, 200, 50, key="bootstrap_resamples")
+            if st.button("🎲 Compute Edge Stability"):
+                if uploaded_dataset is None:
+                    st.warning("Please upload a dataset first.")
+                elif 'current_dag' not in st.session_state:
+                    st.warning("Please define your DAG structure first.")
+                else:
+                    with st.spinner(f"Testing the edges on {n_resamples} resamples..."):
+                        dataset = load_session_dataset(uploaded_dataset)
+                        scores = compute_edge_stability(st.session_state.current_dag, dataset, n_resamples, alpha)
+                        if scores:
+                            record_stage_result("edge_stability", [[source, target, score] for (source, target), score in scores.items()])
+                            confidences = suggested_confidences()
+                            relationships = [
+                                [source, target, confidences.get((source, target), 0.7)]
+                                for source, targets in st.session_state.current_dag.items()
+                                for target in targets
+                            ]
+                            dot = create_dag_visualization(relationships, stability=scores)
+                            if dot:
+                                st.graphviz_chart(dot)
+                            st.caption(f"Edges labelled 'boot' show the share of resamples where the data supports them; dashed edges are below {EDGE_STABILITY_THRESHOLD:.0%}.")
+        
+        # Add help text
+        with st.expander("❓ Need Help?"):
+            st.markdown("""
+            **Common Questions:**
+            
+            1. **What is a DAG?**
+               - A Directed Acyclic Graph showing causal relationships
+               - Arrows indicate direction of causation
+               - No cycles allowed (A→B→A is invalid)
+            
+            2. **What are negative controls?**
+               - Variables that should not be affected by your treatment
+               - Help validate your causal assumptions
+               - Example: Past values of outcome variable
+            
+            3. **What are latent confounders?**
+               - Unmeasured variables affecting both treatment and outcome
+               - Can bias your causal estimates
+               - Important to identify and control for if possible
+            """)
+
+    elif analysis_type == "Full Analysis Pipeline":
+        st.markdown("""
+        <div class="info-box">
+        <h3>⚡ Full Analysis Pipeline</h3>
+        Run every analysis step in one go:
+        <ol>
+            <li>Independent steps run concurrently</li>
+            <li>Suggested relationships seed the DAG used for validation</li>
+            <li>Only steps whose inputs changed are recomputed on the next run</li>
+        </ol>
+        </div>
+        """, unsafe_allow_html=True)
+
+        selected_stages = st.multiselect(
+            "Steps to run",
+            options=list(PIPELINE_STAGES),
+            default=list(PIPELINE_STAGES),
+            format_func=lambda name: PIPELINE_STAGES[name]
+        )
+        force_recompute = st.checkbox("Recompute all steps (ignore cached results)")
+
+        pipeline_inputs = {
+            "factors": all_factors,
+            "treatment": treatment,
+            "outcome": outcome,
+            # Descriptions are part of the prompts, so they key the LLM stages
+            "factor_descriptions": {
+                factor: desc
+                for factor, desc in st.session_state.get('factor_descriptions', {}).items()
+                if factor in all_factors
+            },
+            # A changed route only invalidates the stages it serves
+            **{
+                f"model_{stage}": st.session_state.model_routes.get(stage) or llm_model
+                for stage in ROUTE_STAGES
+            },
+        }
+        pipeline_force = list(PIPELINE_STAGES) if force_recompute else ()
+
+        col1, col2 = st.columns(2)
+        with col1:
+            run_now = st.button("▶️ Run Pipeline", disabled=not llm_available)
+        with col2:
+            run_in_background = st.button("🧵 Run in Background", disabled=not llm_available)
+
+        if run_now:
+            if all_factors:
+                with st.spinner("Running the analysis pipeline..."):
+                    pipeline = build_analysis_pipeline(openai_api_key)
+                    run = pipeline.run(pipeline_inputs, targets=selected_stages or None, force=pipeline_force)
+                    record_cache_hits(run)
+                apply_pipeline_run(run)
+            else:
+                st.warning(MISSING_FACTORS_ERROR)
+
+        if run_in_background:
+            if all_factors:
+                job_id = submit_pipeline_job(openai_api_key, pipeline_inputs, selected_stages or None, pipeline_force)
+                st.success(f"Submitted background job `{job_id}`.")
+            else:
+                st.warning(MISSING_FACTORS_ERROR)
+
+        background_jobs_panel()
+
+        if 'pipeline_run' in st.session_state:
+            display_pipeline_results(st.session_state.pipeline_run)
+
+show_stale_answers(stale_notice)
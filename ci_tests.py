@@ -0,0 +1,401 @@
+"""Test a DAG's implied conditional independencies against a dataset.
+
+The correlation matrix is computed once per dataset. Every test
+``X ⊥ Y | S`` is then answered from it with a partial correlation and a
+Fisher z-test. Tests that share a conditioning set are evaluated together
+from the Schur complement of that set, and the inverse of each
+conditioning block (a sub-block of the precision matrix) is cached, so
+hundreds of constraints take a handful of small matrix operations.
+"""
+import csv
+import io
+import itertools
+import math
+import os
+
+import numpy as np
+
+DEFAULT_ALPHA = 0.05
+# CSV rows parsed per block; each block is written straight into the result array
+CSV_BLOCK_ROWS = 8192
+
+
+class DatasetError(ValueError):
+    """Raised when a dataset cannot be used for independence tests."""
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _source_size(source):
+    """Return the size in bytes of a path or seekable stream, or None."""
+    if isinstance(source, (str, os.PathLike)):
+        return os.path.getsize(source)
+    try:
+        position = source.tell()
+        size = source.seek(0, os.SEEK_END)
+        source.seek(position)
+        return size - position
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _parse_block(block, width):
+    """Return the CSV rows in ``block`` as a float array of ``width`` columns."""
+    if all(len(row) == width for row in block):
+        try:
+            return np.array(block, dtype=np.float64)
+        except ValueError:
+            pass
+    return np.array(
+        [[_to_float(value) for value in row[:width]] + [math.nan] * (width - len(row)) for row in block],
+        dtype=np.float64
+    )
+
+
+def _keep_columns(data, keep):
+    """Return ``data[:, keep]`` compacted inside ``data``'s own buffer, a block of rows at a time."""
+    if keep.all():
+        return data
+    rows, width = data.shape
+    kept = int(keep.sum())
+    flat = data.reshape(-1)
+    for start in range(0, rows, CSV_BLOCK_ROWS):
+        # Row ``start`` begins at or after everything written so far, so the block is intact
+        block = data[start:start + CSV_BLOCK_ROWS][:, keep]
+        flat[start * kept:start * kept + block.size] = block.ravel()
+    del flat
+    data.resize((rows, kept), refcheck=False)
+    return data
+
+
+def load_numeric_dataset(source, filename, max_rows=None):
+    """Return ``(columns, data)`` with the numeric columns of a CSV or Parquet file.
+
+    Non-numeric cells become NaN; columns with no numeric values are dropped.
+    Values are written straight into one float64 array, so peak memory stays
+    close to the size of the result.
+    """
+    extension = os.path.splitext(str(filename).lower())[1]
+    if extension in (".parquet", ".pq"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise DatasetError("Reading Parquet files requires pyarrow. Install it with: pip install pyarrow") from e
+        parquet = pq.ParquetFile(source)
+        rows = parquet.metadata.num_rows if max_rows is None else min(max_rows, parquet.metadata.num_rows)
+        names = parquet.schema_arrow.names
+        data = np.empty((rows, len(names)), dtype=np.float64)
+        keep = np.zeros(len(names), dtype=bool)
+        # One decoded column at a time
+        for j, name in enumerate(names):
+            column = parquet.read(columns=[name]).column(0).slice(0, rows)
+            try:
+                data[:, j] = column.to_numpy(zero_copy_only=False)
+                keep[j] = True
+            except (TypeError, ValueError):
+                continue
+        if not keep.any():
+            raise DatasetError("The dataset has no numeric columns.")
+        return [name for name, numeric in zip(names, keep) if numeric], _keep_columns(data, keep)
+
+    size = _source_size(source)
+    if isinstance(source, (str, os.PathLike)):
+        f = open(source, newline="", encoding="utf-8-sig", errors="replace")
+    else:
+        f = io.TextIOWrapper(source, newline="", encoding="utf-8-sig", errors="replace")
+    try:
+        reader = csv.reader(f, delimiter="\t" if extension == ".tsv" else ",")
+        header = [name.strip() for name in next(reader, [])]
+        if not header:
+            raise DatasetError("The dataset has no header row.")
+        width = len(header)
+        data = None
+        filled = read = 0
+        numeric = np.zeros(width, dtype=bool)
+        while max_rows is None or read < max_rows:
+            limit = CSV_BLOCK_ROWS if max_rows is None else min(CSV_BLOCK_ROWS, max_rows - read)
+            block = list(itertools.islice(reader, limit))
+            if not block:
+                break
+            read += len(block)
+            block = [row for row in block if row]
+            if not block:
+                continue
+            values = _parse_block(block, width)
+            if data is None:
+                # Size the array from the bytes per row of the first block
+                capacity = len(values)
+                if size:
+                    row_bytes = sum(len(value) + 1 for row in block for value in row) / len(block)
+                    capacity = max(capacity, int(size / max(row_bytes, 1.0) * 1.05))
+                if max_rows is not None:
+                    capacity = min(capacity, max_rows)
+                data = np.empty((capacity, width), dtype=np.float64)
+            elif filled + len(values) > len(data):
+                data.resize((max(filled + len(values), len(data) * 3 // 2), width), refcheck=False)
+            data[filled:filled + len(values)] = values
+            numeric |= ~np.isnan(values).all(axis=0)
+            filled += len(values)
+    finally:
+        if isinstance(source, (str, os.PathLike)):
+            f.close()
+        else:
+            # Leave the caller's binary stream open
+            f.detach()
+
+    if not filled:
+        raise DatasetError("The dataset has no rows.")
+    if not numeric.any():
+        raise DatasetError("The dataset has no numeric columns.")
+    data.resize((filled, width), refcheck=False)
+    return [name for name, keep in zip(header, numeric) if keep], _keep_columns(data, numeric)
+
+
+def implied_independencies(dag):
+    """Return the local Markov independencies ``(x, y, parents)`` of a DAG.
+
+    Each node is independent of its non-descendants given its parents.
+    Every unordered pair is tested once.
+    """
+    nodes = list(dict.fromkeys(n for source, targets in dag.items() for n in (source, *targets)))
+    parents = {node: [] for node in nodes}
+    for source, targets in dag.items():
+        for target in targets:
+            if source not in parents[target]:
+                parents[target].append(source)
+
+    descendants = {}
+
+    def collect(node):
+        # Iterative DFS; results are shared between nodes
+        if node in descendants:
+            return descendants[node]
+        seen = set()
+        stack = list(dag.get(node, ()))
+        while stack:
+            child = stack.pop()
+            if child not in seen:
+                seen.add(child)
+                stack.extend(dag.get(child, ()))
+        descendants[node] = seen
+        return seen
+
+    constraints = []
+    tested = set()
+    for node in nodes:
+        excluded = collect(node) | set(parents[node]) | {node}
+        for other in nodes:
+            if other in excluded:
+                continue
+            pair = frozenset((node, other))
+            if pair in tested:
+                continue
+            tested.add(pair)
+            constraints.append((node, other, tuple(parents[node])))
+    return constraints
+
+
+def edge_dependencies(dag):
+    """Return one test per edge: ``source`` and ``target`` given the target's other parents.
+
+    An edge whose test does not reject independence is not supported by the data.
+    """
+    parents = {}
+    for source, targets in dag.items():
+        for target in targets:
+            parents.setdefault(target, [])
+            if source not in parents[target]:
+                parents[target].append(source)
+    return [
+        (source, target, tuple(p for p in parents[target] if p != source))
+        for source, targets in dag.items()
+        for target in dict.fromkeys(targets)
+        if source != target
+    ]
+
+
+def fisher_z_pvalue(partial_correlation, n, conditioning_size):
+    """Two-sided Fisher z-test p-value for one partial correlation."""
+    r = min(max(partial_correlation, -0.999999), 0.999999)
+    z = abs(math.atanh(r)) * math.sqrt(max(n - conditioning_size - 3, 1))
+    return math.erfc(z / math.sqrt(2))
+
+
+def fisher_z_pvalues(partial_correlations, n, conditioning_sizes):
+    """Two-sided Fisher z-test p-values for partial correlations."""
+    r = np.clip(np.asarray(partial_correlations, dtype=float), -0.999999, 0.999999)
+    dof = np.maximum(n - np.asarray(conditioning_sizes, dtype=float) - 3, 1)
+    z = np.abs(np.arctanh(r)) * np.sqrt(dof)
+    return np.array([math.erfc(value / math.sqrt(2)) for value in z])
+
+
+def correlation_matrix(data):
+    """Return the correlation matrix and row count of the complete rows of ``data``."""
+    data = np.asarray(data, dtype=float)
+    # Listwise deletion keeps one sample size for every test
+    data = data[~np.isnan(data).any(axis=1)]
+    if data.shape[0] < 5:
+        raise DatasetError("At least 5 complete rows are needed for independence tests.")
+    constant = data.std(axis=0) == 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        corr = np.atleast_2d(np.corrcoef(data, rowvar=False))
+    # Constant columns carry no information; treat them as uncorrelated
+    corr[constant, :] = 0.0
+    corr[:, constant] = 0.0
+    corr[np.diag_indices_from(corr)] = 1.0
+    return corr, data.shape[0]
+
+
+class CITestEngine:
+    """Batched partial-correlation tests over one dataset's correlation matrix."""
+
+    def __init__(self, data, columns, corr=None, n=None):
+        if corr is None:
+            corr, n = correlation_matrix(data)
+        self.corr, self.n = corr, n
+        self.columns = list(columns)
+        self.index = {name: i for i, name in enumerate(self.columns)}
+        self._inverse_cache = {}
+
+    @classmethod
+    def from_correlation(cls, corr, n, columns):
+        """Build an engine from a precomputed correlation matrix and sample size."""
+        return cls(None, columns, corr=np.asarray(corr, dtype=float), n=n)
+
+    def _inverse_block(self, conditioning):
+        """Return the cached (pseudo-)inverse of the conditioning set's correlation block."""
+        key = tuple(sorted(conditioning))
+        if key not in self._inverse_cache:
+            idx = list(key)
+            self._inverse_cache[key] = (idx, np.linalg.pinv(self.corr[np.ix_(idx, idx)]))
+        return self._inverse_cache[key]
+
+    def partial_correlations(self, tests):
+        """Return partial correlations for ``(x, y, conditioning)`` index triples."""
+        results = np.empty(len(tests))
+        groups = {}
+        for i, (x, y, conditioning) in enumerate(tests):
+            groups.setdefault(tuple(sorted(set(conditioning))), []).append(i)
+
+        for conditioning, members in groups.items():
+            xs = np.array([tests[i][0] for i in members])
+            ys = np.array([tests[i][1] for i in members])
+            if conditioning:
+                idx, inverse = self._inverse_block(conditioning)
+                # Residual correlation given S: C_ab - C_aS C_SS^-1 C_Sb for all pairs at once
+                involved = np.unique(np.concatenate([xs, ys]))
+                cross = self.corr[np.ix_(involved, idx)]
+                residual = self.corr[np.ix_(involved, involved)] - cross @ inverse @ cross.T
+                position = {v: i for i, v in enumerate(involved)}
+                px = np.array([position[x] for x in xs])
+                py = np.array([position[y] for y in ys])
+                numerator = residual[px, py]
+                denominator = np.sqrt(np.clip(residual[px, px] * residual[py, py], 1e-12, None))
+            else:
+                numerator = self.corr[xs, ys]
+                denominator = 1.0
+            results[members] = numerator / denominator
+        return np.clip(results, -1.0, 1.0)
+
+    def test(self, constraints, alpha=DEFAULT_ALPHA):
+        """Test named ``(x, y, conditioning)`` constraints and return one row per test."""
+        tests = [
+            (self.index[x], self.index[y], [self.index[s] for s in conditioning])
+            for x, y, conditioning in constraints
+        ]
+        if not tests:
+            return []
+        r = self.partial_correlations(tests)
+        p_values = fisher_z_pvalues(r, self.n, [len(t[2]) for t in tests])
+        return [
+            {
+                "x": x,
+                "y": y,
+                "given": list(conditioning),
+                "partial_corr": round(float(r[i]), 4),
+                "p_value": float(p_values[i]),
+                "independent": bool(p_values[i] >= alpha),
+            }
+            for i, (x, y, conditioning) in enumerate(constraints)
+        ]
+
+
+def column_mapping(dag, lookup):
+    """Map DAG nodes to dataset columns with ``lookup``.
+
+    Returns ``{node: column}`` for the matched nodes and the list of nodes
+    without a column.
+    """
+    mapping, unmatched = {}, []
+    for node in dict.fromkeys(n for source, targets in dag.items() for n in (source, *targets)):
+        column = lookup(node)
+        if column is None:
+            unmatched.append(node)
+        else:
+            mapping[node] = column
+    return mapping, unmatched
+
+
+def map_dag_to_columns(dag, lookup):
+    """Rename DAG nodes to dataset columns with ``lookup`` and drop nodes without a column.
+
+    Returns the mapped DAG and the list of unmatched nodes.
+    """
+    mapping, unmatched = column_mapping(dag, lookup)
+    mapped = {}
+    for source, targets in dag.items():
+        if source in mapping:
+            mapped.setdefault(mapping[source], [])
+            mapped[mapping[source]].extend(mapping[t] for t in targets if t in mapping and mapping[t] != mapping[source])
+    return mapped, unmatched
+
+
+def map_constraints(constraints, mapping):
+    """Rename ``(x, y, conditioning)`` constraints to columns, dropping those that involve an unmapped node."""
+    mapped = []
+    for x, y, conditioning in constraints:
+        if x not in mapping or y not in mapping or any(s not in mapping for s in conditioning):
+            continue
+        x, y = mapping[x], mapping[y]
+        conditioning = tuple(dict.fromkeys(mapping[s] for s in conditioning))
+        if x != y and x not in conditioning and y not in conditioning:
+            mapped.append((x, y, conditioning))
+    return mapped
+
+
+def test_dag_against_data(dag, columns, data, alpha=DEFAULT_ALPHA, lookup=None):
+    """Test a DAG's implied independencies and edges against a dataset.
+
+    Nodes without a matching column are reported as unmatched. The tests
+    are derived from the full DAG, and those that involve an unmatched node
+    are skipped, because conditioning on a latent variable is not possible.
+    Testing the DAG with the latent nodes removed instead would report
+    false violations, e.g. A and B in A -> L -> B with L unmeasured.
+    """
+    lookup = lookup or (lambda name: name if name in columns else None)
+    mapping, unmatched = column_mapping(dag, lookup)
+    used = list(dict.fromkeys(mapping.values()))
+    if not used:
+        raise DatasetError("None of the DAG's variables match a dataset column.")
+    # Only the DAG's columns, so unrelated sparse columns cost no rows in the listwise deletion
+    position = {name: i for i, name in enumerate(columns)}
+    engine = CITestEngine(np.asarray(data)[:, [position[name] for name in used]], used)
+    independencies = engine.test(map_constraints(implied_independencies(dag), mapping), alpha)
+    edges = engine.test(map_constraints(edge_dependencies(dag), mapping), alpha)
+    return {
+        "n": engine.n,
+        "alpha": alpha,
+        "unmatched": unmatched,
+        # Implied independencies the data rejects point to missing edges
+        "violated": sorted((t for t in independencies if not t["independent"]), key=lambda t: t["p_value"]),
+        "satisfied": sum(t["independent"] for t in independencies),
+        "independence_tests": len(independencies),
+        # Edges whose dependence the data cannot confirm
+        "unsupported_edges": sorted((t for t in edges if t["independent"]), key=lambda t: -t["p_value"]),
+        "edge_tests": len(edges),
+    }
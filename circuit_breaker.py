@@ -0,0 +1,269 @@
+"""Circuit breakers and stale-while-revalidate fallback for LLM providers.
+
+When a provider is failing or slow, every call would otherwise wait for
+the client timeout before showing an error. :class:`StaleWhileRevalidate`
+sits between :class:`llm_routing.LLMRouter` and the providers:
+
+- Every successful response is kept as the last good answer for its exact
+  request (model, messages, temperature and token limit).
+- A :class:`CircuitBreaker` per provider opens after ``failure_threshold``
+  of its last ``window`` calls failed or took longer than
+  ``slow_call_seconds``. While it is open, calls return the last good
+  answer at once, marked stale, or raise :class:`CircuitOpenError` if there
+  is none. After ``reset_timeout`` seconds one trial call is let through;
+  it closes the breaker if it succeeds.
+- While the breaker is closed, a request with a last good answer gets
+  ``stale_after`` seconds. If the provider fails or has not answered by
+  then, the stale answer is returned and the call finishes in the
+  background.
+- Each stale answer schedules a background revalidation that repeats the
+  request once the provider accepts calls again, so the next identical
+  request gets the fresh answer.
+
+Settings are read from the environment by :func:`load_fallback`:
+``LLM_BREAKER_FAILURES``, ``LLM_BREAKER_WINDOW``,
+``LLM_BREAKER_SLOW_SECONDS``, ``LLM_BREAKER_RESET_SECONDS``,
+``LLM_STALE_AFTER_SECONDS`` and ``LLM_LAST_GOOD_ENTRIES``.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_WINDOW = 10
+DEFAULT_SLOW_CALL_SECONDS = 20.0
+DEFAULT_RESET_TIMEOUT = 30.0
+DEFAULT_STALE_AFTER = 8.0
+DEFAULT_LAST_GOOD_ENTRIES = 512
+
+# Background revalidation gives up after this many failed calls
+MAX_REVALIDATION_ATTEMPTS = 5
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a provider's breaker is open and no earlier answer exists for the request."""
+
+
+class CircuitBreaker:
+    """Track a provider's recent failed and slow calls and stop calling it while they pile up."""
+
+    def __init__(self, name, failure_threshold=DEFAULT_FAILURE_THRESHOLD, window=DEFAULT_WINDOW,
+                 slow_call_seconds=DEFAULT_SLOW_CALL_SECONDS, reset_timeout=DEFAULT_RESET_TIMEOUT, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.slow_call_seconds = float(slow_call_seconds)
+        self.reset_timeout = float(reset_timeout)
+        self._clock = clock
+        self._lock = threading.Lock()
+        # True for each failed or slow call among the most recent ones
+        self._outcomes = deque(maxlen=max(self.failure_threshold, int(window)))
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trial_running = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def retry_in(self):
+        """Return the seconds until an open breaker lets a trial call through, 0 if it would now."""
+        with self._lock:
+            if self._state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - self._clock())
+
+    def allow(self):
+        """Return True if a call may go to the provider now.
+
+        An open breaker lets exactly one trial call through once
+        ``reset_timeout`` has passed; its :meth:`record` decides whether the
+        breaker closes again.
+        """
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record(self, latency, error=False):
+        """Record the outcome of a call that :meth:`allow` let through."""
+        failed = bool(error) or latency >= self.slow_call_seconds
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._trial_running = False
+                if failed:
+                    self._open()
+                else:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                return
+            self._outcomes.append(failed)
+            if self._state == CLOSED and sum(self._outcomes) >= self.failure_threshold:
+                self._open()
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = self._clock()
+        self._outcomes.clear()
+
+
+class LastGoodCache:
+    """The most recent successful response per request, least recently used dropped first."""
+
+    def __init__(self, max_entries=DEFAULT_LAST_GOOD_ENTRIES):
+        self.max_entries = max(1, int(max_entries))
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @staticmethod
+    def key(route_model, messages, temperature=None, max_tokens=None):
+        """Return the cache key of a chat completion request."""
+        payload = json.dumps([route_model, messages, temperature, max_tokens], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """Return ``(response, stored_at)`` for ``key``, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, response):
+        with self._lock:
+            self._entries[key] = (response, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class StaleWhileRevalidate:
+    """Serve requests through per-provider circuit breakers with a last good answer fallback."""
+
+    def __init__(self, failure_threshold=DEFAULT_FAILURE_THRESHOLD, window=DEFAULT_WINDOW,
+                 slow_call_seconds=DEFAULT_SLOW_CALL_SECONDS, reset_timeout=DEFAULT_RESET_TIMEOUT,
+                 stale_after=DEFAULT_STALE_AFTER, cache=None):
+        self.breaker_settings = {
+            "failure_threshold": failure_threshold,
+            "window": window,
+            "slow_call_seconds": slow_call_seconds,
+            "reset_timeout": reset_timeout,
+        }
+        self.stale_after = float(stale_after)
+        self.cache = cache if cache is not None else LastGoodCache()
+        self._breakers = {}
+        self._lock = threading.Lock()
+        self._revalidating = set()
+
+    def breaker(self, provider):
+        """Return the circuit breaker of the provider called ``provider``."""
+        with self._lock:
+            if provider not in self._breakers:
+                self._breakers[provider] = CircuitBreaker(provider, **self.breaker_settings)
+            return self._breakers[provider]
+
+    def states(self):
+        """Return ``{provider: state}`` for every provider called so far."""
+        with self._lock:
+            breakers = list(self._breakers.values())
+        return {breaker.name: breaker.state for breaker in breakers}
+
+    def _fetch(self, breaker, key, fetch):
+        start = time.perf_counter()
+        try:
+            response = fetch()
+        except Exception:
+            breaker.record(time.perf_counter() - start, error=True)
+            raise
+        breaker.record(time.perf_counter() - start)
+        self.cache.put(key, response)
+        return response
+
+    def call(self, provider, key, fetch):
+        """Return ``(response, stale_age)`` for the request ``key``; ``stale_age`` is None for a fresh answer.
+
+        ``fetch`` makes the actual provider call. Errors are raised as usual
+        when no last good answer exists for ``key``.
+        """
+        breaker = self.breaker(provider)
+        cached = self.cache.get(key)
+        if not breaker.allow():
+            if cached is None:
+                raise CircuitOpenError(
+                    f"LLM provider '{provider}' is failing or too slow; calls resume in {breaker.retry_in():.0f}s."
+                )
+            self._revalidate(breaker, key, fetch)
+            return cached[0], time.time() - cached[1]
+        if cached is None:
+            return self._fetch(breaker, key, fetch), None
+
+        # Wait briefly for a fresh answer; a slow call keeps running and refreshes the cache when done
+        future = Future()
+
+        def run():
+            try:
+                future.set_result(self._fetch(breaker, key, fetch))
+            except Exception as e:
+                future.set_exception(e)
+
+        # Its own thread rather than a pool, so the wait starts with the call instead of behind a queue
+        threading.Thread(target=run, name="llm-fetch", daemon=True).start()
+        try:
+            return future.result(timeout=self.stale_after), None
+        except FutureTimeoutError:
+            return cached[0], time.time() - cached[1]
+        except Exception:
+            self._revalidate(breaker, key, fetch)
+            return cached[0], time.time() - cached[1]
+
+    def _revalidate(self, breaker, key, fetch):
+        """Repeat a request in the background once the provider accepts calls again."""
+        with self._lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def run():
+            attempts = 0
+            try:
+                while attempts < MAX_REVALIDATION_ATTEMPTS:
+                    # Another request may hold the trial call; check again shortly after it
+                    time.sleep(max(breaker.retry_in(), 1.0))
+                    if not breaker.allow():
+                        continue
+                    try:
+                        self._fetch(breaker, key, fetch)
+                        return
+                    except Exception:
+                        attempts += 1
+            finally:
+                with self._lock:
+                    self._revalidating.discard(key)
+
+        # Its own thread, so waiting out an outage never holds up the executor
+        threading.Thread(target=run, name="llm-revalidate", daemon=True).start()
+
+
+def load_fallback():
+    """Build the breaker and stale-answer settings from environment variables."""
+    return StaleWhileRevalidate(
+        failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", DEFAULT_FAILURE_THRESHOLD)),
+        window=int(os.getenv("LLM_BREAKER_WINDOW", DEFAULT_WINDOW)),
+        slow_call_seconds=float(os.getenv("LLM_BREAKER_SLOW_SECONDS", DEFAULT_SLOW_CALL_SECONDS)),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", DEFAULT_RESET_TIMEOUT)),
+        stale_after=float(os.getenv("LLM_STALE_AFTER_SECONDS", DEFAULT_STALE_AFTER)),
+        cache=LastGoodCache(int(os.getenv("LLM_LAST_GOOD_ENTRIES", DEFAULT_LAST_GOOD_ENTRIES)))
+    )
@@ -0,0 +1,415 @@
+"""Parse and serialize DAGs as adjacency dicts, JSON edge lists, DOT and GML.
+
+DAGs are represented as ``{source: [targets]}`` dicts, the form used by the
+DAG editor. Parsers tokenize the input in a single linear pass and never
+evaluate it as code; serializers are generators that yield the output in
+chunks, so large graphs can be streamed to a file or a download button.
+``to_dowhy_graph`` returns a GML string that ``dowhy.CausalModel(graph=...)``
+accepts directly.
+"""
+import ast
+import html
+import json
+import re
+
+FORMATS = {
+    "json": "JSON adjacency dict",
+    "edges": "JSON edge list",
+    "dot": "Graphviz DOT",
+    "gml": "GML",
+}
+
+FILE_EXTENSIONS = {"json": "json", "edges": "json", "dot": "dot", "gml": "gml"}
+
+
+class DagFormatError(ValueError):
+    """Raised when DAG text cannot be parsed."""
+
+
+class _DagBuilder:
+    """Accumulate nodes and de-duplicated edges in insertion order."""
+
+    def __init__(self):
+        self.adjacency = {}
+        self._seen = set()
+
+    def add_node(self, node):
+        self.adjacency.setdefault(node, [])
+
+    def add_edge(self, source, target):
+        self.add_node(source)
+        self.add_node(target)
+        if (source, target) not in self._seen:
+            self._seen.add((source, target))
+            self.adjacency[source].append(target)
+
+    def dag(self, keep_isolated=True):
+        if keep_isolated:
+            return self.adjacency
+        return {source: targets for source, targets in self.adjacency.items() if targets}
+
+
+def _clean_name(value, context):
+    """Validate and strip a node name."""
+    if not isinstance(value, str):
+        raise DagFormatError(f"{context} must be a string, got {value!r}.")
+    name = value.strip()
+    if not name:
+        raise DagFormatError(f"{context} must not be empty.")
+    return name
+
+
+def dag_from_mapping(mapping):
+    """Build a DAG from a ``{source: target or [targets]}`` mapping."""
+    if not isinstance(mapping, dict):
+        raise DagFormatError("Input must be a dictionary/object.")
+    builder = _DagBuilder()
+    for source, targets in mapping.items():
+        source = _clean_name(source, f"Key '{source}'")
+        if isinstance(targets, str):
+            targets = [targets]
+        elif not isinstance(targets, (list, tuple)):
+            raise DagFormatError(f"Value for '{source}' must be a list of strings or a single string.")
+        builder.add_node(source)
+        for target in targets:
+            builder.add_edge(source, _clean_name(target, f"Target '{target}' in list for '{source}'"))
+    return builder.dag()
+
+
+def dag_from_edges(edges):
+    """Build a DAG from ``[source, target, ...]`` lists or ``{"source", "target"}`` objects."""
+    if not isinstance(edges, list):
+        raise DagFormatError("Edge list must be a JSON array.")
+    builder = _DagBuilder()
+    for i, edge in enumerate(edges, start=1):
+        if isinstance(edge, dict):
+            source, target = edge.get("source"), edge.get("target")
+        elif isinstance(edge, (list, tuple)) and len(edge) >= 2:
+            source, target = edge[0], edge[1]
+        else:
+            raise DagFormatError(f"Edge {i} must be a [source, target] pair or a {{source, target}} object.")
+        builder.add_edge(_clean_name(source, f"Source of edge {i}"), _clean_name(target, f"Target of edge {i}"))
+    return builder.dag()
+
+
+def parse_json_dag(text):
+    """Parse a JSON (or Python literal) adjacency dict or edge list."""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        try:
+            # Python-style dicts with single quotes; literal_eval never executes code
+            data = ast.literal_eval(text)
+        except (ValueError, SyntaxError, MemoryError, RecursionError) as e:
+            raise DagFormatError("Invalid input format. Please use valid JSON or Python dictionary format.") from e
+    if isinstance(data, dict):
+        return dag_from_mapping(data)
+    if isinstance(data, list):
+        return dag_from_edges(data)
+    raise DagFormatError("Input must be a dictionary/object or a list of edges.")
+
+
+_DOT_TOKEN = re.compile(r"""
+    (?P<skip>\s+|//[^\n]*|\#[^\n]*|/\*.*?\*/)
+  | (?P<quoted>"(?:[^"\\]|\\.)*")
+  | (?P<html><[^<>]*(?:<[^<>]*>[^<>]*)*>)
+  | (?P<edgeop>->|--)
+  | (?P<punct>[{}\[\];,=:])
+  | (?P<id>[A-Za-z_\x80-\uffff][\w\x80-\uffff]*|-?(?:\.\d+|\d+(?:\.\d*)?))
+""", re.VERBOSE | re.DOTALL)
+
+_DOT_KEYWORDS = {"graph", "digraph", "subgraph", "node", "edge", "strict"}
+# Escapes inside a quoted ID: \" and \\ (as written by _dot_id) and line continuations
+_DOT_ESCAPE = re.compile(r'\\(["\\]|\r?\n)')
+
+
+def _dot_tokens(text):
+    """Yield (kind, value) DOT tokens."""
+    pos = 0
+    length = len(text)
+    while pos < length:
+        match = _DOT_TOKEN.match(text, pos)
+        if not match:
+            raise DagFormatError(f"Unexpected character {text[pos]!r} in DOT input at offset {pos}.")
+        pos = match.end()
+        kind = match.lastgroup
+        if kind == "skip":
+            continue
+        value = match.group(kind)
+        if kind == "quoted":
+            # One left-to-right pass, so an escaped backslash never starts another escape
+            value = _DOT_ESCAPE.sub(lambda m: m.group(1) if m.group(1) in '"\\' else "", value[1:-1])
+            kind = "id"
+        elif kind == "html":
+            kind = "id"
+        elif kind == "id" and value.lower() in _DOT_KEYWORDS:
+            kind = "keyword"
+            value = value.lower()
+        yield kind, value
+
+
+def parse_dot(text):
+    """Parse a Graphviz DOT digraph, flattening subgraphs and ignoring attributes."""
+    builder = _DagBuilder()
+    tokens = list(_dot_tokens(text))
+    i = 0
+    n = len(tokens)
+
+    def skip_attributes(i):
+        # Skip one or more [...] attribute lists
+        while i < n and tokens[i] == ("punct", "["):
+            while i < n and tokens[i] != ("punct", "]"):
+                i += 1
+            i += 1
+        return i
+
+    def read_node_id(i):
+        # node_id : ID [ ':' ID [ ':' ID ] ] -- ports are dropped
+        name = tokens[i][1]
+        i += 1
+        while i + 1 < n and tokens[i] == ("punct", ":") and tokens[i + 1][0] == "id":
+            i += 2
+        return name, i
+
+    # Header: [strict] (graph | digraph) [ID] '{'
+    while i < n and tokens[i] != ("punct", "{"):
+        i += 1
+    if i == n:
+        raise DagFormatError("DOT input must contain a graph body in braces.")
+    i += 1
+
+    while i < n:
+        kind, value = tokens[i]
+        if (kind, value) in (("punct", "}"), ("punct", "{"), ("punct", ";"), ("punct", ",")):
+            i += 1
+        elif kind == "keyword" and value in ("graph", "node", "edge"):
+            i = skip_attributes(i + 1)
+        elif kind == "keyword" and value == "subgraph":
+            i += 1
+            if i < n and tokens[i][0] == "id":
+                i += 1
+        elif kind == "id":
+            if i + 1 < n and tokens[i + 1] == ("punct", "="):
+                # Graph attribute statement: ID '=' ID
+                i += 3
+                continue
+            chain = []
+            name, i = read_node_id(i)
+            chain.append(name)
+            while i + 1 < n and tokens[i][0] == "edgeop" and tokens[i + 1][0] == "id":
+                name, i = read_node_id(i + 1)
+                chain.append(name)
+            if i < n and tokens[i][0] == "edgeop":
+                raise DagFormatError("Edges to subgraphs are not supported in DOT input.")
+            i = skip_attributes(i)
+            if len(chain) == 1:
+                builder.add_node(chain[0])
+            for source, target in zip(chain, chain[1:]):
+                builder.add_edge(source, target)
+        else:
+            raise DagFormatError(f"Unexpected token {value!r} in DOT input.")
+    return builder.dag()
+
+
+_GML_TOKEN = re.compile(r"""
+    (?P<skip>\s+|\#[^\n]*)
+  | (?P<string>"[^"]*")
+  | (?P<open>\[)
+  | (?P<close>\])
+  | (?P<number>[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<key>[A-Za-z_][A-Za-z0-9_]*)
+""", re.VERBOSE)
+
+
+def parse_gml(text):
+    """Parse the nodes and directed edges of a GML graph."""
+    labels = {}
+    edges = []
+    # Stack of (key, attributes) for the open [...] blocks
+    stack = []
+    pending_key = None
+    pos = 0
+    length = len(text)
+    while pos < length:
+        match = _GML_TOKEN.match(text, pos)
+        if not match:
+            raise DagFormatError(f"Unexpected character {text[pos]!r} in GML input at offset {pos}.")
+        pos = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "skip":
+            continue
+        if kind == "close":
+            # Blocks may be empty, e.g. the "graphics [ ]" that yEd and Gephi export
+            if pending_key is not None:
+                raise DagFormatError(f"GML key {pending_key!r} has no value.")
+            if not stack:
+                raise DagFormatError("Unbalanced ']' in GML input.")
+            key, attributes = stack.pop()
+            if key == "node":
+                if "id" not in attributes:
+                    raise DagFormatError("GML node without an id.")
+                labels[attributes["id"]] = attributes.get("label", attributes["id"])
+            elif key == "edge":
+                if "source" not in attributes or "target" not in attributes:
+                    raise DagFormatError("GML edge without a source or target.")
+                edges.append((attributes["source"], attributes["target"]))
+            continue
+        if kind == "key" and pending_key is None:
+            pending_key = value
+            continue
+        if pending_key is None:
+            raise DagFormatError(f"Unexpected value {value!r} in GML input.")
+        if kind == "open":
+            stack.append((pending_key, {}))
+            pending_key = None
+            continue
+        if kind == "string":
+            value = html.unescape(value[1:-1])
+        if stack:
+            stack[-1][1].setdefault(pending_key, value)
+        pending_key = None
+
+    if stack:
+        raise DagFormatError("Unterminated '[' block in GML input.")
+
+    builder = _DagBuilder()
+    for node_id, label in labels.items():
+        builder.add_node(label)
+    for source, target in edges:
+        if source not in labels or target not in labels:
+            raise DagFormatError(f"GML edge refers to unknown node {source if source not in labels else target}.")
+        builder.add_edge(labels[source], labels[target])
+    return builder.dag()
+
+
+def detect_format(text):
+    """Guess the format of DAG text."""
+    head = text.lstrip()[:1000].lower()
+    if head.startswith(("{", "[")):
+        return "edges" if head.startswith("[") else "json"
+    # Leading comments and a GML "Creator" line may precede the graph keyword
+    if re.search(r"\b(di)?graph\s*(\"[^\"]*\"|[\w.]+)?\s*\{", head):
+        return "dot"
+    if re.search(r"\bgraph\s*\[", head):
+        return "gml"
+    return "json"
+
+
+def parse_dag(text, fmt="auto"):
+    """Parse DAG text in the given format (or auto-detect it) into an adjacency dict."""
+    if not text or not text.strip():
+        raise DagFormatError("Please enter a DAG structure.")
+    if fmt == "auto":
+        fmt = detect_format(text)
+    if fmt in ("json", "edges"):
+        return parse_json_dag(text)
+    if fmt == "dot":
+        return parse_dot(text)
+    if fmt == "gml":
+        return parse_gml(text)
+    raise DagFormatError(f"Unknown DAG format '{fmt}'.")
+
+
+def find_cycle(dag):
+    """Return the nodes of one directed cycle in an adjacency dict, or None if it is acyclic."""
+    # Iterative DFS with white/grey/black colouring, linear in nodes plus edges
+    state = {}
+    for root in dag:
+        if root in state:
+            continue
+        path = [root]
+        stack = [iter(dag.get(root, ()))]
+        state[root] = 1
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                state[path.pop()] = 2
+                stack.pop()
+            elif state.get(node) == 1:
+                return path[path.index(node):] + [node]
+            elif node not in state:
+                state[node] = 1
+                path.append(node)
+                stack.append(iter(dag.get(node, ())))
+    return None
+
+
+def iter_edges(dag):
+    """Yield (source, target) pairs of an adjacency dict."""
+    for source, targets in dag.items():
+        for target in targets:
+            yield source, target
+
+
+def _all_nodes(dag):
+    return list(dict.fromkeys(
+        node for source, targets in dag.items() for node in (source, *targets)
+    ))
+
+
+def _dot_id(name):
+    return '"' + str(name).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _gml_string(name):
+    # GML strings cannot contain double quotes; use the HTML entity like networkx does
+    return '"' + str(name).replace("&", "&amp;").replace('"', "&quot;") + '"'
+
+
+def iter_json(dag):
+    """Yield a JSON adjacency dict in chunks."""
+    yield "{"
+    for i, (source, targets) in enumerate(dag.items()):
+        yield ("," if i else "") + "\n  " + json.dumps(source) + ": " + json.dumps(list(targets))
+    yield "\n}\n"
+
+
+def iter_edge_list(dag):
+    """Yield a JSON edge list in chunks."""
+    yield "["
+    for i, (source, target) in enumerate(iter_edges(dag)):
+        yield ("," if i else "") + "\n  " + json.dumps([source, target])
+    yield "\n]\n"
+
+
+def iter_dot(dag, name="G"):
+    """Yield a DOT digraph in chunks."""
+    yield f"digraph {name} {{\n"
+    for node in _all_nodes(dag):
+        yield f"  {_dot_id(node)};\n"
+    for source, target in iter_edges(dag):
+        yield f"  {_dot_id(source)} -> {_dot_id(target)};\n"
+    yield "}\n"
+
+
+def iter_gml(dag):
+    """Yield a directed GML graph in chunks, with node labels as the variable names."""
+    nodes = _all_nodes(dag)
+    ids = {node: i for i, node in enumerate(nodes)}
+    yield "graph [\n  directed 1\n"
+    for node in nodes:
+        yield f"  node [\n    id {ids[node]}\n    label {_gml_string(node)}\n  ]\n"
+    for source, target in iter_edges(dag):
+        yield f"  edge [\n    source {ids[source]}\n    target {ids[target]}\n  ]\n"
+    yield "]\n"
+
+
+SERIALIZERS = {
+    "json": iter_json,
+    "edges": iter_edge_list,
+    "dot": iter_dot,
+    "gml": iter_gml,
+}
+
+
+def serialize_dag(dag, fmt):
+    """Serialize an adjacency dict in the given format."""
+    if fmt not in SERIALIZERS:
+        raise DagFormatError(f"Unknown DAG format '{fmt}'.")
+    return "".join(SERIALIZERS[fmt](dag))
+
+
+def to_dowhy_graph(dag):
+    """Return a GML graph string for ``dowhy.CausalModel(graph=...)``."""
+    return serialize_dag(dag, "gml")
@@ -0,0 +1,228 @@
+"""Read factor names and descriptions from dataset headers and data dictionaries.
+
+Wide warehouse extracts have thousands of columns, so only metadata is read:
+the header record of a CSV file (memory-mapped when given a path), the
+footer schema of a Parquet file, or a data dictionary that maps each
+column to a description. Parquet support needs the optional ``pyarrow``
+package.
+"""
+import csv
+import io
+import json
+import mmap
+import os
+
+CSV_EXTENSIONS = (".csv", ".tsv", ".txt")
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+DICTIONARY_EXTENSIONS = (".csv", ".json")
+
+# Column names recognised in data dictionary files
+NAME_COLUMNS = ("name", "variable", "column", "column_name", "field", "factor")
+DESCRIPTION_COLUMNS = ("description", "label", "definition", "desc", "meaning", "comment")
+
+# Bytes read at a time while looking for the end of the header record
+HEADER_CHUNK_SIZE = 64 * 1024
+
+
+class FactorIngestError(ValueError):
+    """Raised when factors cannot be read from a file."""
+
+
+def parse_factor_list(text):
+    """Split comma- or newline-separated factors, honouring double-quoted names that contain commas."""
+    if not text:
+        return []
+    factors = []
+    for row in csv.reader(io.StringIO(text), skipinitialspace=True):
+        factors.extend(field.strip() for field in row if field.strip())
+    return list(dict.fromkeys(factors))
+
+
+def format_factor_list(factors):
+    """Join factors into text that :func:`parse_factor_list` reads back unchanged."""
+    formatted = []
+    for factor in factors:
+        factor = str(factor).strip()
+        if any(ch in factor for ch in ',"\n'):
+            factor = '"' + factor.replace('"', '""') + '"'
+        formatted.append(factor)
+    return ", ".join(formatted)
+
+
+def _header_bytes(buffer):
+    """Return the bytes of the first CSV record, which may span lines inside quotes."""
+    end = 0
+    quotes = 0
+    size = len(buffer)
+    while end < size:
+        chunk = bytes(buffer[end:end + HEADER_CHUNK_SIZE])
+        newline = -1
+        start = 0
+        while True:
+            newline = chunk.find(b"\n", start)
+            if newline == -1:
+                quotes += chunk.count(b'"', start)
+                break
+            quotes += chunk.count(b'"', start, newline)
+            # A newline only ends the record outside a quoted field
+            if quotes % 2 == 0:
+                return bytes(buffer[:end + newline])
+            start = newline + 1
+        end += len(chunk)
+    return bytes(buffer[:size])
+
+
+def _parse_header(header, delimiter=None):
+    """Parse a header record into column names."""
+    text = header.decode("utf-8-sig", errors="replace").rstrip("\r")
+    if not text.strip():
+        raise FactorIngestError("The file has no header row.")
+    if delimiter is None:
+        try:
+            delimiter = csv.Sniffer().sniff(text[:HEADER_CHUNK_SIZE], delimiters=",;\t|").delimiter
+        except csv.Error:
+            delimiter = ","
+    row = next(csv.reader(io.StringIO(text), delimiter=delimiter, skipinitialspace=True))
+    return list(dict.fromkeys(name.strip() for name in row if name.strip()))
+
+
+def read_csv_header(source, delimiter=None):
+    """Return the column names of a CSV file without reading its rows.
+
+    ``source`` is a path, which is memory-mapped, or a binary file-like object.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise FactorIngestError("The file is empty.")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                return _parse_header(_header_bytes(mapped), delimiter)
+
+    if hasattr(source, "getbuffer"):
+        # In-memory uploads: scan the existing buffer instead of copying it
+        with source.getbuffer() as buffer:
+            return _parse_header(_header_bytes(buffer), delimiter)
+
+    header = b""
+    while True:
+        chunk = source.read(HEADER_CHUNK_SIZE)
+        header += chunk
+        record = _header_bytes(header)
+        if len(record) < len(header) or not chunk:
+            return _parse_header(record, delimiter)
+
+
+def read_parquet_schema(source):
+    """Return the column names and any field descriptions from a Parquet file's footer."""
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise FactorIngestError("Reading Parquet files requires pyarrow. Install it with: pip install pyarrow") from e
+
+    try:
+        schema = pq.read_schema(source)
+    except Exception as e:
+        raise FactorIngestError(f"Could not read the Parquet schema: {str(e)}") from e
+
+    names = []
+    descriptions = {}
+    for field in schema:
+        names.append(field.name)
+        metadata = field.metadata or {}
+        for key in (b"description", b"comment", b"doc"):
+            if metadata.get(key):
+                descriptions[field.name] = metadata[key].decode("utf-8", errors="replace")
+                break
+    return names, descriptions
+
+
+def _pick_column(columns, candidates):
+    normalized = {str(c).strip().lower(): c for c in columns}
+    for candidate in candidates:
+        if candidate in normalized:
+            return normalized[candidate]
+    return None
+
+
+def read_data_dictionary(source, fmt="csv"):
+    """Return ``{name: description}`` from a CSV or JSON data dictionary.
+
+    CSV dictionaries need a name column (``name``, ``variable``, ``column``, ...)
+    and may have a description column (``description``, ``label``, ...).
+    JSON dictionaries are either ``{name: description}`` objects or lists of
+    ``{"name": ..., "description": ...}`` records.
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            data = f.read()
+    else:
+        data = source.read()
+    text = data.decode("utf-8-sig", errors="replace") if isinstance(data, bytes) else data
+
+    if fmt == "json":
+        try:
+            records = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise FactorIngestError(f"Invalid JSON data dictionary: {str(e)}") from e
+        if isinstance(records, dict):
+            return {str(name).strip(): str(desc or "").strip() for name, desc in records.items() if str(name).strip()}
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            raise FactorIngestError("A JSON data dictionary must be an object or a list of objects.")
+        rows = records
+        columns = list(dict.fromkeys(key for record in records for key in record))
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        columns = reader.fieldnames or []
+        rows = reader
+
+    name_column = _pick_column(columns, NAME_COLUMNS)
+    if name_column is None:
+        raise FactorIngestError(
+            f"The data dictionary needs a column naming the variables (one of: {', '.join(NAME_COLUMNS)})."
+        )
+    description_column = _pick_column(columns, DESCRIPTION_COLUMNS)
+
+    dictionary = {}
+    for row in rows:
+        name = str(row.get(name_column) or "").strip()
+        if name:
+            description = row.get(description_column) if description_column else ""
+            dictionary.setdefault(name, str(description or "").strip())
+    return dictionary
+
+
+def resolve_data_path(name, data_dir):
+    """Return the real path of ``name`` inside ``data_dir``.
+
+    Relative names are taken relative to ``data_dir``. Raises
+    :class:`FactorIngestError` for paths that resolve outside it, including
+    through ``..`` or symlinks.
+    """
+    root = os.path.realpath(data_dir)
+    path = os.path.realpath(os.path.join(root, name))
+    if os.path.commonpath([root, path]) != root:
+        raise FactorIngestError("Only files in the server data directory can be read.")
+    if not os.path.isfile(path):
+        raise FactorIngestError(f"No file '{name}' in the server data directory.")
+    return path
+
+
+def ingest_factor_file(source, filename, kind="dataset"):
+    """Return ``(factors, descriptions)`` read from a dataset header or a data dictionary.
+
+    ``kind`` is ``"dataset"`` for CSV/Parquet files, whose column names become
+    the factors, or ``"dictionary"`` for a data dictionary.
+    """
+    extension = os.path.splitext(str(filename).lower())[1]
+    if kind == "dictionary":
+        if extension not in DICTIONARY_EXTENSIONS:
+            raise FactorIngestError("Data dictionaries must be .csv or .json files.")
+        dictionary = read_data_dictionary(source, "json" if extension == ".json" else "csv")
+        return list(dictionary), {name: desc for name, desc in dictionary.items() if desc}
+
+    if extension in PARQUET_EXTENSIONS:
+        return read_parquet_schema(source)
+    if extension in CSV_EXTENSIONS:
+        delimiter = "\t" if extension == ".tsv" else None
+        return read_csv_header(source, delimiter), {}
+    raise FactorIngestError(f"Unsupported file type '{extension or filename}'. Use CSV or Parquet.")
@@ -0,0 +1,245 @@
+"""Background jobs for long-running analyses, persisted in SQLite.
+
+A job is a function run on a local thread pool, outside the Streamlit
+script thread. Its status, progress and result are stored in the ``jobs``
+table of the project database (see :mod:`project_store`). A session can
+therefore close, reconnect and fetch the result later by job id, and the
+script thread is free to serve other users while the job runs.
+
+Jobs run in the process that accepted them. Each process refreshes a
+heartbeat on its active jobs. If a process stops, its unfinished jobs are
+reported as interrupted once the heartbeat is stale, because the API
+credentials a job needs are never written to the database. An owner
+submitting the same work again while an identical job of theirs is queued,
+running or done gets the existing job instead of paying for the LLM calls
+twice.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+
+from pipeline import fingerprint
+from project_store import DB_PATH_ENV, DEFAULT_DB_PATH
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+# Seconds between heartbeats, and without one before a job counts as interrupted
+HEARTBEAT_INTERVAL = 10
+STALE_AFTER = 60
+
+# Finished jobs are deleted after this many seconds
+JOB_RETENTION = 7 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    owner TEXT,
+    dedupe_key TEXT,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    params TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    worker TEXT NOT NULL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs(owner, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs(dedupe_key, status);
+"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when its cancellation was requested."""
+
+
+class JobQueue:
+    """Run functions as background jobs and keep their state in SQLite."""
+
+    def __init__(self, path=None, max_workers=4, retention=JOB_RETENTION):
+        self.path = path or os.getenv(DB_PATH_ENV) or DEFAULT_DB_PATH
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            conn.execute(
+                "DELETE FROM jobs WHERE status NOT IN (?, ?) AND finished_at < ?",
+                ACTIVE_STATUSES + (time.time() - retention,)
+            )
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True).start()
+
+    def _connect(self):
+        # One short-lived connection per operation keeps the queue safe across threads
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _heartbeat(self):
+        while not self._stopped.wait(HEARTBEAT_INTERVAL):
+            try:
+                with closing(self._connect()) as conn, conn:
+                    conn.execute(
+                        "UPDATE jobs SET heartbeat_at = ? WHERE worker = ? AND status IN (?, ?)",
+                        (time.time(), self.worker_id) + ACTIVE_STATUSES
+                    )
+            except sqlite3.Error:
+                # A busy database delays one beat; the next one catches up
+                continue
+
+    def submit(self, kind, params, func, owner=None, dedupe=True):
+        """Queue ``func(report)`` as a job and return its id.
+
+        ``params`` is a JSON-serializable description of the work. It is shown
+        with the job and, with ``kind`` and ``owner``, identifies duplicate
+        submissions.
+        ``report(progress, message)`` updates the job's progress (0 to 1)
+        and raises :class:`JobCancelled` once a cancellation was requested.
+        The function's return value must be JSON-serializable.
+        """
+        # Jobs are listed per owner, so one owner never reuses another's job
+        dedupe_key = fingerprint({"kind": kind, "owner": owner, "params": params})
+        now = time.time()
+        with self._lock:
+            if dedupe:
+                for job in self._find(dedupe_key):
+                    if job["status"] == DONE or not self._is_stale(job):
+                        return job["id"]
+            job_id = uuid.uuid4().hex[:12]
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT INTO jobs (id, kind, owner, dedupe_key, status, params, worker, created_at, heartbeat_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, owner, dedupe_key, QUEUED, json.dumps(params, default=str), self.worker_id, now, now)
+                )
+        self._executor.submit(self._run, job_id, func)
+        return job_id
+
+    def _find(self, dedupe_key):
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT * FROM jobs WHERE dedupe_key = ? AND status IN (?, ?, ?) ORDER BY created_at DESC",
+                (dedupe_key, DONE) + ACTIVE_STATUSES
+            ).fetchall()
+        return [self._to_job(row) for row in rows]
+
+    def _run(self, job_id, func):
+        with closing(self._connect()) as conn, conn:
+            claimed = conn.execute(
+                "UPDATE jobs SET status = ?, started_at = ?, heartbeat_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, time.time(), time.time(), job_id, QUEUED)
+            ).rowcount
+        if not claimed:
+            # Cancelled while queued
+            return
+
+        def report(progress, message=None):
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "UPDATE jobs SET progress = ?, message = ?, heartbeat_at = ? WHERE id = ?",
+                    (max(0.0, min(1.0, float(progress))), message, time.time(), job_id)
+                )
+                cancelled = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if cancelled and cancelled["cancel_requested"]:
+                raise JobCancelled()
+
+        try:
+            result = func(report)
+            status, values = DONE, {"result": json.dumps(result, default=str), "error": None, "progress": 1.0}
+        except JobCancelled:
+            status, values = CANCELLED, {"result": None, "error": "Cancelled.", "progress": None}
+        except Exception as e:
+            status, values = FAILED, {"result": None, "error": str(e) or type(e).__name__, "progress": None}
+
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, progress = COALESCE(?, progress), "
+                "finished_at = ? WHERE id = ?",
+                (status, values["result"], values["error"], values["progress"], time.time(), job_id)
+            )
+
+    def _is_stale(self, job):
+        return (
+            job["status"] in ACTIVE_STATUSES
+            and job["worker"] != self.worker_id
+            and time.time() - job["heartbeat_at"] > STALE_AFTER
+        )
+
+    def _to_job(self, row):
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def _mark_interrupted(self, job):
+        """Fail an active job whose process stopped sending heartbeats."""
+        error = "Interrupted: the server running this job stopped. Submit it again."
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                (FAILED, error, time.time(), job["id"]) + ACTIVE_STATUSES
+            )
+        job.update(status=FAILED, error=error)
+        return job
+
+    def get(self, job_id):
+        """Return a job's status, progress, params and result, or None."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = self._to_job(row)
+        return self._mark_interrupted(job) if self._is_stale(job) else job
+
+    def list_jobs(self, owner=None, limit=20):
+        """Return the most recent jobs, optionally only those of one owner, without their results."""
+        query = "SELECT * FROM jobs"
+        args = ()
+        if owner is not None:
+            query += " WHERE owner = ?"
+            args = (owner,)
+        with closing(self._connect()) as conn:
+            rows = conn.execute(query + " ORDER BY created_at DESC LIMIT ?", args + (limit,)).fetchall()
+        jobs = []
+        for row in rows:
+            job = self._to_job(row)
+            job.pop("result")
+            jobs.append(self._mark_interrupted(job) if self._is_stale(job) else job)
+        return jobs
+
+    def cancel(self, job_id):
+        """Cancel a queued job, or ask a running job to stop at its next progress report."""
+        with closing(self._connect()) as conn, conn:
+            cancelled = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, "Cancelled.", time.time(), job_id, QUEUED)
+            ).rowcount
+            if not cancelled:
+                conn.execute(
+                    "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?",
+                    (job_id, RUNNING)
+                )
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs and, with ``wait``, let the running ones finish."""
+        self._stopped.set()
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,88 @@
+"""Helpers for fanning LLM prompts out in batches under a concurrency limit."""
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+
+
+def chunked(items, size):
+    """Split a list into consecutive chunks of at most ``size`` items."""
+    items = list(items)
+    size = max(1, int(size))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def run_concurrently(func, items, max_concurrency=4, initializer=None):
+    """Call ``func`` on every item with at most ``max_concurrency`` calls in flight.
+
+    Returns a list of ``(item, result, error)`` tuples in input order. Exceptions
+    raised by ``func`` are captured in ``error`` instead of aborting the batch.
+    """
+    items = list(items)
+    if not items:
+        return []
+
+    def call(item):
+        try:
+            return item, func(item), None
+        except Exception as e:
+            return item, None, e
+
+    workers = max(1, min(int(max_concurrency), len(items)))
+    with ThreadPoolExecutor(max_workers=workers, initializer=initializer) as executor:
+        return list(executor.map(call, items))
+
+
+def candidate_pairs(factors):
+    """Return every unordered pair of distinct factors."""
+    unique = list(dict.fromkeys(f for f in factors if f))
+    return list(combinations(unique, 2))
+
+
+class ConfidenceMatrix:
+    """Dense matrix of directed edge confidences between factors.
+
+    ``scores[i][j]`` is the confidence that factor ``i`` directly causes factor
+    ``j``. Pairs that were never evaluated are tracked separately so that "no
+    edge" can be told apart from "not asked".
+    """
+
+    def __init__(self, factors):
+        self.factors = list(dict.fromkeys(factors))
+        self.index = {name: i for i, name in enumerate(self.factors)}
+        size = len(self.factors)
+        self.scores = [[0.0] * size for _ in range(size)]
+        self.evaluated = set()
+
+    def mark_evaluated(self, a, b):
+        """Record that the unordered pair (a, b) has been judged."""
+        if a in self.index and b in self.index:
+            self.evaluated.add(frozenset((a, b)))
+
+    def set(self, source, target, confidence):
+        """Set the confidence for source -> target, keeping the highest score seen."""
+        if source not in self.index or target not in self.index or source == target:
+            return
+        i, j = self.index[source], self.index[target]
+        confidence = max(0.0, min(1.0, float(confidence)))
+        self.scores[i][j] = max(self.scores[i][j], confidence)
+        self.mark_evaluated(source, target)
+
+    def get(self, source, target):
+        """Return the confidence for source -> target."""
+        return self.scores[self.index[source]][self.index[target]]
+
+    def edges(self, min_confidence=0.0):
+        """Return [source, target, confidence] edges above the threshold, strongest first."""
+        edges = []
+        for i, row in enumerate(self.scores):
+            for j, confidence in enumerate(row):
+                if confidence > min_confidence:
+                    edges.append([self.factors[i], self.factors[j], confidence])
+        edges.sort(key=lambda edge: edge[2], reverse=True)
+        return edges
+
+    def to_dict(self):
+        """Return the matrix as a nested {source: {target: confidence}} dict."""
+        return {
+            source: {target: self.scores[i][j] for j, target in enumerate(self.factors)}
+            for i, source in enumerate(self.factors)
+        }
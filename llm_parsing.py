@@ -0,0 +1,164 @@
+"""Parse the JSON arrays and objects that LLM responses are asked to return.
+
+Models are told to answer with bare JSON, but responses regularly arrive
+wrapped in prose or markdown fences, as Python literals with single quotes,
+``None`` and tuples, with apostrophes inside names ("Parent's income"),
+with trailing commas, or cut off by the token limit. :func:`parse_list`
+and :func:`parse_object` accept all of these:
+
+1. The fast path parses the text from the first opening bracket to the
+   last closing one with :func:`json.loads`. Well-formed responses never
+   go further.
+2. Otherwise the literal is rewritten to JSON by a single scan that
+   requotes strings, keeps apostrophes inside names, maps Python
+   constants and tuples, drops trailing commas and, if the response was
+   truncated, keeps only the elements that were complete. A response cut
+   off inside its first element is rejected rather than read as empty.
+
+Anything still unparseable raises :class:`ResponseParseError`, a
+``ValueError``, so callers can count it and ask again.
+"""
+import json
+
+_CLOSERS = {"[": "]", "{": "}", "(": ")"}
+_PYTHON_WORDS = {"None": "null", "True": "true", "False": "false"}
+# A single quote only ends a single-quoted string when one of these follows it
+_STRING_ENDS = frozenset(",]}):")
+# Later openers tried when the first bracket belongs to the surrounding prose
+MAX_ATTEMPTS = 5
+
+
+class ResponseParseError(ValueError):
+    """An LLM response did not contain the expected JSON value."""
+
+
+def _closes_single_quote(text, i):
+    """Return True if the single quote at ``text[i]`` ends its string rather than being an apostrophe."""
+    for char in text[i + 1:i + 40]:
+        if not char.isspace():
+            return char in _STRING_ENDS
+    return True
+
+
+def _to_json(text, start):
+    """Rewrite the literal opening at ``text[start]`` as JSON.
+
+    A literal that runs off the end of the text is cut back to its last
+    complete top-level element and closed. Raises :class:`ResponseParseError`
+    if it has no complete element.
+    """
+    out = []
+    stack = []
+    cut = None
+    complete = False
+    quote = None
+    i = start
+    n = len(text)
+    while i < n:
+        char = text[i]
+        if quote:
+            if char == "\\" and i + 1 < n:
+                following = text[i + 1]
+                # \' is not a JSON escape
+                out.append("'" if following == "'" else char + following)
+                i += 2
+                continue
+            if char == quote and (quote == '"' or _closes_single_quote(text, i)):
+                out.append('"')
+                quote = None
+            elif char == '"':
+                out.append('\\"')
+            else:
+                out.append(char)
+            i += 1
+            continue
+        if char in "'\"":
+            quote = char
+            out.append('"')
+        elif char in _CLOSERS:
+            stack.append(_CLOSERS[char])
+            out.append("[" if char == "(" else char)
+            if len(stack) == 1:
+                cut = len(out)
+        elif char in "]})":
+            while out and (out[-1].isspace() or out[-1] == ","):
+                out.pop()
+            out.append("]" if char == ")" else char)
+            if stack:
+                stack.pop()
+            if not stack:
+                return "".join(out)
+            if len(stack) == 1:
+                # A nested element just closed
+                cut = len(out)
+                complete = True
+        elif char == "," and len(stack) == 1:
+            cut = len(out)
+            complete = True
+            out.append(char)
+        elif char.isalpha():
+            end = i
+            while end < n and (text[end].isalnum() or text[end] == "_"):
+                end += 1
+            word = text[i:end]
+            out.append(_PYTHON_WORDS.get(word, word))
+            i = end
+            continue
+        else:
+            out.append(char)
+        i += 1
+    # Truncated: keep the complete elements and close the outer bracket
+    if not complete:
+        raise ResponseParseError("The response was cut off inside its first element")
+    closer = "]" if stack[0] == ")" else stack[0]
+    return "".join(out[:cut]) + closer
+
+
+def parse_literal(text, opener="["):
+    """Return the first JSON value starting with ``opener`` in a model response.
+
+    Raises :class:`ResponseParseError` if no such value can be recovered.
+    """
+    text = (text or "").strip()
+    closer = _CLOSERS[opener]
+    start = text.find(opener)
+    if start < 0:
+        raise ResponseParseError(f"No {opener}{closer} value found in the response")
+    end = text.rfind(closer)
+    if end > start:
+        try:
+            return json.loads(text[start:end + 1])
+        except ValueError:
+            pass
+
+    error = None
+    for _ in range(MAX_ATTEMPTS):
+        try:
+            return json.loads(_to_json(text, start), strict=False)
+        except ResponseParseError:
+            # Later openers lie inside the cut-off element
+            raise
+        except ValueError as e:
+            error = e
+        start = text.find(opener, start + 1)
+        if start < 0:
+            break
+    raise ResponseParseError(f"Could not parse the response: {error}") from error
+
+
+def parse_list(text):
+    """Return the JSON array in a model response."""
+    return parse_literal(text, "[")
+
+
+def parse_object(text):
+    """Return the JSON object in a model response."""
+    return parse_literal(text, "{")
+
+
+def parse_confidence(value, default=0.5):
+    """Return ``value`` as a confidence between 0 and 1, or ``default`` if it is not a number."""
+    try:
+        return max(0.0, min(1.0, float(value)))
+    except (ValueError, TypeError):
+        return default
@@ -0,0 +1,179 @@
+"""OpenAI-compatible LLM providers with per-provider concurrency limits and timeouts.
+
+The hosted OpenAI API is configured from ``OPENAI_API_KEY``. A local
+OpenAI-compatible server (llama.cpp, vLLM, ...) is enabled by setting
+``LOCAL_LLM_BASE_URL`` (plus optionally ``LOCAL_LLM_MODEL``,
+``LOCAL_LLM_API_KEY``, ``LOCAL_LLM_MAX_CONCURRENCY`` and ``LOCAL_LLM_TIMEOUT``).
+Further providers can be declared in ``llm_providers.json`` next to the app,
+or the path in ``CAUSAL_APP_PROVIDERS_FILE``::
+
+    {
+        "lab-gpu": {
+            "base_url": "http://10.0.0.5:8000/v1",
+            "api_key_env": "LAB_GPU_KEY",
+            "models": ["mistral-7b-instruct"],
+            "max_concurrency": 4,
+            "timeout": 120
+        }
+    }
+
+Routes refer to a provider's model as ``"provider:model"``. Model names
+without a known provider prefix are served by the ``openai`` provider.
+"""
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+from openai import OpenAI
+
+DEFAULT_PROVIDER = "openai"
+
+PROVIDERS_FILE_ENV = "CAUSAL_APP_PROVIDERS_FILE"
+DEFAULT_PROVIDERS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_providers.json")
+
+
+class ProviderBusyError(RuntimeError):
+    """Raised when a provider has no free slot within its timeout."""
+
+
+class Provider:
+    """An OpenAI-compatible endpoint with its own concurrency limit and timeout."""
+
+    def __init__(self, name, base_url=None, api_key=None, models=None, max_concurrency=8, timeout=60.0, requires_key=True):
+        self.name = name
+        self.base_url = base_url
+        self.api_key = api_key
+        self.models = list(models or [])
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.timeout = float(timeout)
+        self.requires_key = requires_key
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._client = None
+        self._client_lock = threading.Lock()
+
+    def is_configured(self):
+        """Return True if the provider has everything it needs to accept calls."""
+        if self.requires_key and not self.api_key:
+            return False
+        return self.base_url is not None or self.name == DEFAULT_PROVIDER
+
+    def client(self):
+        """Return the provider's OpenAI client, creating it on first use."""
+        with self._client_lock:
+            if self._client is None:
+                self._client = OpenAI(
+                    api_key=self.api_key or "not-needed",
+                    base_url=self.base_url,
+                    timeout=self.timeout
+                )
+            return self._client
+
+    @contextmanager
+    def slot(self):
+        """Hold one of the provider's concurrency slots for the duration of a call."""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise ProviderBusyError(
+                f"Provider '{self.name}' is busy: all {self.max_concurrency} slots stayed in use for {self.timeout:.0f}s."
+            )
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    def create_chat_completion(self, model, messages, temperature=0.7, max_tokens=None):
+        """Send a chat completion to this provider within its concurrency limit."""
+        with self.slot():
+            return self.client().chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=self.timeout
+            )
+
+
+class ProviderRegistry:
+    """Named providers, and resolution of ``"provider:model"`` route strings."""
+
+    def __init__(self, providers=()):
+        self.providers = {provider.name: provider for provider in providers}
+
+    def get(self, name):
+        """Return the provider called ``name``."""
+        if name not in self.providers:
+            raise KeyError(f"Unknown LLM provider '{name}'.")
+        return self.providers[name]
+
+    def configured(self):
+        """Return the providers that can accept calls."""
+        return [provider for provider in self.providers.values() if provider.is_configured()]
+
+    def resolve(self, route_model):
+        """Split a route string into its provider and model name."""
+        prefix, sep, model = route_model.partition(":")
+        if sep and prefix in self.providers:
+            return self.providers[prefix], model
+        return self.get(DEFAULT_PROVIDER), route_model
+
+    def is_available(self, route_model):
+        """Return True if the route's provider is configured."""
+        try:
+            provider, _ = self.resolve(route_model)
+        except KeyError:
+            return False
+        return provider.is_configured()
+
+    def route_models(self, openai_models=()):
+        """Return the route strings of every model served by a configured provider."""
+        models = []
+        for provider in self.configured():
+            if provider.name == DEFAULT_PROVIDER:
+                models.extend(openai_models)
+            models.extend(f"{provider.name}:{model}" for model in provider.models)
+        return models
+
+
+def load_providers(path=None):
+    """Build the provider registry from environment variables and the providers file."""
+    providers = [
+        Provider(
+            DEFAULT_PROVIDER,
+            api_key=os.getenv("OPENAI_API_KEY"),
+            max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "8")),
+            timeout=float(os.getenv("OPENAI_TIMEOUT", "60"))
+        )
+    ]
+
+    local_url = os.getenv("LOCAL_LLM_BASE_URL")
+    if local_url:
+        providers.append(Provider(
+            "local",
+            base_url=local_url,
+            api_key=os.getenv("LOCAL_LLM_API_KEY"),
+            models=[os.getenv("LOCAL_LLM_MODEL", "local-model")],
+            # CPU inference servers handle few requests at a time and answer slowly
+            max_concurrency=int(os.getenv("LOCAL_LLM_MAX_CONCURRENCY", "2")),
+            timeout=float(os.getenv("LOCAL_LLM_TIMEOUT", "300")),
+            requires_key=False
+        ))
+
+    path = path or os.getenv(PROVIDERS_FILE_ENV) or DEFAULT_PROVIDERS_FILE
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"Providers file '{path}' must be a JSON object.")
+        for name, spec in data.items():
+            api_key_env = spec.get("api_key_env")
+            providers.append(Provider(
+                name,
+                base_url=spec.get("base_url"),
+                api_key=os.getenv(api_key_env) if api_key_env else spec.get("api_key"),
+                models=spec.get("models"),
+                max_concurrency=spec.get("max_concurrency", 4),
+                timeout=spec.get("timeout", 120),
+                requires_key=bool(api_key_env or spec.get("api_key"))
+            ))
+
+    return ProviderRegistry(providers)
@@ -0,0 +1,205 @@
+"""Per-stage model routing with latency and cost accounting.
+
+Routes map an analysis stage to the model that should serve it. They can be
+configured in the UI or in a JSON file (``llm_routes.json`` next to the app,
+or the path in ``CAUSAL_APP_ROUTES_FILE``)::
+
+    {
+        "default": "gpt-4",
+        "routes": {"variables": "gpt-4o-mini", "validation": "gpt-4"},
+        "prices": {"my-model": [0.001, 0.002]}
+    }
+
+Prices are USD per 1K prompt and completion tokens.
+"""
+import json
+import os
+import threading
+import time
+
+# Stages that issue LLM calls, with the label shown in the routing table
+ROUTE_STAGES = {
+    "variables": "Treatment and Outcome",
+    "confounders": "Confounders",
+    "relationships": "Pair-wise Relationships",
+    "relationship_pairs": "Batched Pairwise Relationships",
+    "backdoor": "Backdoor Set",
+    "mediators": "Mediators",
+    "ivs": "Instrumental Variables",
+    "validation": "Model Validation",
+    "critique": "Edge Critiques",
+}
+
+AVAILABLE_MODELS = ["gpt-4", "gpt-4o", "gpt-4o-mini", "gpt-3.5-turbo"]
+
+DEFAULT_MODEL = "gpt-4"
+
+# Cheap, fast models for simple extraction; strong models for validation
+DEFAULT_ROUTES = {
+    "variables": "gpt-4o-mini",
+    "validation": "gpt-4",
+    "critique": "gpt-4",
+}
+
+# USD per 1K (prompt, completion) tokens
+MODEL_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+
+ROUTES_FILE_ENV = "CAUSAL_APP_ROUTES_FILE"
+DEFAULT_ROUTES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "llm_routes.json")
+
+
+def load_route_config(path=None):
+    """Load the default model, routes and prices, overlaying the config file if present."""
+    config = {
+        "default": DEFAULT_MODEL,
+        "routes": dict(DEFAULT_ROUTES),
+        "prices": dict(MODEL_PRICES),
+    }
+    path = path or os.getenv(ROUTES_FILE_ENV) or DEFAULT_ROUTES_FILE
+    if not os.path.exists(path):
+        return config
+
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError(f"Route config '{path}' must be a JSON object.")
+
+    if data.get("default"):
+        config["default"] = str(data["default"])
+    for stage, model in (data.get("routes") or {}).items():
+        config["routes"][stage] = str(model) if model else None
+    for model, price in (data.get("prices") or {}).items():
+        config["prices"][model] = (float(price[0]), float(price[1]))
+    return config
+
+
+def estimate_cost(model, prompt_tokens, completion_tokens, prices=None):
+    """Estimate the USD cost of a call, or 0.0 for models without a known price."""
+    prompt_price, completion_price = (prices or MODEL_PRICES).get(model, (0.0, 0.0))
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+
+
+class RouteStats:
+    """Thread-safe per-route call counters, latency and cost totals."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, stage, model, latency, prompt_tokens=0, completion_tokens=0, cost=0.0, error=False):
+        """Record one call made for ``stage`` on ``model``."""
+        with self._lock:
+            route = self._routes.setdefault((stage, model), {
+                "calls": 0,
+                "errors": 0,
+                "total_latency": 0.0,
+                "max_latency": 0.0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cost": 0.0,
+            })
+            route["calls"] += 1
+            route["errors"] += int(error)
+            route["total_latency"] += latency
+            route["max_latency"] = max(route["max_latency"], latency)
+            route["prompt_tokens"] += prompt_tokens
+            route["completion_tokens"] += completion_tokens
+            route["cost"] += cost
+
+    def summary(self):
+        """Return one row per route, suitable for ``st.dataframe``."""
+        with self._lock:
+            rows = []
+            for (stage, model), route in sorted(self._routes.items()):
+                rows.append({
+                    "stage": ROUTE_STAGES.get(stage, stage),
+                    "model": model,
+                    "calls": route["calls"],
+                    "errors": route["errors"],
+                    "avg latency (s)": round(route["total_latency"] / route["calls"], 2),
+                    "max latency (s)": round(route["max_latency"], 2),
+                    "tokens": route["prompt_tokens"] + route["completion_tokens"],
+                    "cost ($)": round(route["cost"], 4),
+                })
+            return rows
+
+    def reset(self):
+        """Clear all recorded calls."""
+        with self._lock:
+            self._routes.clear()
+
+
+class LLMRouter:
+    """Send chat completions to the provider and model configured for each stage.
+
+    Each call is recorded in ``stats`` and, if given, queued on the
+    :class:`usage_log.UsageLog` ``log`` under ``owner``. With a
+    :class:`circuit_breaker.StaleWhileRevalidate` ``fallback``, calls go
+    through per-provider circuit breakers, and a failing or slow provider
+    is answered with the last good response for the same request.
+    ``on_stale(stage, age)`` is then called with the answer's age in seconds.
+    """
+
+    def __init__(self, providers, routes=None, default_model=DEFAULT_MODEL, prices=None, stats=None, log=None, owner=None,
+                 fallback=None, on_stale=None):
+        self.providers = providers
+        self.routes = dict(routes or {})
+        self.default_model = default_model
+        self.prices = prices or MODEL_PRICES
+        self.stats = stats
+        self.log = log
+        self.owner = owner
+        self.fallback = fallback
+        self.on_stale = on_stale
+
+    def model_for(self, stage):
+        """Return the route string for ``stage``, falling back to the default model."""
+        return self.routes.get(stage) or self.default_model
+
+    def _record(self, stage, model, latency, prompt_tokens=0, completion_tokens=0, error=False):
+        cost = estimate_cost(model, prompt_tokens, completion_tokens, self.prices)
+        if self.stats is not None:
+            self.stats.record(stage, model, latency, prompt_tokens, completion_tokens, cost, error)
+        if self.log is not None:
+            self.log.record(stage, model, latency, prompt_tokens, completion_tokens, cost, error, owner=self.owner)
+
+    def complete(self, stage, messages, temperature=0.7, max_tokens=None):
+        """Create a chat completion for ``stage`` and record its latency and cost."""
+        route_model = self.model_for(stage)
+        provider, model = self.providers.resolve(route_model)
+
+        def fetch():
+            start = time.perf_counter()
+            try:
+                response = provider.create_chat_completion(
+                    model,
+                    messages,
+                    temperature=temperature,
+                    max_tokens=max_tokens
+                )
+            except Exception:
+                self._record(stage, route_model, time.perf_counter() - start, error=True)
+                raise
+
+            usage = getattr(response, "usage", None)
+            self._record(
+                stage,
+                route_model,
+                time.perf_counter() - start,
+                prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+                completion_tokens=getattr(usage, "completion_tokens", 0) or 0
+            )
+            return response
+
+        if self.fallback is None:
+            return fetch()
+        key = self.fallback.cache.key(route_model, messages, temperature, max_tokens)
+        response, stale_age = self.fallback.call(provider.name, key, fetch)
+        if stale_age is not None and self.on_stale is not None:
+            self.on_stale(stage, stale_age)
+        return response
@@ -0,0 +1,118 @@
+import datetime
+import time
+
+import streamlit as st
+
+from llm_routing import ROUTE_STAGES
+from usage_log import UsageReader
+
+# Time windows in seconds, with the timeline bucket size for each
+TIME_WINDOWS = {
+    "Last hour": (3600, 300),
+    "Last 24 hours": (24 * 3600, 3600),
+    "Last 7 days": (7 * 24 * 3600, 6 * 3600),
+    "Last 30 days": (30 * 24 * 3600, 24 * 3600),
+    "All time": (None, 24 * 3600),
+}
+
+st.set_page_config(
+    page_title="LLM Usage Dashboard",
+    layout="wide"
+)
+
+@st.cache_resource
+def get_usage_log():
+    """Get a reader for the usage log the analysis app writes."""
+    return UsageReader()
+
+@st.cache_data(ttl=30, show_spinner=False)
+def load_usage(since, owner, bucket):
+    """Read the stage summary, timeline and per-session totals, at most every 30 seconds per view."""
+    log = get_usage_log()
+    return (
+        log.stage_summary(since=since, owner=owner),
+        log.timeline(since=since, owner=owner, bucket=bucket),
+        log.owner_summary(since=since) if owner is None else []
+    )
+
+def format_rate(value):
+    return "—" if value is None else f"{value:.0%}"
+
+def format_seconds(value):
+    return "—" if value is None else f"{value:.2f}"
+
+st.title("📈 LLM Usage Dashboard")
+st.markdown("Calls, latency, tokens and estimated cost of the analysis app's LLM requests, per stage.")
+
+col1, col2 = st.columns(2)
+with col1:
+    window = st.selectbox("Time window", list(TIME_WINDOWS), index=1)
+with col2:
+    own_session = st.session_state.get('job_owner')
+    scopes = ["All sessions"] + (["This session"] if own_session else [])
+    scope = st.radio("Sessions", scopes, horizontal=True)
+
+seconds, bucket = TIME_WINDOWS[window]
+# Rounded to the minute so reruns within a minute share the cached read
+since = (int(time.time()) // 60 * 60 - seconds) if seconds else None
+owner = own_session if scope == "This session" else None
+summary, timeline, owners = load_usage(since, owner, bucket)
+
+if not summary:
+    st.info("No LLM calls recorded in this window yet.")
+    st.stop()
+
+calls = sum(row["calls"] for row in summary)
+cache_hits = sum(row["cache_hits"] for row in summary)
+parse_failures = sum(row["parse_failures"] for row in summary)
+answered = sum(row["calls"] - row["errors"] for row in summary)
+metrics = st.columns(5)
+metrics[0].metric("LLM calls", f"{calls:,}")
+metrics[1].metric("Estimated cost", f"${sum(row['cost'] for row in summary):,.4f}")
+metrics[2].metric("Tokens", f"{sum(row['prompt_tokens'] + row['completion_tokens'] for row in summary):,}")
+metrics[3].metric("Cache hit rate", format_rate(cache_hits / (calls + cache_hits) if calls + cache_hits else None))
+metrics[4].metric("Parse failure rate", format_rate(parse_failures / answered if answered else None))
+
+st.markdown("### Per stage")
+st.dataframe([
+    {
+        "stage": ROUTE_STAGES.get(row["stage"], row["stage"]),
+        "calls": row["calls"],
+        "errors": row["errors"],
+        "p50 latency (s)": format_seconds(row["p50"]),
+        "p95 latency (s)": format_seconds(row["p95"]),
+        "p99 latency (s)": format_seconds(row["p99"]),
+        "prompt tokens": row["prompt_tokens"],
+        "completion tokens": row["completion_tokens"],
+        "cost ($)": round(row["cost"], 4),
+        "cache hit rate": format_rate(row["cache_hit_rate"]),
+        "parse failure rate": format_rate(row["parse_failure_rate"]),
+    }
+    for row in summary
+], use_container_width=True)
+
+if timeline:
+    st.markdown("### Over time")
+    times = [datetime.datetime.fromtimestamp(point["bucket"]) for point in timeline]
+    chart_col1, chart_col2 = st.columns(2)
+    with chart_col1:
+        st.caption("LLM calls")
+        st.bar_chart({"time": times, "calls": [point["calls"] for point in timeline]}, x="time", y="calls")
+    with chart_col2:
+        st.caption("Estimated cost ($)")
+        st.line_chart({"time": times, "cost": [point["cost"] or 0.0 for point in timeline]}, x="time", y="cost")
+
+if owners:
+    st.markdown("### Per session")
+    st.dataframe([
+        {
+            "session": row["owner"] or "unknown",
+            "calls": row["calls"],
+            "tokens": row["tokens"],
+            "cost ($)": round(row["cost"] or 0.0, 4),
+            "last call": datetime.datetime.fromtimestamp(row["last_seen"]).strftime("%Y-%m-%d %H:%M"),
+        }
+        for row in owners
+    ], use_container_width=True)
+
+st.caption("Calls are written in the background every few seconds, so the newest ones can take a moment to appear.")
@@ -0,0 +1,159 @@
+"""Rank and cap the variable pairs sent to the LLM for pairwise judgements.
+
+Most pairs in a large model have no plausible causal link, but every pair
+judged by the LLM costs tokens. Before any prompt is sent, candidate pairs
+are scored cheaply: by absolute correlation when both variables have a
+column in a dataset, otherwise by how much their names and descriptions
+overlap. User-pinned :class:`PairConstraints` then remove pairs that
+cannot have an edge or whose edge is already required, and only the best
+``budget`` pairs are kept.
+"""
+import heapq
+from itertools import combinations
+
+import numpy as np
+
+from ci_tests import correlation_matrix
+from variable_index import normalize_name
+
+DEFAULT_PAIR_BUDGET = 300
+
+_EDGE_ARROWS = ("->", "→", "=>")
+
+
+class PairConstraints:
+    """Forbidden and required edges and temporal tiers pinned by the user.
+
+    ``tiers`` maps a variable to its tier number. Edges may point from an
+    earlier tier to a later one or stay within a tier, never backwards.
+    """
+
+    def __init__(self, forbidden=(), required=(), tiers=None):
+        self.forbidden = {tuple(edge) for edge in forbidden}
+        self.required = list(dict.fromkeys(tuple(edge) for edge in required))
+        self.tiers = dict(tiers or {})
+        self._required = set(self.required)
+
+    def __bool__(self):
+        return bool(self.forbidden or self.required or self.tiers)
+
+    def allows(self, source, target):
+        """Return True if the edge source -> target is not ruled out."""
+        if (source, target) in self.forbidden:
+            return False
+        source_tier, target_tier = self.tiers.get(source), self.tiers.get(target)
+        return source_tier is None or target_tier is None or source_tier <= target_tier
+
+    def settles(self, a, b):
+        """Return True if the pair needs no judgement: no direction is allowed, or an edge is required."""
+        if (a, b) in self._required or (b, a) in self._required:
+            return True
+        return not self.allows(a, b) and not self.allows(b, a)
+
+    def apply(self, edges):
+        """Drop ``[source, target, confidence]`` edges the constraints rule out and add the required ones."""
+        kept = [
+            edge for edge in edges
+            if self.allows(edge[0], edge[1]) and (edge[0], edge[1]) not in self._required
+        ]
+        return [[source, target, 1.0] for source, target in self.required] + kept
+
+
+def parse_edge_lines(text, canonicalize=str.strip):
+    """Parse one ``source -> target`` edge per line; lines without an arrow are skipped."""
+    edges = []
+    for line in (text or "").splitlines():
+        for arrow in _EDGE_ARROWS:
+            if arrow in line:
+                source, target = line.split(arrow, 1)
+                if source.strip() and target.strip():
+                    edges.append((canonicalize(source), canonicalize(target)))
+                break
+    return edges
+
+
+def parse_tiers(text, canonicalize=str.strip):
+    """Parse comma-separated variables per line, earliest tier first, into ``{variable: tier}``."""
+    tiers = {}
+    lines = [line for line in (text or "").splitlines() if line.strip()]
+    for tier, line in enumerate(lines):
+        for name in line.split(","):
+            if name.strip():
+                tiers.setdefault(canonicalize(name), tier)
+    return tiers
+
+
+def _trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def lexical_scorer(variables, descriptions=None):
+    """Return ``score(a, b)``: word and character-trigram overlap of the names and descriptions."""
+    by_key = {normalize_name(name): desc for name, desc in (descriptions or {}).items() if desc}
+    words = {}
+    grams = {}
+    for variable in variables:
+        key = normalize_name(variable)
+        words[variable] = set((key + " " + normalize_name(by_key.get(key, ""))).split())
+        grams[variable] = _trigrams(key)
+
+    def score(a, b):
+        union = len(words[a] | words[b])
+        word_overlap = len(words[a] & words[b]) / union if union else 0.0
+        gram_total = len(grams[a]) + len(grams[b])
+        gram_overlap = 2 * len(grams[a] & grams[b]) / gram_total if gram_total else 0.0
+        return (word_overlap + gram_overlap) / 2
+
+    return score
+
+
+def correlation_scorer(data, columns, variables, lookup, fallback):
+    """Return ``score(a, b)``: absolute correlation of the variables' columns, or ``fallback(a, b)``.
+
+    ``lookup`` maps a variable to its column name, or None. Only the
+    matched columns are used, with listwise deletion of incomplete rows.
+    """
+    matched = {}
+    for variable in variables:
+        column = lookup(variable)
+        if column is not None and column in columns:
+            matched[variable] = list(columns).index(column)
+    if len(matched) < 2:
+        return fallback
+    positions = sorted(set(matched.values()))
+    corr, _ = correlation_matrix(np.asarray(data)[:, positions])
+    corr = np.abs(np.nan_to_num(corr))
+    slot = {position: i for i, position in enumerate(positions)}
+
+    def score(a, b):
+        if a in matched and b in matched:
+            return float(corr[slot[matched[a]], slot[matched[b]]])
+        return fallback(a, b)
+
+    return score
+
+
+def select_pairs(variables, score, budget=DEFAULT_PAIR_BUDGET, constraints=None, keep=(), pairs=None):
+    """Return the best candidate pairs, at most ``budget`` of them, and the number settled by constraints.
+
+    ``pairs`` defaults to every unordered pair of ``variables``. Pairs in
+    ``keep`` (such as treatment and outcome) are selected first unless the
+    constraints settle them.
+    """
+    if pairs is None:
+        pairs = combinations(list(dict.fromkeys(variables)), 2)
+    constraints = constraints or PairConstraints()
+    keep = {frozenset(pair) for pair in keep}
+    kept = []
+    candidates = []
+    settled = 0
+    for a, b in pairs:
+        if constraints.settles(a, b):
+            settled += 1
+        elif frozenset((a, b)) in keep:
+            kept.append((a, b))
+        else:
+            candidates.append((a, b))
+    best = heapq.nlargest(max(0, budget - len(kept)), candidates, key=lambda pair: score(*pair))
+    return kept + best, settled
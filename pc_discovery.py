@@ -0,0 +1,324 @@
+"""PC-stable causal discovery on a correlation matrix, seeded with LLM priors.
+
+The skeleton search starts from the complete graph and removes an edge as
+soon as a conditioning set makes its endpoints independent (Fisher z-test
+on the partial correlation). As in PC-stable, adjacencies are frozen for
+each level, so the edges of a level are independent tasks. They are
+spread over a process pool in chunks.
+
+LLM relationship confidences are used in four ways:
+- Pairs the model rates below ``prune_threshold`` are dropped up front,
+  unless the data shows a strong marginal dependence.
+- Pairs rated at or above ``required_threshold`` are never removed.
+- Conditioning candidates are tried strongest-prior first, so separating
+  sets are usually found after a few tests.
+- Edges that v-structures and Meek's rules leave undirected take the
+  model's direction.
+
+Test p-values are memoized by ``(x, y, conditioning set)``. They do not
+depend on the significance level, so re-running with another alpha
+reuses them.
+"""
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, islice
+
+import numpy as np
+
+from ci_tests import correlation_matrix, fisher_z_pvalue, fisher_z_pvalues
+
+# Below this many candidate edges a level runs in-process; pool start-up would dominate
+MIN_PARALLEL_EDGES = 64
+
+# Conditioning sets evaluated together per edge; small enough that early exits waste little
+BATCH_SIZE = 64
+
+# Marginal p-value that keeps a pair the priors would prune
+PRUNE_OVERRIDE_ALPHA = 1e-4
+
+# Start method for pool workers; forkserver where the platform has it, else spawn
+START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Per-process state for pool workers, set by _init_worker
+_WORKER = {}
+
+
+def _partial_correlations(corr, x, y, conditioning_sets):
+    """Return the partial correlations of x and y given each of several equal-sized sets."""
+    sets = np.asarray(conditioning_sets, dtype=int).reshape(len(conditioning_sets), -1)
+    if sets.shape[1] == 0:
+        return np.full(len(sets), corr[x, y])
+    if sets.shape[1] == 1:
+        # Closed form for a single conditioning variable
+        z = sets[:, 0]
+        rxz, ryz = corr[x, z], corr[y, z]
+        denominator = np.sqrt(np.clip((1 - rxz ** 2) * (1 - ryz ** 2), 1e-12, None))
+        return (corr[x, y] - rxz * ryz) / denominator
+    idx = np.concatenate([np.tile([x, y], (len(sets), 1)), sets], axis=1)
+    # One stacked inversion for all the (|S|+2)-sized correlation blocks
+    blocks = corr[idx[:, :, None], idx[:, None, :]]
+    try:
+        precision = np.linalg.inv(blocks)
+    except np.linalg.LinAlgError:
+        precision = np.linalg.pinv(blocks)
+    denominator = np.sqrt(np.clip(precision[:, 0, 0] * precision[:, 1, 1], 1e-12, None))
+    return -precision[:, 0, 1] / denominator
+
+
+def _separate(corr, n, task, alpha, level):
+    """Search the conditioning sets of one edge (x < y) for a separating set.
+
+    ``task`` is ``(x, y, candidate_lists, memo)`` where ``memo`` maps this
+    edge's sorted conditioning sets to p-values. Sets are evaluated in
+    batches, in candidate order, and the first set that makes x and y
+    independent is returned. New p-values are added to ``memo``.
+    Returns ``(x, y, separating_set or None, max_p, new_memo_entries, tests, cache_hits)``.
+    """
+    x, y, candidate_lists, memo = task
+    new_entries = {}
+    tests = hits = 0
+    max_p = 0.0
+    seen = set()
+    for candidates in candidate_lists:
+        pending = combinations(candidates, level)
+        while True:
+            chunk = list(islice(pending, BATCH_SIZE))
+            if not chunk:
+                break
+            batch = []
+            for conditioning in chunk:
+                key = tuple(sorted(conditioning))
+                if key not in seen:
+                    seen.add(key)
+                    batch.append(key)
+            missing = [key for key in batch if key not in memo]
+            if missing:
+                r = _partial_correlations(corr, x, y, missing)
+                for key, p_value in zip(missing, fisher_z_pvalues(r, n, [level] * len(missing))):
+                    memo[key] = new_entries[key] = float(p_value)
+                tests += len(missing)
+            hits += len(batch) - len(missing)
+            for key in batch:
+                p_value = memo[key]
+                max_p = max(max_p, p_value)
+                if p_value >= alpha:
+                    return x, y, list(key), max_p, new_entries, tests, hits
+    return x, y, None, max_p, new_entries, tests, hits
+
+
+def _init_worker(corr, n):
+    _WORKER.update(corr=corr, n=n)
+
+
+def _separate_chunk(args):
+    tasks, alpha, level = args
+    results = []
+    for task in tasks:
+        results.append(_separate(_WORKER["corr"], _WORKER["n"], task, alpha, level))
+    return results
+
+
+class PCDiscovery:
+    """Constraint-based skeleton discovery and orientation over one dataset."""
+
+    def __init__(self, corr, n, columns):
+        self.corr = np.asarray(corr, dtype=float)
+        self.n = n
+        self.columns = list(columns)
+        # {(x, y): {sorted conditioning set: p-value}}, kept across runs
+        self.memo = {}
+
+    @classmethod
+    def from_data(cls, data, columns):
+        """Build the discovery engine from raw data rows."""
+        corr, n = correlation_matrix(data)
+        return cls(corr, n, columns)
+
+    def run(self, alpha=0.05, priors=None, required_threshold=0.9, prune_threshold=None,
+            max_level=3, max_workers=None):
+        """Discover a partially directed graph.
+
+        ``priors`` maps ``(source, target)`` column names to LLM confidences.
+        Returns a JSON-serializable dict with ``edges`` (``[source, target,
+        confidence]`` lists, like the relationship suggestions), ``undirected``
+        pairs that could not be oriented, ``separating_sets`` and test counts.
+        """
+        p = len(self.columns)
+        index = {name: i for i, name in enumerate(self.columns)}
+        # Strongest prior per unordered pair, and the direction the model gave it
+        prior_strength = {}
+        prior_direction = {}
+        for (source, target), confidence in (priors or {}).items():
+            if source not in index or target not in index or source == target:
+                continue
+            a, b = index[source], index[target]
+            key = frozenset((a, b))
+            if float(confidence) > prior_strength.get(key, -1.0):
+                prior_strength[key] = float(confidence)
+                prior_direction[key] = (a, b)
+
+        adjacency = {i: set(range(p)) - {i} for i in range(p)}
+        separating_sets = {}
+        # Pruned pairs the data does not show independent have no separating set to orient by
+        unseparated = set()
+        pruned = 0
+        if prune_threshold is not None and priors:
+            for a, b in combinations(range(p), 2):
+                key = frozenset((a, b))
+                if prior_strength.get(key, 0.0) >= prune_threshold:
+                    continue
+                p_value = fisher_z_pvalue(self.corr[a, b], self.n, 0)
+                if p_value < PRUNE_OVERRIDE_ALPHA:
+                    continue
+                adjacency[a].discard(b)
+                adjacency[b].discard(a)
+                if p_value >= alpha:
+                    separating_sets[key] = set()
+                else:
+                    unseparated.add(key)
+                pruned += 1
+
+        required = {key for key, strength in prior_strength.items() if strength >= required_threshold}
+        max_p = {}
+        tests = hits = 0
+        workers = max_workers or os.cpu_count() or 1
+
+        prior_matrix = np.zeros((p, p))
+        for key, strength in prior_strength.items():
+            a, b = tuple(key)
+            prior_matrix[a, b] = prior_matrix[b, a] = strength
+
+        def ordered(candidates, x, y):
+            candidates = np.array(sorted(candidates), dtype=int)
+            if prior_strength and len(candidates):
+                # Likely confounders (strong priors with either endpoint) first
+                scores = np.maximum(prior_matrix[candidates, x], prior_matrix[candidates, y])
+                candidates = candidates[np.argsort(-scores, kind="stable")]
+            return candidates.tolist()
+
+        executor = None
+        try:
+            for level in range(max_level + 1):
+                tasks = []
+                for x in range(p):
+                    for y in adjacency[x]:
+                        if y <= x or frozenset((x, y)) in required:
+                            continue
+                        from_x = adjacency[x] - {y}
+                        from_y = adjacency[y] - {x}
+                        if len(from_x) < level and len(from_y) < level:
+                            continue
+                        candidates = [[]] if level == 0 else [ordered(from_x, x, y), ordered(from_y, x, y)]
+                        tasks.append((x, y, candidates, self.memo.setdefault((x, y), {})))
+                if not tasks:
+                    break
+
+                if workers > 1 and len(tasks) >= MIN_PARALLEL_EDGES:
+                    if executor is None:
+                        # Never fork the multithreaded app server; a fork can inherit a held lock
+                        executor = ProcessPoolExecutor(
+                            max_workers=workers,
+                            mp_context=multiprocessing.get_context(START_METHOD),
+                            initializer=_init_worker,
+                            initargs=(self.corr, self.n)
+                        )
+                    chunk_size = max(1, math.ceil(len(tasks) / (workers * 4)))
+                    chunks = [(tasks[i:i + chunk_size], alpha, level) for i in range(0, len(tasks), chunk_size)]
+                    results = [result for chunk in executor.map(_separate_chunk, chunks) for result in chunk]
+                else:
+                    results = [_separate(self.corr, self.n, task, alpha, level) for task in tasks]
+
+                # PC-stable: remove this level's edges only after every edge was tested
+                for x, y, separating_set, edge_max_p, new_entries, edge_tests, edge_hits in results:
+                    # Worker results come from copies of the edge memo
+                    self.memo[(x, y)].update(new_entries)
+                    tests += edge_tests
+                    hits += edge_hits
+                    key = frozenset((x, y))
+                    max_p[key] = max(max_p.get(key, 0.0), edge_max_p)
+                    if separating_set is not None:
+                        adjacency[x].discard(y)
+                        adjacency[y].discard(x)
+                        separating_sets[key] = set(separating_set)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+        directed, undirected = self._orient(adjacency, separating_sets, unseparated, prior_strength, prior_direction)
+
+        def confidence(a, b):
+            key = frozenset((a, b))
+            data_confidence = 1.0 - max_p.get(key, fisher_z_pvalue(self.corr[a, b], self.n, 0))
+            if key in prior_strength:
+                return round((data_confidence + prior_strength[key]) / 2, 2)
+            return round(data_confidence, 2)
+
+        return {
+            "edges": [[self.columns[a], self.columns[b], confidence(a, b)] for a, b in sorted(directed)],
+            "undirected": [[self.columns[a], self.columns[b]] for a, b in sorted(undirected)],
+            "separating_sets": {
+                f"{self.columns[min(key)]} ⊥ {self.columns[max(key)]}": [self.columns[c] for c in sorted(conditioning)]
+                for key, conditioning in separating_sets.items()
+            },
+            "pruned_by_priors": pruned,
+            "tests": tests,
+            "cached_tests": hits,
+        }
+
+    def _orient(self, adjacency, separating_sets, unseparated, prior_strength, prior_direction):
+        """Orient v-structures and apply Meek rules 1-2, then use prior directions for the remaining edges.
+
+        Non-adjacent pairs in ``unseparated`` were removed by the priors
+        without a separating set and never form a v-structure.
+        """
+        p = len(self.columns)
+        directed = set()
+        undirected = {(a, b) for a in range(p) for b in adjacency[a] if a < b}
+
+        def orient(a, b):
+            edge = (min(a, b), max(a, b))
+            if edge in undirected and (b, a) not in directed:
+                undirected.discard(edge)
+                directed.add((a, b))
+                return True
+            return False
+
+        def adjacent(a, b):
+            return b in adjacency[a]
+
+        # V-structures: x - z - y with x, y non-adjacent and z outside their separating set
+        for z in range(p):
+            neighbours = sorted(adjacency[z])
+            for x, y in combinations(neighbours, 2):
+                if adjacent(x, y):
+                    continue
+                key = frozenset((x, y))
+                if key in unseparated or z in separating_sets.get(key, set()):
+                    continue
+                orient(x, z)
+                orient(y, z)
+
+        def propagate():
+            changed = True
+            while changed:
+                changed = False
+                for a, b in list(undirected):
+                    for x, y in ((a, b), (b, a)):
+                        # Rule 1: w -> x - y with w, y non-adjacent gives x -> y
+                        if any((w, x) in directed and not adjacent(w, y) for w in adjacency[x] if w != y):
+                            changed |= orient(x, y)
+                            break
+                        # Rule 2: x -> w -> y with x - y gives x -> y
+                        if any((x, w) in directed and (w, y) in directed for w in adjacency[x]):
+                            changed |= orient(x, y)
+                            break
+
+        propagate()
+        # Orient what the data leaves open by the LLM's direction, strongest prior first
+        for key, strength in sorted(prior_strength.items(), key=lambda item: -item[1]):
+            a, b = prior_direction[key]
+            if orient(a, b):
+                propagate()
+        return directed, undirected
@@ -0,0 +1,251 @@
+"""Dependency-graph pipeline for chaining causal analysis stages.
+
+Each stage declares the raw inputs it reads and the upstream stages it
+depends on. Outputs are memoized by a fingerprint of those inputs and of the
+upstream outputs, so re-running the pipeline only recomputes stages whose
+inputs actually changed. Independent stages run concurrently.
+"""
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+def fingerprint(value):
+    """Return a stable hash for JSON-like stage inputs and outputs."""
+    payload = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class Stage:
+    """A single named step of the pipeline."""
+
+    def __init__(self, name, func, inputs=(), depends_on=(), key_inputs=()):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.depends_on = tuple(depends_on)
+        # Inputs that invalidate the cached result without being passed to func
+        self.key_inputs = tuple(key_inputs)
+
+
+class Provisional:
+    """A stage result to use in this run without memoizing it, e.g. one built from fallback answers."""
+
+    def __init__(self, value):
+        self.value = value
+
+
+class PipelineResult:
+    """Outcome of a pipeline run."""
+
+    def __init__(self):
+        self.results = {}
+        self.recomputed = []
+        # Recomputed stages whose results were not memoized
+        self.provisional = []
+        self.reused = []
+        self.skipped = []
+        self.errors = {}
+        self.timings = {}
+
+    def status(self, name):
+        """Return a short status label for a stage."""
+        if name in self.errors:
+            return "failed"
+        if name in self.recomputed:
+            return "recomputed"
+        if name in self.reused:
+            return "reused"
+        if name in self.skipped:
+            return "skipped"
+        return "not run"
+
+    def to_dict(self):
+        """Return a JSON-serializable copy, e.g. for storing with a background job."""
+        return {
+            "results": self.results,
+            "recomputed": self.recomputed,
+            "provisional": self.provisional,
+            "reused": self.reused,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "timings": self.timings,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a result saved with :meth:`to_dict`."""
+        run = cls()
+        run.results = dict(data.get("results", {}))
+        run.recomputed = list(data.get("recomputed", []))
+        run.provisional = list(data.get("provisional", []))
+        run.reused = list(data.get("reused", []))
+        run.skipped = list(data.get("skipped", []))
+        run.errors = dict(data.get("errors", {}))
+        run.timings = dict(data.get("timings", {}))
+        return run
+
+
+class Pipeline:
+    """Run stages in dependency order with memoized, concurrent execution.
+
+    ``cache`` maps stage names to ``(key, result)`` tuples. Pass a dict that
+    outlives the pipeline (e.g. one stored in ``st.session_state``) to reuse
+    results across reruns. ``key_normalizers`` maps input names to functions
+    applied to the input before fingerprinting, so equivalent inputs share a
+    cache entry.
+    """
+
+    def __init__(self, cache=None, max_workers=4, initializer=None, key_normalizers=None):
+        self.stages = {}
+        self.cache = cache if cache is not None else {}
+        self.max_workers = max_workers
+        self.initializer = initializer
+        self.key_normalizers = dict(key_normalizers or {})
+
+    def add_stage(self, name, func, inputs=(), depends_on=(), key_inputs=()):
+        """Register a stage. Dependencies must be registered first."""
+        if name in self.stages:
+            raise ValueError(f"Stage '{name}' is already registered.")
+        for dep in depends_on:
+            if dep not in self.stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'.")
+        self.stages[name] = Stage(name, func, inputs, depends_on, key_inputs)
+        return self
+
+    def required_stages(self, targets=None):
+        """Return the targets plus all of their upstream stages, in registration order."""
+        if targets is None:
+            return list(self.stages)
+
+        needed = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name in needed:
+                continue
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage '{name}'.")
+            needed.add(name)
+            pending.extend(self.stages[name].depends_on)
+        return [name for name in self.stages if name in needed]
+
+    def _stage_key(self, stage, inputs, dep_keys):
+        """Fingerprint a stage's raw inputs together with its upstream outputs."""
+        keyed_inputs = {}
+        for key in stage.inputs + stage.key_inputs:
+            value = inputs.get(key)
+            if key in self.key_normalizers:
+                value = self.key_normalizers[key](value)
+            keyed_inputs[key] = value
+        return fingerprint({
+            "stage": stage.name,
+            "inputs": keyed_inputs,
+            "deps": {dep: dep_keys[dep] for dep in stage.depends_on},
+        })
+
+    def _call_stage(self, stage, inputs, results):
+        """Invoke a stage function with its declared inputs and upstream results."""
+        kwargs = {key: inputs.get(key) for key in stage.inputs}
+        kwargs.update({dep: results[dep] for dep in stage.depends_on})
+        start = time.perf_counter()
+        value = stage.func(**kwargs)
+        return value, time.perf_counter() - start
+
+    def run(self, inputs, targets=None, force=(), on_progress=None):
+        """Run the requested stages and return a :class:`PipelineResult`.
+
+        Stages whose fingerprint matches the cache are reused without being
+        called. Stages listed in ``force`` are always recomputed. A stage that
+        raises or returns ``None`` is reported and its dependents are skipped.
+        A stage that returns a :class:`Provisional` value passes it on to its
+        dependents, but is recomputed on the next run.
+        ``on_progress(name, status, done, total)`` is called as each stage
+        finishes. An exception it raises aborts the run after the stages
+        already running have finished.
+        """
+        order = self.required_stages(targets)
+        run = PipelineResult()
+        # Fingerprints of upstream outputs, used to key downstream stages
+        output_keys = {}
+        pending = list(order)
+        running = {}
+
+        def finished(name):
+            if on_progress is not None:
+                settled = len(run.results) + len(run.errors) + len(run.skipped)
+                on_progress(name, run.status(name), settled, len(order))
+
+        def ready(name):
+            return all(dep in output_keys for dep in self.stages[name].depends_on)
+
+        def blocked(name):
+            return any(
+                dep in run.errors or dep in run.skipped
+                for dep in self.stages[name].depends_on
+            )
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, initializer=self.initializer) as executor:
+            while pending or running:
+                for name in list(pending):
+                    stage = self.stages[name]
+                    if blocked(name):
+                        pending.remove(name)
+                        run.skipped.append(name)
+                        finished(name)
+                        continue
+                    if not ready(name):
+                        continue
+
+                    pending.remove(name)
+                    key = self._stage_key(stage, inputs, output_keys)
+                    cached = self.cache.get(name)
+                    if name not in force and cached and cached[0] == key:
+                        run.results[name] = cached[1]
+                        run.reused.append(name)
+                        run.timings[name] = 0.0
+                        output_keys[name] = fingerprint(cached[1])
+                        finished(name)
+                        continue
+
+                    future = executor.submit(self._call_stage, stage, inputs, dict(run.results))
+                    running[future] = (name, key)
+
+                if not running:
+                    # Everything left is either blocked or was resolved from cache
+                    continue
+
+                done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, key = running.pop(future)
+                    try:
+                        value, elapsed = future.result()
+                    except Exception as e:
+                        run.errors[name] = str(e)
+                        self.cache.pop(name, None)
+                        finished(name)
+                        continue
+
+                    run.timings[name] = elapsed
+                    provisional = isinstance(value, Provisional)
+                    if provisional:
+                        value = value.value
+                    if value is None:
+                        # Failed stages are not memoized so the next run retries them
+                        run.errors[name] = "Stage returned no result."
+                        self.cache.pop(name, None)
+                        finished(name)
+                        continue
+
+                    run.results[name] = value
+                    run.recomputed.append(name)
+                    output_keys[name] = fingerprint(value)
+                    if provisional:
+                        run.provisional.append(name)
+                        self.cache.pop(name, None)
+                    else:
+                        self.cache[name] = (key, value)
+                    finished(name)
+
+        return run
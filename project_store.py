@@ -0,0 +1,133 @@
+"""SQLite store for saving and reloading analysis projects.
+
+A project holds the analysis inputs, the parsed result of every stage, the
+edited DAG and timing metadata, so a saved analysis can be restored without
+repeating any LLM calls. The database lives in ``causal_projects.db`` next
+to the app, or at the path in ``CAUSAL_APP_DB``.
+"""
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+
+DB_PATH_ENV = "CAUSAL_APP_DB"
+DEFAULT_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "causal_projects.db")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    treatment TEXT,
+    outcome TEXT,
+    inputs TEXT NOT NULL,
+    dag TEXT,
+    metadata TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stage_results (
+    project_id INTEGER NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    stage TEXT NOT NULL,
+    result TEXT NOT NULL,
+    elapsed REAL,
+    PRIMARY KEY (project_id, stage)
+);
+CREATE INDEX IF NOT EXISTS idx_projects_updated ON projects(updated_at DESC);
+"""
+
+
+class ProjectStore:
+    """Save, list and reload analysis projects in a SQLite database."""
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv(DB_PATH_ENV) or DEFAULT_DB_PATH
+        with closing(self._connect()) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        # One short-lived connection per operation keeps the store safe across threads
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    def save_project(self, name, inputs, results, dag=None, timings=None, metadata=None):
+        """Create or overwrite the project called ``name`` and return its id."""
+        inputs = dict(inputs or {})
+        timings = timings or {}
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT id FROM projects WHERE name = ?", (name,)).fetchone()
+            values = (
+                inputs.get("treatment"),
+                inputs.get("outcome"),
+                json.dumps(inputs),
+                json.dumps(dag) if dag is not None else None,
+                json.dumps(metadata or {}, default=str),
+                now,
+            )
+            if row:
+                project_id = row["id"]
+                conn.execute(
+                    "UPDATE projects SET treatment = ?, outcome = ?, inputs = ?, dag = ?, metadata = ?, updated_at = ? "
+                    "WHERE id = ?",
+                    values + (project_id,)
+                )
+                conn.execute("DELETE FROM stage_results WHERE project_id = ?", (project_id,))
+            else:
+                cursor = conn.execute(
+                    "INSERT INTO projects (treatment, outcome, inputs, dag, metadata, updated_at, name, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    values + (name, now)
+                )
+                project_id = cursor.lastrowid
+
+            conn.executemany(
+                "INSERT INTO stage_results (project_id, stage, result, elapsed) VALUES (?, ?, ?, ?)",
+                [
+                    (project_id, stage, json.dumps(result), timings.get(stage))
+                    for stage, result in (results or {}).items()
+                    if result is not None
+                ]
+            )
+        return project_id
+
+    def list_projects(self, limit=50):
+        """Return summaries of the most recently updated projects."""
+        with closing(self._connect()) as conn:
+            rows = conn.execute(
+                "SELECT p.id, p.name, p.treatment, p.outcome, p.updated_at, COUNT(r.stage) AS stages "
+                "FROM projects p LEFT JOIN stage_results r ON r.project_id = p.id "
+                "GROUP BY p.id ORDER BY p.updated_at DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def load_project(self, project_id):
+        """Return a saved project's inputs, stage results, DAG, timings and metadata, or None."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM projects WHERE id = ?", (project_id,)).fetchone()
+            if row is None:
+                return None
+            stage_rows = conn.execute(
+                "SELECT stage, result, elapsed FROM stage_results WHERE project_id = ?",
+                (project_id,)
+            ).fetchall()
+
+        return {
+            "id": row["id"],
+            "name": row["name"],
+            "inputs": json.loads(row["inputs"]),
+            "dag": json.loads(row["dag"]) if row["dag"] else None,
+            "metadata": json.loads(row["metadata"]) if row["metadata"] else {},
+            "results": {r["stage"]: json.loads(r["result"]) for r in stage_rows},
+            "timings": {r["stage"]: r["elapsed"] for r in stage_rows if r["elapsed"] is not None},
+            "updated_at": row["updated_at"],
+        }
+
+    def delete_project(self, project_id):
+        """Delete a project and its stage results."""
+        with closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM projects WHERE id = ?", (project_id,))
@@ -0,0 +1,295 @@
+"""Build result panels as single HTML blocks.
+
+Each builder turns one parsed LLM result into one HTML string with a
+collapsible ``<details>`` element per item, so the app paints a panel with
+one ``st.markdown`` call instead of one message per heading and item.
+Every value from the model is escaped. The ``result-*`` and
+``confidence-*`` classes are styled in the app's CSS.
+"""
+from html import escape
+
+
+def confidence_level(score):
+    """Return "high", "medium" or "low" for a 0-1 score."""
+    if score > 0.7:
+        return "high"
+    if score > 0.4:
+        return "medium"
+    return "low"
+
+
+def _score(value, default=0.5):
+    try:
+        return max(0.0, min(1.0, float(value)))
+    except (TypeError, ValueError):
+        return default
+
+
+def _confidence(level, label="Confidence Level", strength=None, strength_label="Relationship Strength"):
+    line = f"{label}: {level.title()}"
+    if strength is not None:
+        line += f"<br>{strength_label}: {strength:.2f}"
+    return f'<div class="confidence-{level}">{line}</div>'
+
+
+def _item(summary, body, open=False):
+    return f'<details class="result-item"{" open" if open else ""}><summary>{summary}</summary>{body}</details>'
+
+
+def _guide(title, sections, open=False):
+    """Render a static explanation: ``sections`` is a list of ``(heading, intro, [points], ordered)``."""
+    body = []
+    for heading, intro, points, ordered in sections:
+        tag = "ol" if ordered else "ul"
+        if heading:
+            body.append(f"<h4>{heading}</h4>")
+        if intro:
+            body.append(f"<p>{intro}</p>")
+        body.append(f"<{tag}>" + "".join(f"<li>{point}</li>" for point in points) + f"</{tag}>")
+    return _item(title, "".join(body), open)
+
+
+def _panel(title, items, *guides, note=None):
+    parts = ['<div class="result-panel">']
+    if title:
+        parts.append(f"<h2>{title}</h2>")
+    parts.extend(items)
+    if note:
+        parts.append(f'<p class="result-note">{note}</p>')
+    parts.extend(guides)
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def _display_name(name):
+    return str(name).replace("_", " ").strip().title()
+
+
+def relationships_html(relationships):
+    """Render ``[source, target, confidence]`` relationships."""
+    items = []
+    for rel in relationships:
+        if not isinstance(rel, (list, tuple)) or len(rel) < 2:
+            continue
+        source = escape(str(rel[0]).strip())
+        target = escape(str(rel[1]).strip())
+        score = _score(rel[2]) if len(rel) > 2 else 0.5
+        level = confidence_level(score)
+        if level == "high":
+            analysis = f"Strong evidence suggests that changes in {source} directly affect {target}."
+            recommendation = "Consider this relationship as a primary focus for your causal analysis."
+        elif level == "medium":
+            analysis = f"There appears to be a moderate relationship between {source} and {target}, possibly involving other factors."
+            recommendation = "Further investigation may be needed to strengthen evidence for this relationship."
+        else:
+            analysis = f"The relationship between {source} and {target} requires further investigation to establish causality."
+            recommendation = "Additional data or expert validation recommended before including in analysis."
+        items.append(_item(
+            f"🔍 {source} → {target}",
+            _confidence(level, strength=score)
+            + f"<p><b>Analysis:</b> {analysis}</p><p><b>Recommendation:</b> {recommendation}</p>"
+        ))
+    return _panel(
+        "Detailed Relationship Analysis",
+        items,
+        _guide("🔍 Understanding These Relationships", [
+            ("Interpreting the Diagram", None, [
+                "<b>Nodes:</b> Represent variables in your causal model",
+                "<b>Arrows:</b> Show the direction of causal influence",
+                "<b>Numbers:</b> Indicate the strength of relationships (0-1)",
+            ], True),
+            ("Confidence Levels", None, [
+                "<b>High (&gt;0.7):</b> Strong evidence of direct causal effect",
+                "<b>Medium (0.4-0.7):</b> Moderate evidence, possible indirect effects",
+                "<b>Low (&lt;0.4):</b> Weak evidence, needs further investigation",
+            ], False),
+        ]),
+        _guide("📊 Next Steps", [(None, None, [
+            "Focus on high-confidence relationships for primary analysis",
+            "Consider indirect effects through medium-confidence paths",
+            "Validate relationships with domain experts",
+            "Look for potential mediating variables",
+        ], True)]),
+    )
+
+
+def confounders_html(confounders):
+    """Render confounders given as ``{name: level}``, names or ``[source, target, score]`` lists."""
+    items = []
+    if isinstance(confounders, dict):
+        for name, level in confounders.items():
+            level = str(level).lower()
+            level = level if level in ("high", "medium", "low") else "medium"
+            name = escape(_display_name(name))
+            items.append(_item(
+                name,
+                _confidence(level) + f"<p>💡 {name} shows a {level} likelihood of being a confounder.</p>",
+                open=True
+            ))
+    for item in confounders if isinstance(confounders, (list, tuple)) else []:
+        if isinstance(item, (list, tuple)):
+            if len(item) < 2:
+                continue
+            source = escape(_display_name(item[0]))
+            target = escape(_display_name(item[1]))
+            score = _score(item[2], None) if len(item) > 2 else None
+            if score:
+                level = confidence_level(score)
+                body = (
+                    _confidence(level, strength=score)
+                    + f"<p>💡 {source} shows a {level} likelihood of being a confounder.</p>"
+                )
+            else:
+                body = f"<p>💡 {source} may act as a confounder through its relationship with {target}.</p>"
+            items.append(_item(f"{source} → {target}", body, open=True))
+        else:
+            name = escape(_display_name(item))
+            items.append(_item(name, "<p>💡 This variable may confound the relationship between treatment and outcome.</p>", open=True))
+    return _panel(
+        "Identified Confounding Variables",
+        items,
+        _guide("🔍 Understanding Confounding Variables", [(None, None, [
+            "Confounders can create spurious associations between variables",
+            "They affect both the treatment and outcome variables",
+            "Controlling for confounders is crucial for accurate causal inference",
+        ], True)], open=True),
+        _guide("📊 Recommendations", [(None, None, [
+            "Include these variables in your data collection plan",
+            "Use appropriate statistical methods to control for their effects",
+            "Consider stratification or matching based on these variables",
+            "Document any unmeasured confounders that might affect your analysis",
+        ], True)], open=True),
+    )
+
+
+def backdoor_html(backdoor_set):
+    """Render a backdoor set given as variable dicts, ``[source, target]`` lists or names."""
+    items = []
+    for var in backdoor_set if isinstance(backdoor_set, (list, tuple)) else []:
+        if isinstance(var, dict):
+            name = escape(str(var.get("name", "")))
+            if name:
+                level = str(var.get("confidence", "medium")).lower()
+                level = level if level in ("high", "medium", "low") else "medium"
+                items.append(_item(name, _confidence(level), open=True))
+        elif isinstance(var, (list, tuple)):
+            if len(var) >= 2:
+                items.append(_item(
+                    f"{escape(str(var[0]))} → {escape(str(var[1]))}",
+                    "<p>This relationship is part of the backdoor adjustment set.</p>",
+                    open=True
+                ))
+        else:
+            items.append(_item(escape(str(var)), "<p>This variable should be included in the backdoor adjustment set.</p>", open=True))
+    return _panel(
+        None,
+        items,
+        _guide("🔍 Understanding Backdoor Adjustment", [
+            ("What is Backdoor Adjustment?", "Backdoor adjustment helps control for confounding variables in causal analysis by:", [
+                "Identifying variables that affect both treatment and outcome",
+                "Blocking \"backdoor paths\" that create spurious associations",
+                "Enabling unbiased estimation of causal effects",
+            ], True),
+            ("How to Use These Variables", None, [
+                "Include these variables in your analysis model",
+                "Collect data on these variables during your study",
+                "Consider stratification or matching based on these variables",
+                "Document any unmeasured confounders",
+            ], False),
+        ], open=True),
+        _guide("📊 Recommendations", [(None, None, [
+            "Prioritize collecting data on high-confidence backdoor variables",
+            "Use appropriate statistical methods to control for these variables",
+            "Consider both direct and indirect paths in your analysis",
+            "Validate the completeness of the backdoor set with domain experts",
+        ], True)], open=True),
+    )
+
+
+def mediators_html(mediators):
+    """Render ``[mediator, explanation, confidence]`` mediators."""
+    items = []
+    for med in mediators:
+        if not isinstance(med, (list, tuple)) or len(med) < 2:
+            continue
+        score = _score(med[2]) if len(med) > 2 else 0.5
+        items.append(_item(
+            f"🔄 {escape(str(med[0]).strip())} (Mediator)",
+            _confidence(confidence_level(score), strength=score, strength_label="Mediation Strength")
+            + f"<p><b>Role:</b> {escape(str(med[1]).strip())}</p>"
+            + "<p><b>Mediation Path:</b></p><ol><li>Treatment → Mediator</li><li>Mediator → Outcome</li></ol>",
+            open=True
+        ))
+    return _panel(
+        None,
+        items,
+        _guide("🔍 Understanding Mediation", [
+            ("What are Mediator Variables?", "Mediator variables help explain <i>how</i> or <i>why</i> the treatment affects the outcome:", [
+                "They are affected by the treatment",
+                "They in turn affect the outcome",
+                "They represent the mechanism of the causal effect",
+            ], True),
+            ("How to Use Mediators", None, [
+                "Include them in path analysis",
+                "Test for indirect effects",
+                "Consider them in intervention design",
+                "Use them to understand causal mechanisms",
+            ], False),
+        ], open=True),
+    )
+
+
+def ivs_html(ivs):
+    """Render ``[instrument, justification, validity]`` IVs and return ``(html, valid_count)``."""
+    items = []
+    skipped = 0
+    for iv in ivs:
+        if not isinstance(iv, (list, tuple)) or len(iv) < 2 or not str(iv[0]).strip():
+            skipped += 1
+            continue
+        validity = _score(iv[2]) if len(iv) > 2 else 0.5
+        items.append(_item(
+            f"🎯 {escape(str(iv[0]).strip())} (Instrumental Variable)",
+            _confidence(confidence_level(validity), "Validity Level", validity, "Instrument Strength")
+            + f"<p><b>Justification:</b> {escape(str(iv[1]).strip())}</p>"
+            + "<p><b>IV Assumptions:</b></p><ol><li>✓ Affects treatment</li>"
+            + "<li>✓ No direct effect on outcome</li><li>✓ Independent of confounders</li></ol>",
+            open=True
+        ))
+    html = _panel(
+        None,
+        items,
+        _guide("🔍 Understanding Instrumental Variables", [
+            ("What are Instrumental Variables?", "IVs help estimate causal effects when there are unmeasured confounders:", [
+                "They influence the treatment",
+                "They only affect the outcome through the treatment",
+                "They are independent of confounders",
+            ], True),
+            ("How to Use IVs", None, [
+                "Use them in IV regression",
+                "Test instrument strength",
+                "Validate exclusion restriction",
+                "Consider multiple instruments if available",
+            ], False),
+        ], open=True),
+        note=f"Skipped {skipped} entries that could not be read." if skipped else None,
+    )
+    return html, len(items)
+
+
+VERDICT_ICONS = {"remove": "❌", "reverse": "🔄", "review": "⚠️", "keep": "✅"}
+
+
+def edge_critiques_html(critiques):
+    """Render edge critique rows (``source``, ``target``, ``verdict``, ``confidence``, ``explanation``)."""
+    items = []
+    for critique in critiques:
+        verdict = str(critique.get("verdict", "review"))
+        summary = (
+            f"{VERDICT_ICONS.get(verdict, '•')} {escape(str(critique['source']))} → {escape(str(critique['target']))}"
+            f" · {escape(verdict.title())} ({_score(critique.get('confidence')):.2f})"
+        )
+        explanation = critique.get("explanation")
+        body = f"<p>{escape(str(explanation))}</p>" if explanation else "<p><i>No explanation given.</i></p>"
+        items.append(_item(summary, body))
+    return _panel(None, items)
@@ -0,0 +1,66 @@
+"""Filter, sort and page long result lists without materializing every row.
+
+Result panels show one page of rows at a time. :func:`filter_rows` scans
+the rows once, and :func:`select_page` keeps only the rows up to the end
+of the requested page in a bounded heap instead of sorting them all. Only
+the page's rows are turned into HTML or widgets, so page weight does not
+depend on the number of results.
+"""
+import heapq
+import math
+
+PAGE_SIZES = (10, 25, 50, 100)
+
+
+def relationship_rows(relationships):
+    """Return ``{source, target, confidence}`` rows for ``[source, target, confidence]`` relationships."""
+    rows = []
+    for rel in relationships or []:
+        if isinstance(rel, (list, tuple)) and len(rel) >= 2:
+            try:
+                confidence = float(rel[2]) if len(rel) > 2 else 0.5
+            except (TypeError, ValueError):
+                confidence = 0.5
+            rows.append({"source": str(rel[0]).strip(), "target": str(rel[1]).strip(), "confidence": confidence})
+    return rows
+
+
+def _sort_key(column):
+    def key(row):
+        value = row.get(column)
+        if isinstance(value, str):
+            return (0, value.casefold())
+        return (1, value if value is not None else -math.inf)
+    return key
+
+
+def filter_rows(rows, query="", search_columns=("source", "target"), min_confidence=None, where=None):
+    """Return the rows matching every filter.
+
+    ``query`` is a case-insensitive substring matched against ``search_columns``.
+    ``where`` is an optional extra predicate on a row.
+    """
+    needle = (query or "").strip().casefold()
+
+    def keep(row):
+        if min_confidence is not None and row.get("confidence", 0.0) < min_confidence:
+            return False
+        if needle and not any(needle in str(row.get(column, "")).casefold() for column in search_columns):
+            return False
+        return where is None or where(row)
+
+    return [row for row in rows if keep(row)]
+
+
+def page_count(rows, page_size):
+    return max(1, math.ceil(len(rows) / max(1, int(page_size))))
+
+
+def select_page(rows, sort_by="confidence", descending=True, page=1, page_size=25):
+    """Return one page of ``rows`` in sorted order. Pages are numbered from 1 and clamped to the last page."""
+    page_size = max(1, int(page_size))
+    page = min(max(1, int(page)), page_count(rows, page_size))
+    end = page * page_size
+    # Only the rows up to the end of the page are ordered
+    select = heapq.nlargest if descending else heapq.nsmallest
+    return select(end, rows, key=_sort_key(sort_by))[end - page_size:end]
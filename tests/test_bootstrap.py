@@ -0,0 +1,34 @@
+import numpy as np
+
+from bootstrap import edge_stability
+
+
+def test_edges_whose_test_needs_an_unmeasured_node_are_skipped():
+    # A -> L -> B -> C and A -> B with L unmeasured: A -> B must be tested given L, so it is skipped
+    rng = np.random.default_rng(0)
+    n = 500
+    a = rng.normal(size=n)
+    latent = a + rng.normal(size=n)
+    b = latent + a + rng.normal(size=n)
+    c = b + rng.normal(size=n)
+    dag = {"A": ["L", "B"], "L": ["B"], "B": ["C"], "C": []}
+
+    scores = edge_stability(np.column_stack([a, b, c]), ["A", "B", "C"], dag, n_resamples=20, max_workers=1)
+
+    assert list(scores) == [("B", "C")]
+    assert scores[("B", "C")] == 1.0
+
+
+def test_worker_pool_matches_single_process():
+    rng = np.random.default_rng(1)
+    n = 300
+    x = rng.normal(size=n)
+    y = 0.2 * x + rng.normal(size=n)
+    z = 0.2 * y + rng.normal(size=n)
+    data = np.column_stack([x, y, z])
+    dag = {"X": ["Y"], "Y": ["Z"]}
+
+    serial = edge_stability(data, ["X", "Y", "Z"], dag, n_resamples=16, max_workers=1, chunk_rows=64)
+    pooled = edge_stability(data, ["X", "Y", "Z"], dag, n_resamples=16, max_workers=2, chunk_rows=64)
+
+    assert pooled == serial
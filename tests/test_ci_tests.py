@@ -0,0 +1,37 @@
+import numpy as np
+
+from ci_tests import test_dag_against_data as run_dag_tests
+
+
+def test_unmeasured_mediator_does_not_report_false_violations():
+    # A -> L -> B -> C with L unmeasured: A and B, A and C are dependent in the data
+    rng = np.random.default_rng(0)
+    n = 3000
+    a = rng.normal(size=n)
+    latent = a + rng.normal(size=n)
+    b = latent + rng.normal(size=n)
+    c = b + rng.normal(size=n)
+    dag = {"A": ["L"], "L": ["B"], "B": ["C"], "C": []}
+
+    result = run_dag_tests(dag, ["A", "B", "C"], np.column_stack([a, b, c]))
+
+    assert result["unmatched"] == ["L"]
+    assert result["violated"] == []
+    # Only A _||_ C | B avoids the latent node
+    assert result["independence_tests"] == 1
+    assert result["satisfied"] == 1
+
+
+def test_unrelated_sparse_column_does_not_drop_rows():
+    rng = np.random.default_rng(1)
+    n = 200
+    a = rng.normal(size=n)
+    b = a + rng.normal(size=n)
+    junk = np.full(n, np.nan)
+    junk[:3] = 1.0
+
+    result = run_dag_tests({"a": ["b"], "b": []}, ["a", "junk", "b"], np.column_stack([a, junk, b]))
+
+    assert result["n"] == n
+    assert result["edge_tests"] == 1
+    assert result["unsupported_edges"] == []
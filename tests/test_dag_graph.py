@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from dag_graph import CompactDAG, ReachabilityIndex
+
+
+def _closure(graph):
+    """Reachability by depth-first search from every node."""
+    reach = {}
+    for node in graph.nodes:
+        seen, stack = set(), list(graph.successors(node))
+        while stack:
+            current = stack.pop()
+            if current not in seen:
+                seen.add(current)
+                stack.extend(graph.successors(current))
+        reach[node] = seen
+    return reach
+
+
+def _assert_matches(index, graph):
+    reach = _closure(graph)
+    for node in graph.nodes:
+        assert set(index.descendants_of(node)) == reach[node]
+        assert set(index.ancestors_of(node)) == {other for other in graph.nodes if node in reach[other]}
+    assert index.has_cycle() == any(node in reach[node] for node in graph.nodes)
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("acyclic", [True, False])
+def test_reachability_matches_closure_under_random_edits(seed, acyclic):
+    rng = random.Random(seed)
+    nodes = [f"n{i}" for i in range(12)]
+    graph = CompactDAG(nodes)
+    index = ReachabilityIndex(graph)
+    for _ in range(200):
+        source, target = rng.sample(nodes, 2)
+        if acyclic and nodes.index(source) > nodes.index(target):
+            source, target = target, source
+        if graph.has_edge(source, target) and rng.random() < 0.6:
+            graph.remove_edge(source, target)
+            index.remove_edge(source, target)
+        else:
+            graph.add_edge(source, target)
+            index.add_edge(source, target)
+        _assert_matches(index, graph)
+
+
+def test_sync_applies_edge_differences():
+    rng = random.Random(0)
+    nodes = [f"n{i}" for i in range(10)]
+    index = ReachabilityIndex(CompactDAG(nodes))
+    for _ in range(20):
+        graph = CompactDAG(nodes)
+        for _ in range(15):
+            source, target = sorted(rng.sample(nodes, 2), key=nodes.index)
+            graph.add_edge(source, target)
+        index.sync(graph)
+        _assert_matches(index, graph)
+    assert index.between("n0", "n9") == [
+        node for node in nodes if index.is_ancestor("n0", node) and index.is_ancestor(node, "n9")
+    ]
@@ -0,0 +1,16 @@
+import pytest
+
+from dag_io import FORMATS, parse_dag, serialize_dag
+
+# Every node has an edge, so the edge list format keeps them all
+DAG = {
+    "a\\b": ["y", "say \"hi\""],
+    "say \"hi\"": ["x\\\"z"],
+    "x\\\"z": ["y"],
+    "y": [],
+}
+
+
+@pytest.mark.parametrize("fmt", list(FORMATS))
+def test_round_trip_keeps_names_with_quotes_and_backslashes(fmt):
+    assert parse_dag(serialize_dag(DAG, fmt), fmt) == DAG
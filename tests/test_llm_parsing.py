@@ -0,0 +1,39 @@
+import json
+import os
+
+import pytest
+
+from llm_parsing import ResponseParseError, parse_list, parse_object
+
+FIXTURES = os.path.join(os.path.dirname(__file__), os.pardir, "tools", "parser_fixtures.json")
+
+# Stages whose prompts ask for a JSON object; the rest ask for an array
+OBJECT_KINDS = {"confounders", "validation"}
+
+with open(FIXTURES, encoding="utf-8") as f:
+    fixtures = json.load(f)
+
+
+@pytest.mark.parametrize("fixture", fixtures, ids=[f"{i}-{f['kind']}" for i, f in enumerate(fixtures)])
+def test_fixture_parses_to_expected_value(fixture):
+    parse = parse_object if fixture["kind"] in OBJECT_KINDS else parse_list
+    assert parse(fixture["text"]) == fixture["expected"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('[["a", "b", 0.9]', [["a", "b", 0.9]]),
+    ('[["a", "b", 0.9], ["c", "d"', [["a", "b", 0.9]]),
+    ('[["a", "b", 0.9],', [["a", "b", 0.9]]),
+    ('[1, 2, 3', [1, 2]),
+    ('{"a": ["x"], "b": ["y"', {"a": ["x"]}),
+])
+def test_truncated_response_keeps_complete_elements(text, expected):
+    parse = parse_object if text.startswith("{") else parse_list
+    assert parse(text) == expected
+
+
+@pytest.mark.parametrize("text", ['[["a", "b", 0.', '[1', '{"a": ["x"'])
+def test_truncated_first_element_raises(text):
+    parse = parse_object if text.startswith("{") else parse_list
+    with pytest.raises(ResponseParseError):
+        parse(text)
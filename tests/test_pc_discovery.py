@@ -0,0 +1,54 @@
+import numpy as np
+
+from pc_discovery import MIN_PARALLEL_EDGES, PCDiscovery
+
+
+def test_recovers_collider_and_chain():
+    # X -> Z <- Y, Z -> W: the collider orients X -> Z and Y -> Z, Meek's rule 1 then gives Z -> W
+    rng = np.random.default_rng(0)
+    n = 5000
+    x = rng.normal(size=n)
+    y = rng.normal(size=n)
+    z = x + y + rng.normal(size=n)
+    w = z + rng.normal(size=n)
+    pc = PCDiscovery.from_data(np.column_stack([x, y, z, w]), ["X", "Y", "Z", "W"])
+
+    result = pc.run(alpha=0.01, max_workers=1)
+
+    assert sorted((source, target) for source, target, _ in result["edges"]) == [("X", "Z"), ("Y", "Z"), ("Z", "W")]
+    assert result["undirected"] == []
+    assert result["separating_sets"]["X ⊥ Y"] == []
+
+
+def test_chain_is_left_undirected():
+    # A -> B -> C is Markov equivalent to its reversal and to the fork, so no edge can be oriented
+    rng = np.random.default_rng(1)
+    n = 5000
+    a = rng.normal(size=n)
+    b = a + rng.normal(size=n)
+    c = b + rng.normal(size=n)
+    pc = PCDiscovery.from_data(np.column_stack([a, b, c]), ["A", "B", "C"])
+
+    result = pc.run(alpha=0.01, max_workers=1)
+
+    assert result["edges"] == []
+    assert sorted(map(tuple, result["undirected"])) == [("A", "B"), ("B", "C")]
+    assert result["separating_sets"]["A ⊥ C"] == ["B"]
+
+
+def test_worker_pool_matches_single_process():
+    rng = np.random.default_rng(2)
+    n = 2000
+    p = 14
+    assert p * (p - 1) // 2 >= MIN_PARALLEL_EDGES
+    data = rng.normal(size=(n, p))
+    data[:, 2] += data[:, 0] + data[:, 1]
+    data[:, 3] += data[:, 2]
+    columns = [f"V{i}" for i in range(p)]
+
+    serial = PCDiscovery.from_data(data, columns).run(alpha=0.01, max_workers=1)
+    pooled = PCDiscovery.from_data(data, columns).run(alpha=0.01, max_workers=2)
+
+    assert pooled["edges"] == serial["edges"]
+    assert pooled["undirected"] == serial["undirected"]
+    assert pooled["separating_sets"] == serial["separating_sets"]
@@ -0,0 +1,351 @@
+"""Load test causal_app.py with concurrent simulated sessions.
+
+Each simulated analyst is a ``streamlit.testing`` AppTest session that runs
+a click script (the step-by-step analysis or the full pipeline) against
+one in-process copy of the app, the way sessions share one server
+replica. LLM calls go to a stub OpenAI-compatible server started by this
+tool, which answers after a configurable delay, so results measure the
+app and not a model provider.
+
+Concurrency is ramped through the given levels. For each level the tool
+reports throughput, rerun latency percentiles and errors. The saturation
+point is the first level where throughput grows by less than 10% or p95
+latency exceeds ``--max-p95``. A separate pass measures traced Python
+memory per live session. Example::
+
+    python tools/load_test.py --levels 1,2,4,8 --sessions 2 --llm-latency 0.3
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import re
+import resource
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "causal_app.py")
+
+# A throughput gain below this between levels counts as saturation
+SATURATION_GAIN = 0.10
+
+FACTOR_SETS = [
+    ("smoking", "lung cancer", ["age", "air pollution", "genetics", "occupation", "diet", "exercise"]),
+    ("education", "income", ["parental income", "iq", "region", "age", "gender", "school quality"]),
+    ("exercise", "heart disease", ["age", "diet", "smoking", "stress", "sleep quality", "bmi"]),
+    ("fertilizer", "crop yield", ["rainfall", "soil quality", "temperature", "pests", "irrigation"]),
+]
+
+
+def _field(prompt, *labels):
+    for label in labels:
+        match = re.search(rf"{label}: (.+)", prompt)
+        if match:
+            return match.group(1).strip()
+    return None
+
+
+def stub_answer(prompt):
+    """Return a plausible, well-formed answer for each kind of prompt the app sends."""
+    treatment = _field(prompt, "Treatment variable", "Treatment") or "treatment"
+    outcome = _field(prompt, "Outcome variable", "Outcome") or "outcome"
+    factors = [f.strip() for f in (_field(prompt, "All factors", "Other factors", "Factors") or "").split(",") if f.strip()]
+    other = next((f for f in factors if f not in (treatment, outcome)), "age")
+    numbered = len(re.findall(r"^\d+\. ", prompt, re.M))
+
+    if "treatment variable (the cause" in prompt:
+        return f"treatment: {factors[0] if factors else treatment}\noutcome: {factors[-1] if factors else outcome}"
+    if "critique each of these numbered edges" in prompt:
+        return json.dumps([[i, random.choice(["keep", "reverse", "remove"]), 0.7, "stub"] for i in range(1, numbered + 1)])
+    if "For each numbered pair" in prompt:
+        return json.dumps([[i, random.choice(["forward", "backward", "none"]), 0.6] for i in range(1, numbered + 1)])
+    if "Assign each numbered variable" in prompt:
+        return json.dumps([[i, "General"] for i in range(1, numbered + 1)])
+    if "confounding variables" in prompt:
+        return json.dumps({other: "high"})
+    if "backdoor adjustment set" in prompt:
+        return json.dumps([[other, "affects both treatment and outcome"]])
+    if "mediator variables" in prompt:
+        return json.dumps([[other, "carries part of the effect", 0.7]])
+    if "instrumental variables" in prompt:
+        return json.dumps([[other, "shifts the treatment only", 0.6]])
+    if "comprehensive validation" in prompt:
+        return json.dumps({"critiques": {"missing_relationships": [other]}, "latent_confounders": [], "negative_controls": []})
+    return json.dumps([[treatment, outcome, 0.8], [other, outcome, 0.6], [other, treatment, 0.5]])
+
+
+class StubLLMServer:
+    """OpenAI-compatible chat completions endpoint that answers after ``latency`` seconds (+/- 50%)."""
+
+    def __init__(self, latency=0.2, port=0):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                prompt = (body.get("messages") or [{}])[-1].get("content", "")
+                with server._lock:
+                    server.calls += 1
+                time.sleep(server.latency * random.uniform(0.5, 1.5))
+                content = stub_answer(prompt)
+                payload = json.dumps({
+                    "id": "stub",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "stub"),
+                    "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                              "total_tokens": (len(prompt) + len(content)) // 4},
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    def start(self):
+        threading.Thread(target=self._httpd.serve_forever, name="stub-llm", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+
+
+def _click(at, label):
+    next(button for button in at.button if label in button.label).click().run()
+
+
+def _choose_step(step):
+    def run(at, session):
+        next(box for box in at.selectbox if "Analysis Step" in box.label).set_value(step).run()
+    return run
+
+
+def _next_page(at, session):
+    pagers = [box for box in at.number_input if box.key == "step_relationships_page"]
+    if pagers:
+        pagers[0].set_value(2).run()
+
+
+def _enter_variables(at, session):
+    at.text_area(key="factors_area").set_value(", ".join([session["treatment"], session["outcome"]] + session["factors"])).run()
+    at.text_input(key="treatment_field").set_value(session["treatment"]).run()
+    at.text_input(key="outcome_field").set_value(session["outcome"]).run()
+
+
+# Click scripts: (step name, action) in the order an analyst works
+SCRIPTS = {
+    "steps": [
+        ("open", lambda at, session: at.run()),
+        ("enter variables", _enter_variables),
+        ("confounders", lambda at, session: _click(at, "Suggest Potential Confounders")),
+        ("relationships", lambda at, session: _click(at, "Suggest Pair-wise Relationships")),
+        ("page results", _next_page),
+        ("identification step", _choose_step("Identification Suggestion")),
+        ("backdoor", lambda at, session: _click(at, "Suggest Backdoor Set")),
+        ("mediators", lambda at, session: _click(at, "Suggest Mediator Set")),
+        ("ivs", lambda at, session: _click(at, "Suggest Instrumental Variables")),
+        ("validation step", _choose_step("Validation Suggestion")),
+        ("validate", lambda at, session: _click(at, "Validate Model")),
+    ],
+    "pipeline": [
+        ("open", lambda at, session: at.run()),
+        ("enter variables", _enter_variables),
+        ("pipeline step", _choose_step("Full Analysis Pipeline")),
+        ("run pipeline", lambda at, session: _click(at, "Run Pipeline")),
+    ],
+}
+
+
+_parse_lock = threading.Lock()
+
+
+def _serialize_script_parsing():
+    """Let one session at a time parse the app script.
+
+    Every AppTest session parses the script itself, and CPython 3.11's
+    parser can fail when several threads parse at once.
+    """
+    from streamlit.runtime.scriptrunner import magic, script_cache
+
+    add_magic = magic.add_magic
+
+    def locked_add_magic(code, script_path):
+        with _parse_lock:
+            return add_magic(code, script_path)
+
+    script_cache.magic.add_magic = locked_add_magic
+
+
+def run_session(script, timeout, keep=None):
+    """Run one simulated session; return ``[(step, seconds, error)]``. Reruns inside a step count once."""
+    from streamlit.testing.v1 import AppTest
+
+    treatment, outcome, factors = random.choice(FACTOR_SETS)
+    session = {"treatment": treatment, "outcome": outcome, "factors": random.sample(factors, len(factors))}
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    timings = []
+    for step, action in SCRIPTS[script]:
+        start = time.perf_counter()
+        error = None
+        try:
+            action(at, session)
+            if at.exception:
+                error = at.exception[0].value
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        timings.append((step, time.perf_counter() - start, error))
+        if error and step == "open":
+            break
+    if keep is not None:
+        keep.append(at)
+    return timings
+
+
+def run_level(concurrency, sessions_per_worker, script, timeout):
+    """Run ``concurrency`` workers, each running sessions back to back, and summarize the reruns."""
+    results = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(sessions_per_worker):
+            timings = run_session(script, timeout)
+            with lock:
+                results.append(timings)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=worker, name=f"session-{i}") for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = np.array([seconds for timings in results for _, seconds, _ in timings])
+    errors = [f"{step}: {error}" for timings in results for step, _, error in timings if error]
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (0.0, 0.0, 0.0)
+    return {
+        "concurrency": concurrency,
+        "sessions": len(results),
+        "steps": int(len(latencies)),
+        "seconds": round(elapsed, 2),
+        "steps_per_second": round(len(latencies) / elapsed, 2),
+        "sessions_per_minute": round(60 * len(results) / elapsed, 2),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+    }
+
+
+def measure_memory(sessions, script, timeout):
+    """Return traced Python memory per live session, in MB, with ``sessions`` sessions kept open."""
+    # One warm-up session loads modules and process-wide caches outside the measurement
+    run_session(script, timeout)
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    live = []
+    for _ in range(sessions):
+        run_session(script, timeout, keep=live)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "sessions": sessions,
+        "mb_per_session": round((current - baseline) / sessions / 2**20, 2),
+        "peak_mb": round((peak - baseline) / 2**20, 2),
+    }
+
+
+def find_saturation(levels, max_p95):
+    """Return the first level whose throughput gain is under SATURATION_GAIN or whose p95 exceeds ``max_p95``."""
+    for previous, level in zip([None] + levels[:-1], levels):
+        if max_p95 and level["p95"] > max_p95:
+            return level["concurrency"]
+        if previous and level["steps_per_second"] < previous["steps_per_second"] * (1 + SATURATION_GAIN):
+            return level["concurrency"]
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test causal_app.py with concurrent simulated sessions.")
+    parser.add_argument("--levels", default="1,2,4,8", help="Comma-separated concurrent session counts to ramp through.")
+    parser.add_argument("--sessions", type=int, default=2, help="Sessions each concurrent worker runs per level.")
+    parser.add_argument("--script", choices=sorted(SCRIPTS), default="steps", help="Click script every session runs.")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Mean stub LLM response time in seconds.")
+    parser.add_argument("--max-p95", type=float, default=None, help="Rerun p95 in seconds above which a level is saturated.")
+    parser.add_argument("--memory-sessions", type=int, default=5, help="Live sessions for the memory pass; 0 skips it.")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds a single rerun may take.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this JSON file.")
+    args = parser.parse_args(argv)
+    random.seed(args.seed)
+
+    stub = StubLLMServer(args.llm_latency).start()
+    workdir = tempfile.mkdtemp(prefix="causal-load-")
+    # Every session talks to the stub and writes to a throwaway database
+    os.environ.update({
+        "OPENAI_API_KEY": "stub-key",
+        "OPENAI_BASE_URL": stub.url,
+        "CAUSAL_APP_DB": os.path.join(workdir, "load_test.db"),
+    })
+    os.environ.pop("LOCAL_LLM_BASE_URL", None)
+    _serialize_script_parsing()
+
+    report = {"script": args.script, "llm_latency": args.llm_latency, "levels": []}
+    print(f"Stub LLM at {stub.url}; script '{args.script}', {args.sessions} session(s) per worker")
+    print(f"{'sessions':>8} {'steps/s':>8} {'sess/min':>9} {'p50 s':>7} {'p95 s':>7} {'p99 s':>7} {'errors':>6}")
+    for concurrency in [int(level) for level in args.levels.split(",") if level.strip()]:
+        level = run_level(concurrency, args.sessions, args.script, args.timeout)
+        report["levels"].append(level)
+        print(
+            f"{concurrency:>8} {level['steps_per_second']:>8} {level['sessions_per_minute']:>9} "
+            f"{level['p50']:>7} {level['p95']:>7} {level['p99']:>7} {level['errors']:>6}"
+        )
+        if level["first_error"]:
+            print(f"         first error: {level['first_error'][:200]}")
+
+    report["saturation"] = find_saturation(report["levels"], args.max_p95)
+    if report["saturation"]:
+        print(f"Saturated at {report['saturation']} concurrent sessions.")
+    else:
+        print("No saturation within the tested levels.")
+
+    if args.memory_sessions > 0:
+        report["memory"] = measure_memory(args.memory_sessions, args.script, args.timeout)
+        print(
+            f"Memory: {report['memory']['mb_per_session']} MB traced per live session "
+            f"({report['memory']['sessions']} sessions, peak {report['memory']['peak_mb']} MB)"
+        )
+    report["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    report["llm_calls"] = stub.calls
+    print(f"Process max RSS {report['max_rss_mb']} MB; {stub.calls} stub LLM calls.")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    stub.stop()
+    return report
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,288 @@
+"""Benchmark the LLM response parsers for throughput and robustness.
+
+Every response the app parses is run through two parsers: the shared
+parser in ``llm_parsing`` and the per-stage cleanup chains the suggest
+functions used before it (kept below as ``legacy_*`` for comparison). The
+corpus is ``parser_fixtures.json`` (responses in the shapes the app's
+prompts ask for, with the value each should parse to) plus fuzzed variants
+of every fixture: pretty-printed, fenced, wrapped in prose, followed by a
+bracketed note, Python literals, unescaped apostrophes in names, trailing
+commas and responses cut off by the token limit, including inside their
+first element.
+
+For each stage and parser the tool reports parses per second and the
+success rate (the parsed value equals the expected one, or the parser
+raises for a response with no complete element to recover), then the success
+rate per variant and the re-queries a failed parse would have cost per
+1,000 responses. Example::
+
+    python tools/parser_benchmark.py --truncations 5 --repeat 200
+"""
+import argparse
+import ast
+import json
+import os
+import random
+import re
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from llm_parsing import parse_list, parse_object  # noqa: E402
+
+FIXTURES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parser_fixtures.json")
+# Expected value of a response the parser must reject
+RAISES = None
+
+
+def _literal(suggestion):
+    try:
+        return json.loads(suggestion)
+    except json.JSONDecodeError:
+        return ast.literal_eval(suggestion)
+
+
+def legacy_relationships(suggestion):
+    suggestion = suggestion.strip().replace("'", '"').replace("None", "null")
+    match = re.search(r'\[([\s\S]*)\]', suggestion)
+    return _literal(f"[{match.group(1)}]" if match else suggestion)
+
+
+def legacy_backdoor(suggestion):
+    suggestion = suggestion.strip().replace("'", '"')
+    match = re.search(r'\[([\s\S]*)\]', suggestion)
+    return _literal(f"[{match.group(1)}]" if match else suggestion)
+
+
+def legacy_numbered(suggestion):
+    # Pair judgements and edge critiques
+    suggestion = suggestion.strip()
+    match = re.search(r'\[[\s\S]*\]', suggestion)
+    return _literal(match.group(0) if match else suggestion)
+
+
+def legacy_confounders(suggestion):
+    suggestion = suggestion.strip()
+    match = re.search(r'\{[\s\S]*\}', suggestion)
+    return _literal(match.group(0) if match else suggestion)
+
+
+def legacy_mediators(suggestion):
+    suggestion = suggestion.strip().replace("'", '"').replace("\n", " ").replace("\t", " ")
+    match = re.search(r'\[[\s\S]*\]', suggestion)
+    if not match:
+        raise ValueError("Could not find a valid array in the response.")
+    return _literal(match.group(0))
+
+
+def legacy_ivs(suggestion):
+    suggestion = suggestion.strip().replace("'", '"').replace("\n", " ").replace("\t", " ")
+    match = re.search(r'\[(.*)\]', suggestion)
+    if not match:
+        raise ValueError("Could not find a valid array in the response.")
+    return _literal(f"[{match.group(1)}]")
+
+
+def legacy_validation(suggestion):
+    return json.loads(suggestion.strip())
+
+
+def legacy_domains(suggestion):
+    suggestion = suggestion.strip()
+    match = re.search(r'\[[\s\S]*\]', suggestion)
+    return json.loads(match.group(0) if match else suggestion)
+
+
+# Stage -> {parser name: parse function}
+PARSERS = {
+    "relationships": {"legacy": legacy_relationships, "shared": parse_list},
+    "pair_judgements": {"legacy": legacy_numbered, "shared": parse_list},
+    "edge_critiques": {"legacy": legacy_numbered, "shared": parse_list},
+    "confounders": {"legacy": legacy_confounders, "shared": parse_object},
+    "backdoor": {"legacy": legacy_backdoor, "shared": parse_list},
+    "mediators": {"legacy": legacy_mediators, "shared": parse_list},
+    "ivs": {"legacy": legacy_ivs, "shared": parse_list},
+    "validation": {"legacy": legacy_validation, "shared": parse_object},
+    "domains": {"legacy": legacy_domains, "shared": parse_list},
+}
+
+
+def _quoted(value, escape):
+    """Render a value as a Python-style literal with single-quoted strings."""
+    if isinstance(value, str):
+        return "'" + (value.replace("'", "\\'") if escape else value) + "'"
+    if isinstance(value, list):
+        return "[" + ", ".join(_quoted(item, escape) for item in value) + "]"
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{_quoted(k, escape)}: {_quoted(v, escape)}" for k, v in value.items()) + "}"
+    return repr(value)
+
+
+def _with_apostrophe(value):
+    """Return a copy of ``value`` with a possessive added to its first string."""
+    value = json.loads(json.dumps(value))
+    if isinstance(value, dict):
+        key = next(iter(value))
+        return {(f"{key}'s" if k == key else k): v for k, v in value.items()}
+    for item in value:
+        container = item if isinstance(item, list) else value
+        for i, entry in enumerate(container):
+            if isinstance(entry, str):
+                words = entry.split(" ", 1)
+                container[i] = " ".join([words[0] + "'s"] + words[1:])
+                return value
+    return value
+
+
+def _truncated(value, rng):
+    """Cut the JSON text of ``value`` inside its last element; only the earlier elements survive."""
+    items = list(value.items()) if isinstance(value, dict) else list(value)
+    if not items:
+        return None
+    kept = dict(items[:-1]) if isinstance(value, dict) else items[:-1]
+    full = json.dumps(value)
+    prefix = len(json.dumps(kept)) - 1
+    cut = rng.randint(prefix + 2, len(full) - 2)
+    # With a single element nothing complete survives
+    return full[:cut], kept or RAISES
+
+
+def _truncated_first(value, rng):
+    """Cut the JSON text of ``value`` inside its first element, which leaves nothing to recover."""
+    items = list(value.items()) if isinstance(value, dict) else list(value)
+    first = json.dumps(dict(items[:1]) if isinstance(value, dict) else items[:1])
+    if len(first) < 4:
+        return None
+    # ``first`` ends with the element and the closing bracket; stop before the element's last character
+    cut = rng.randint(2, len(first) - 2)
+    return json.dumps(value)[:cut], RAISES
+
+
+def fuzz(fixture, rng, truncations):
+    """Yield ``(variant, text, expected)`` for a fixture and its fuzzed variants."""
+    expected = fixture["expected"]
+    compact = json.dumps(expected)
+    yield "fixture", fixture["text"], expected
+    yield "pretty", json.dumps(expected, indent=4), expected
+    yield "fenced", f"```json\n{compact}\n```", expected
+    yield "prose", f"Sure! Here is the result:\n{compact}\n\nLet me know if you need anything else.", expected
+    yield "bracket note", f"{compact}\n\nNote: confidence scores are in [0, 1].", expected
+    yield "python literal", _quoted(expected, escape=True), expected
+    named = _with_apostrophe(expected)
+    yield "apostrophe", _quoted(named, escape=False), named
+    yield "trailing comma", compact[:-1] + ",\n" + compact[-1], expected
+    for _ in range(truncations):
+        cut = _truncated(expected, rng)
+        if cut:
+            yield "truncated", cut[0], cut[1]
+        cut = _truncated_first(expected, rng)
+        if cut:
+            yield "truncated first", cut[0], cut[1]
+
+
+def _canonical(value):
+    return json.dumps(value, sort_keys=True)
+
+
+def build_corpus(fixtures, seed=0, truncations=3):
+    rng = random.Random(seed)
+    corpus = []
+    for fixture in fixtures:
+        for variant, text, expected in fuzz(fixture, rng, truncations):
+            corpus.append({
+                "kind": fixture["kind"], "variant": variant, "text": text,
+                "expected": RAISES if expected is RAISES else _canonical(expected),
+            })
+    return corpus
+
+
+def run_parser(parse, samples, repeat):
+    """Return (successes, parses per second, outcome per sample) for one parser over samples.
+
+    A sample expected to be rejected succeeds when the parser raises.
+    """
+    outcomes = []
+    for sample in samples:
+        try:
+            value = parse(sample["text"])
+        except Exception:
+            outcomes.append(sample["expected"] is RAISES)
+            continue
+        outcomes.append(sample["expected"] is not RAISES and _canonical(value) == sample["expected"])
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for sample in samples:
+            try:
+                parse(sample["text"])
+            except Exception:
+                pass
+    elapsed = time.perf_counter() - start
+    rate = len(samples) * repeat / elapsed if elapsed > 0 else float("inf")
+    return sum(outcomes), rate, outcomes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the LLM response parsers over a fuzzed fixture corpus.")
+    parser.add_argument("--fixtures", default=FIXTURES_PATH, help="JSON list of {kind, text, expected} responses.")
+    parser.add_argument("--truncations", type=int, default=3, help="Truncated variants generated per fixture.")
+    parser.add_argument("--repeat", type=int, default=100, help="Timed passes over the corpus per parser.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", help="Also write the report to this JSON file.")
+    args = parser.parse_args(argv)
+
+    with open(args.fixtures, encoding="utf-8") as f:
+        fixtures = json.load(f)
+    unknown = sorted({fixture["kind"] for fixture in fixtures} - set(PARSERS))
+    if unknown:
+        parser.error(f"No parser for fixture kind(s): {', '.join(unknown)}")
+    corpus = build_corpus(fixtures, args.seed, args.truncations)
+
+    report = {"responses": len(corpus), "stages": [], "variants": {}}
+    variant_totals = {}
+    totals = {}
+    print(f"{len(corpus)} responses from {len(fixtures)} fixtures")
+    print(f"{'stage':<16} {'parser':<7} {'responses':>9} {'ok %':>6} {'parses/s':>10}")
+    for kind, parsers in PARSERS.items():
+        samples = [sample for sample in corpus if sample["kind"] == kind]
+        if not samples:
+            continue
+        for name, parse in parsers.items():
+            ok, rate, outcomes = run_parser(parse, samples, args.repeat)
+            report["stages"].append({
+                "stage": kind, "parser": name, "responses": len(samples),
+                "success_rate": round(ok / len(samples), 4), "parses_per_second": round(rate),
+            })
+            print(f"{kind:<16} {name:<7} {len(samples):>9} {ok / len(samples):>6.0%} {rate:>10,.0f}")
+            totals[name] = totals.get(name, 0) + ok
+            for sample, outcome in zip(samples, outcomes):
+                counts = variant_totals.setdefault(sample["variant"], {}).setdefault(name, [0, 0])
+                counts[0] += outcome
+                counts[1] += 1
+
+    names = list(totals)
+    print()
+    print(f"{'variant':<16} " + " ".join(f"{name:>7}" for name in names))
+    for variant, counts in variant_totals.items():
+        rates = {name: counts[name][0] / counts[name][1] for name in names}
+        report["variants"][variant] = {name: round(rate, 4) for name, rate in rates.items()}
+        print(f"{variant:<16} " + " ".join(f"{rates[name]:>7.0%}" for name in names))
+
+    report["success_rate"] = {name: round(totals[name] / len(corpus), 4) for name in names}
+    report["requeries_per_1000"] = {name: round(1000 * (1 - totals[name] / len(corpus)), 1) for name in names}
+    print()
+    for name in names:
+        print(
+            f"{name}: {report['success_rate'][name]:.1%} parsed, "
+            f"{report['requeries_per_1000'][name]} re-queries per 1,000 responses"
+        )
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,202 @@
+"""Per-call LLM usage log for the cost and latency dashboard.
+
+Every LLM call, pipeline cache hit and unparseable response is recorded as
+one row of the ``llm_calls`` table in the project database (see
+:mod:`project_store`). :meth:`UsageLog.record` only puts the event on an
+in-memory queue. A background thread writes queued events in batches, so
+logging adds no database round trip to the calling page. The dashboard
+reads the same table through a :class:`UsageReader`, which never writes,
+to aggregate calls, latency percentiles, tokens, cost, cache hits and
+parse failures per stage, time window and session.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+
+import numpy as np
+
+from project_store import DB_PATH_ENV, DEFAULT_DB_PATH
+
+CALL = "call"
+CACHE_HIT = "cache_hit"
+PARSE_FAILURE = "parse_failure"
+
+# Seconds between batched writes, and rows older than this are deleted
+FLUSH_INTERVAL = 2.0
+USAGE_RETENTION = 90 * 24 * 3600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_calls (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    owner TEXT,
+    event TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    model TEXT,
+    latency REAL,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    cost REAL NOT NULL DEFAULT 0,
+    error INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_llm_calls_ts ON llm_calls(ts);
+CREATE INDEX IF NOT EXISTS idx_llm_calls_owner ON llm_calls(owner, ts);
+"""
+
+_COLUMNS = ("ts", "owner", "event", "stage", "model", "latency", "prompt_tokens", "completion_tokens", "cost", "error")
+
+
+class UsageReader:
+    """Aggregate the recorded LLM usage for reporting, without writing to the database."""
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv(DB_PATH_ENV) or DEFAULT_DB_PATH
+
+    def _connect(self):
+        # One short-lived connection per operation keeps the log safe across threads
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _fetch(self, query, args):
+        """Return the rows of a read query, or none before anything was recorded."""
+        if not os.path.exists(self.path):
+            return []
+        with closing(self._connect()) as conn:
+            recorded = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'llm_calls'"
+            ).fetchone()
+            return conn.execute(query, args).fetchall() if recorded else []
+
+    def _where(self, since=None, until=None, owner=None):
+        clauses, args = [], []
+        if since is not None:
+            clauses.append("ts >= ?")
+            args.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            args.append(until)
+        if owner is not None:
+            clauses.append("owner = ?")
+            args.append(owner)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def stage_summary(self, since=None, until=None, owner=None):
+        """Return one dict per stage with call counts, latency percentiles, tokens, cost and rates."""
+        where, args = self._where(since, until, owner)
+        # Anything but a cache hit or parse failure is a call
+        is_call = "event NOT IN (?, ?)"
+        events = [CACHE_HIT, PARSE_FAILURE]
+        rows = self._fetch(
+            f"SELECT stage, SUM({is_call}) AS calls, SUM(CASE WHEN {is_call} THEN error ELSE 0 END) AS errors, "
+            f"SUM(event = ?) AS cache_hits, SUM(event = ?) AS parse_failures, "
+            f"SUM(CASE WHEN {is_call} THEN prompt_tokens ELSE 0 END) AS prompt_tokens, "
+            f"SUM(CASE WHEN {is_call} THEN completion_tokens ELSE 0 END) AS completion_tokens, "
+            f"TOTAL(CASE WHEN {is_call} THEN cost ELSE 0 END) AS cost "
+            f"FROM llm_calls{where} GROUP BY stage ORDER BY stage",
+            events * 2 + [CACHE_HIT, PARSE_FAILURE] + events * 3 + args
+        )
+        # Percentiles need the latencies themselves; only that column is read
+        call_filter = (" AND " if where else " WHERE ") + f"{is_call} AND latency IS NOT NULL"
+        latencies = {}
+        for stage, latency in self._fetch(f"SELECT stage, latency FROM llm_calls{where}{call_filter}", args + events):
+            latencies.setdefault(stage, []).append(latency)
+
+        summary = []
+        for row in rows:
+            stage = dict(row)
+            stage_latencies = latencies.get(stage["stage"])
+            p50, p95, p99 = np.percentile(stage_latencies, [50, 95, 99]) if stage_latencies else (None, None, None)
+            requests = stage["calls"] + stage["cache_hits"]
+            answered = stage["calls"] - stage["errors"]
+            summary.append({
+                **stage,
+                "p50": p50,
+                "p95": p95,
+                "p99": p99,
+                "cache_hit_rate": stage["cache_hits"] / requests if requests else None,
+                "parse_failure_rate": stage["parse_failures"] / answered if answered else None,
+            })
+        return summary
+
+    def timeline(self, since=None, until=None, owner=None, bucket=3600):
+        """Return calls, tokens and cost per ``bucket`` seconds, oldest first."""
+        where, args = self._where(since, until, owner)
+        event_filter = (" AND " if where else " WHERE ") + "event = ?"
+        rows = self._fetch(
+            f"SELECT CAST(ts / ? AS INTEGER) * ? AS bucket, COUNT(*) AS calls, "
+            f"SUM(prompt_tokens + completion_tokens) AS tokens, SUM(cost) AS cost "
+            f"FROM llm_calls{where}{event_filter} GROUP BY bucket ORDER BY bucket",
+            [bucket, bucket] + args + [CALL]
+        )
+        return [dict(row) for row in rows]
+
+    def owner_summary(self, since=None, until=None, limit=50):
+        """Return calls, tokens and cost per session owner, most expensive first."""
+        where, args = self._where(since, until)
+        event_filter = (" AND " if where else " WHERE ") + "event = ?"
+        rows = self._fetch(
+            f"SELECT owner, COUNT(*) AS calls, SUM(prompt_tokens + completion_tokens) AS tokens, "
+            f"SUM(cost) AS cost, MAX(ts) AS last_seen FROM llm_calls{where}{event_filter} "
+            f"GROUP BY owner ORDER BY cost DESC, calls DESC LIMIT ?",
+            args + [CALL, limit]
+        )
+        return [dict(row) for row in rows]
+
+
+class UsageLog(UsageReader):
+    """Record LLM usage events in the background and aggregate them for reporting."""
+
+    def __init__(self, path=None, flush_interval=FLUSH_INTERVAL, retention=USAGE_RETENTION):
+        super().__init__(path)
+        self.flush_interval = flush_interval
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            conn.execute("DELETE FROM llm_calls WHERE ts < ?", (time.time() - retention,))
+        self._queue = queue.SimpleQueue()
+        self._stopped = threading.Event()
+        self._writer = threading.Thread(target=self._write_loop, name="usage-log", daemon=True)
+        self._writer.start()
+
+    def record(self, stage, model=None, latency=None, prompt_tokens=0, completion_tokens=0, cost=0.0,
+               error=False, owner=None, event=CALL):
+        """Queue one usage event; it is written within ``flush_interval`` seconds."""
+        self._queue.put((
+            time.time(), owner, event, stage, model, latency,
+            int(prompt_tokens or 0), int(completion_tokens or 0), float(cost or 0.0), int(bool(error))
+        ))
+
+    def _write_loop(self):
+        while not self._stopped.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def flush(self):
+        """Write all queued events now."""
+        rows = []
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        if not rows:
+            return
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.executemany(
+                    f"INSERT INTO llm_calls ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                    rows
+                )
+        except sqlite3.Error:
+            # A busy database delays this batch to the next flush
+            for row in rows:
+                self._queue.put(row)
+
+    def close(self):
+        """Stop the writer after a last flush."""
+        self._stopped.set()
+        self._writer.join()
@@ -0,0 +1,95 @@
+"""Map variable names returned by the LLM back to the user's input factors.
+
+Model output spells the same variable in many ways ("parental_income",
+"Parental Income", "parental income level"). A :class:`VariableIndex` is
+built once per factor list and resolves such spellings to the factor the
+user typed, using normalized keys, an alias table and a fuzzy fallback.
+"""
+import difflib
+import re
+from functools import lru_cache
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_name(name):
+    """Return a case-, punctuation- and whitespace-insensitive key for a variable name."""
+    return _NON_ALNUM.sub(" ", str(name).lower()).strip()
+
+
+class VariableIndex:
+    """Canonicalization index over a list of factors."""
+
+    def __init__(self, factors, aliases=None, cutoff=0.85):
+        self.factors = list(dict.fromkeys(str(f).strip() for f in factors if str(f).strip()))
+        self.cutoff = cutoff
+        self._keys = {}
+        self._compact = {}
+        self._tokens = {}
+        self._lookups = {}
+        for factor in self.factors:
+            self._register(normalize_name(factor), factor)
+        for alias, factor in (aliases or {}).items():
+            self.add_alias(alias, factor)
+
+    def _register(self, key, factor):
+        """Index a normalized key under the given factor."""
+        if not key:
+            return
+        self._keys.setdefault(key, factor)
+        # "parentalincome" matches "parental_income" and "ParentalIncome"
+        self._compact.setdefault(key.replace(" ", ""), factor)
+        for token in key.split():
+            self._tokens.setdefault(token, set()).add(key)
+
+    def add_alias(self, alias, factor):
+        """Make ``alias`` resolve to ``factor``."""
+        factor = self.lookup(factor) or factor
+        self._register(normalize_name(alias), factor)
+        self._lookups.clear()
+
+    def lookup(self, name):
+        """Return the factor matching ``name``, or None if nothing is close enough."""
+        key = normalize_name(name)
+        if not key:
+            return None
+        if key in self._lookups:
+            return self._lookups[key]
+
+        match = self._keys.get(key) or self._compact.get(key.replace(" ", ""))
+        if match is None:
+            match = self._fuzzy_lookup(key)
+        self._lookups[key] = match
+        return match
+
+    def _fuzzy_lookup(self, key):
+        """Find the closest known key, only comparing keys that share a token with ``key``."""
+        candidates = set()
+        for token in key.split():
+            candidates.update(self._tokens.get(token, ()))
+        if not candidates:
+            candidates = self._keys.keys()
+        close = difflib.get_close_matches(key, list(candidates), n=1, cutoff=self.cutoff)
+        return self._keys[close[0]] if close else None
+
+    def canonicalize(self, name):
+        """Return the matching factor, or the stripped name if it is not a known factor."""
+        return self.lookup(name) or str(name).strip()
+
+    def __contains__(self, name):
+        return self.lookup(name) is not None
+
+
+@lru_cache(maxsize=32)
+def _cached_index(factors):
+    return VariableIndex(factors)
+
+
+def get_variable_index(factors):
+    """Return the shared index for a factor list, building it only once per list."""
+    return _cached_index(tuple(str(f).strip() for f in factors or () if str(f).strip()))
+
+
+def factor_keys(factors):
+    """Return order-independent normalized keys for a factor list, for use in cache keys."""
+    return sorted({normalize_name(f) for f in factors or () if normalize_name(f)})